@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Message, Room, TranslationMetric, UserProfile, Feedback
+from .models import Message, MessageTranslation, Room, TranslationMetric, UserProfile, Feedback
 
 admin.site.register(Room)
 admin.site.register(Message)
@@ -12,3 +12,9 @@ class FeedbackAdmin(admin.ModelAdmin):
     list_filter = ('created_at',)
     search_fields = ('nameer__username', 'feedinfo')
 
+@admin.register(MessageTranslation)
+class MessageTranslationAdmin(admin.ModelAdmin):
+    list_display = ('message', 'target_language', 'model_id', 'created_at')
+    list_filter = ('target_language', 'model_id')
+    search_fields = ('text', 'message__content')
+    raw_id_fields = ('message',)
@@ -0,0 +1,269 @@
+import glob
+import json
+import mmap
+import os
+import struct
+import torch
+import logging
+from django.conf import settings
+from transformers import AutoConfig, AutoTokenizer, AutoModelForSeq2SeqLM, GenerationConfig
+
+logger = logging.getLogger(__name__)
+
+PRECISION_MODES = ('fp32', 'bf16', 'int8-dynamic')
+LOAD_MODES = ('standard', 'mmap')
+
+SAFETENSORS_DTYPES = {
+    'F64': torch.float64,
+    'F32': torch.float32,
+    'F16': torch.float16,
+    'BF16': torch.bfloat16,
+    'I64': torch.int64,
+    'I32': torch.int32,
+    'I16': torch.int16,
+    'I8': torch.int8,
+    'U8': torch.uint8,
+    'BOOL': torch.bool,
+}
+
+
+def apply_precision(model, precision, device='cpu'):
+    """Convert a loaded model to the given inference precision"""
+    if precision not in PRECISION_MODES:
+        raise ValueError(f"Unknown precision mode: {precision}")
+
+    if precision == 'bf16':
+        return model.to(torch.bfloat16)
+
+    if precision == 'int8-dynamic':
+        # Dynamic quantization only has CPU kernels
+        if device != 'cpu':
+            logger.warning(f"int8-dynamic is CPU only, keeping fp32 on {device}")
+            return model
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    return model
+
+
+def apply_threads(threads=None, interop_threads=None):
+    """Set PyTorch intra-op and inter-op thread counts for this process"""
+    if threads:
+        torch.set_num_threads(threads)
+    if interop_threads:
+        try:
+            # Only allowed before the first parallel operation
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError as e:
+            logger.warning(f"Could not set inter-op threads: {str(e)}")
+
+
+def mmap_safetensors(path):
+    """Tensors of a .safetensors file backed directly by a memory map.
+
+    Nothing is read up front: pages come in from the page cache as the
+    weights are first used, and every process mapping the same file shares
+    them. The mapping is copy-on-write, so the file is never modified.
+    """
+    with open(path, 'rb') as f:
+        (header_size,) = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_size))
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    data_start = 8 + header_size
+    tensors = {}
+    for name, info in header.items():
+        if name == '__metadata__':
+            continue
+        dtype = SAFETENSORS_DTYPES[info['dtype']]
+        begin, end = info['data_offsets']
+        if begin == end:
+            tensors[name] = torch.empty(info['shape'], dtype=dtype)
+            continue
+        itemsize = torch.empty((), dtype=dtype).element_size()
+        tensors[name] = torch.frombuffer(
+            buffer, dtype=dtype, count=(end - begin) // itemsize, offset=data_start + begin
+        ).reshape(info['shape'])
+    return tensors
+
+
+def assign_weights(model, state_dict):
+    """Point the model's parameters and buffers at the given tensors without copying.
+
+    Does what ``load_state_dict(..., assign=True)`` does in torch 2.1+,
+    which the pinned torch 2.0 lacks. Returns the names of model weights
+    the state dict did not cover.
+    """
+    expected = set(model.state_dict())
+    for name, tensor in state_dict.items():
+        module_name, _, attr = name.rpartition('.')
+        try:
+            module = model.get_submodule(module_name)
+        except AttributeError:
+            module = None
+        if module is not None and attr in module._parameters:
+            module._parameters[attr] = torch.nn.Parameter(tensor, requires_grad=False)
+        elif module is not None and attr in module._buffers:
+            module._buffers[attr] = tensor
+        else:
+            logger.warning(f"Ignoring unexpected weight in checkpoint: {name}")
+    return sorted(expected - set(state_dict))
+
+
+def load_mmap_model(path):
+    """Build a seq2seq model whose weights point into memory-mapped safetensors"""
+    files = sorted(glob.glob(os.path.join(path, '*.safetensors')))
+    if not files:
+        raise RuntimeError(f"No safetensors checkpoint in {path}, run `manage.py convert_to_safetensors`")
+
+    config = AutoConfig.from_pretrained(path)
+    try:
+        # Skip allocating and initializing weights that are replaced right away
+        from accelerate import init_empty_weights
+        with init_empty_weights(include_buffers=False):
+            model = AutoModelForSeq2SeqLM.from_config(config)
+    except ImportError:
+        model = AutoModelForSeq2SeqLM.from_config(config)
+
+    state_dict = {}
+    for file in files:
+        state_dict.update(mmap_safetensors(file))
+    missing = assign_weights(model, state_dict)
+    # Shared embeddings are stored once in the checkpoint
+    model.tie_weights()
+
+    # A weight absent from the file is fine only when it is tied to one that
+    # was loaded; anything else would be left meta or randomly initialized
+    tensors = model.state_dict(keep_vars=True)
+    loaded = {tensors[name].data_ptr() for name in state_dict if name in tensors}
+    untied = [name for name in missing if tensors[name].is_meta or tensors[name].data_ptr() not in loaded]
+    if untied:
+        raise RuntimeError(f"Weights missing from {path}: {', '.join(untied[:5])}")
+
+    try:
+        model.generation_config = GenerationConfig.from_pretrained(path)
+    except OSError:
+        model.generation_config = GenerationConfig.from_model_config(config)
+    return model
+
+
+def process_memory(pid='self'):
+    """RSS, PSS and unique (USS) memory of a process in MB, from /proc"""
+    fields = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup', 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    except OSError:
+        return None
+
+    return {
+        'rss_mb': fields.get('Rss', 0),
+        'pss_mb': fields.get('Pss', 0),
+        'uss_mb': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+        'shared_mb': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0),
+    }
+
+
+class InferenceBackend:
+    """Loads a seq2seq model for the GenerationEngine.
+
+    A backend only has to return an object with the ``generate`` /
+    ``get_encoder`` / ``config`` / ``generation_config`` surface of a
+    ``transformers`` model, plus its tokenizer and device.
+    """
+    name = None
+
+    def __init__(self, model_name, threads=None, interop_threads=None):
+        self.model_name = model_name
+        self.threads = threads
+        self.interop_threads = interop_threads
+
+    def load(self):
+        """Return (model, tokenizer, device)"""
+        raise NotImplementedError
+
+
+class TorchBackend(InferenceBackend):
+    """PyTorch ``AutoModelForSeq2SeqLM`` in the configured precision"""
+    name = 'torch'
+
+    def load(self):
+        # Use CUDA if available
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        logger.info(f"Using device: {device}")
+        apply_threads(self.threads, self.interop_threads)
+
+        load_mode = settings.NLLB_SETTINGS.get('LOAD_MODE', 'standard')
+        if load_mode not in LOAD_MODES:
+            raise ValueError(f"Unknown load mode: {load_mode}")
+
+        if load_mode == 'mmap' and device == 'cpu':
+            path = settings.TRANSLATION_MODELS['SAFETENSORS_PATH']
+            tokenizer = AutoTokenizer.from_pretrained(path)
+            model = load_mmap_model(path)
+            logger.info(f"Memory-mapped model weights from {path}")
+        else:
+            tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            model = AutoModelForSeq2SeqLM.from_pretrained(self.model_name).to(device)
+
+        # Keep model in evaluation mode
+        model.eval()
+
+        precision = settings.NLLB_SETTINGS.get('PRECISION', 'fp32')
+        if load_mode == 'mmap' and precision != 'fp32':
+            logger.warning(f"{precision} copies the weights, so they are no longer shared between processes")
+        model = apply_precision(model, precision, device)
+        logger.info(f"Using precision: {precision}")
+
+        return model, tokenizer, device
+
+
+class OnnxBackend(InferenceBackend):
+    """Exported ONNX encoder/decoder run by ONNX Runtime on CPU.
+
+    The model directory comes from ``manage.py export_onnx_model``. It holds
+    the encoder plus a decoder with and without past key values, so decoding
+    reuses the KV-cache like the PyTorch model does.
+    """
+    name = 'onnx'
+
+    def load(self):
+        try:
+            import onnxruntime
+            from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        except ImportError:
+            raise RuntimeError("The onnx backend needs `pip install optimum[onnxruntime]`")
+
+        session_options = onnxruntime.SessionOptions()
+        if self.threads:
+            session_options.intra_op_num_threads = self.threads
+        if self.interop_threads:
+            session_options.inter_op_num_threads = self.interop_threads
+
+        path = settings.TRANSLATION_MODELS['ONNX_PATH']
+        tokenizer = AutoTokenizer.from_pretrained(path)
+        model = ORTModelForSeq2SeqLM.from_pretrained(
+            path,
+            use_cache=True,
+            provider='CPUExecutionProvider',
+            session_options=session_options
+        )
+
+        if settings.NLLB_SETTINGS.get('PRECISION', 'fp32') != 'fp32':
+            logger.warning("PRECISION is ignored by the onnx backend")
+
+        logger.info(f"Loaded ONNX model from {path}")
+        return model, tokenizer, 'cpu'
+
+
+BACKENDS = {backend.name: backend for backend in (TorchBackend, OnnxBackend)}
+
+
+def get_backend(model_name, name=None, threads=None, interop_threads=None):
+    """Instantiate the backend selected in TRANSLATION_SETTINGS['BACKEND']"""
+    name = name or settings.TRANSLATION_SETTINGS.get('BACKEND', 'torch')
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {name}")
+    return BACKENDS[name](model_name, threads=threads, interop_threads=interop_threads)
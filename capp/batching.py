@@ -0,0 +1,207 @@
+import asyncio
+import logging
+from collections import defaultdict
+from django.conf import settings
+from .translation import Translator
+from .inference_client import InferenceClient
+from .executor import InferenceExecutor, QueueFull
+
+logger = logging.getLogger(__name__)
+
+
+class TranslationBatcher:
+    """Groups concurrent translate requests into padded generate batches.
+
+    Requests are queued from any consumer coroutine. A single worker task
+    waits a short window for more requests to arrive, groups what it
+    collected by target language and runs one ``Translator.translate_batch``
+    per group on the shared ``InferenceExecutor``.
+
+    The window adapts to load: with an idle queue and small recent batches
+    it stays at ``BATCH_MIN_WAIT_MS`` so quiet rooms see no extra latency,
+    and it grows towards ``BATCH_MAX_WAIT_MS`` as the queue fills.
+
+    At most ``BATCH_MAX_PENDING`` requests wait for a batch; beyond that
+    ``translate`` raises ``QueueFull``.
+
+    When ``INFERENCE_SERVER_SOCKET`` is set, batches go to the inference
+    server instead, with up to ``INFERENCE_MAX_IN_FLIGHT`` of them running
+    at once on its replicas.
+    """
+    _instance = None
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, translator=None, client=None, executor=None):
+        self.client = client or (None if translator else InferenceClient.instance())
+        self.translator = translator or (None if self.client else Translator())
+
+        options = settings.TRANSLATION_SETTINGS
+        self.max_batch_size = options.get('BATCH_MAX_SIZE', 16)
+        self.min_wait = options.get('BATCH_MIN_WAIT_MS', 2) / 1000
+        self.max_wait = options.get('BATCH_MAX_WAIT_MS', 25) / 1000
+        self.max_pending = options.get('BATCH_MAX_PENDING', 256)
+
+        self.executor = None if self.client else (executor or InferenceExecutor.instance())
+        self.average_batch_size = 1.0
+        self.rejected = 0
+
+        self._loop = None
+        self._queue = None
+        self._worker = None
+        self._slots = None
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            # Batches running at once; requests queue up (and batch) behind them
+            self._slots = asyncio.Semaphore(self.client.max_in_flight if self.client else self.executor.workers)
+            self._worker = loop.create_task(self._run())
+
+    async def _call(self, method, *args):
+        """Run a Translator method on the inference server or the inference executor"""
+        if self.client is not None:
+            return await getattr(self.client, method)(*args)
+        return await self.executor.run(getattr(self.translator, method), *args)
+
+    def stats(self):
+        return {
+            'pending': self._queue.qsize() if self._queue else 0,
+            'max_pending': self.max_pending,
+            'rejected': self.rejected,
+            'average_batch_size': self.average_batch_size,
+        }
+
+    async def translate(self, text, source_code, target_code):
+        """Queue one translation and wait for its batched result"""
+        if not text or source_code == target_code:
+            return text
+
+        self._ensure_worker()
+        if self._queue.qsize() >= self.max_pending:
+            self.rejected += 1
+            raise QueueFull(f"Translation queue is full ({self.max_pending} waiting)")
+        future = self._loop.create_future()
+        self._queue.put_nowait((text, source_code, target_code, future))
+        return await future
+
+    async def translate_batch(self, texts, source_codes, target_code):
+        """Translate texts that already form a batch (e.g. room history) in one call"""
+        self._ensure_worker()
+        return await self._call('translate_batch', texts, source_codes, target_code)
+
+    async def translate_many(self, text, source_code, target_codes):
+        """Translate one text into several languages in one call.
+
+        Fan-out requests already form their own batch, so they skip the
+        collection window and go straight to the inference executor.
+        """
+        self._ensure_worker()
+        return await self._call('translate_many', text, source_code, target_codes)
+
+    async def stream(self, text, source_code, target_code):
+        """Async iterator over partial translations of one message.
+
+        Decoding runs on an inference worker and pushes each new piece of
+        text back to the event loop as it is produced.
+        """
+        self._ensure_worker()
+        if self.client is not None:
+            async for chunk in self.client.stream(text, source_code, target_code):
+                yield chunk
+            return
+
+        loop = self._loop
+        chunks = asyncio.Queue()
+
+        def on_text(chunk):
+            loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+
+        def run():
+            try:
+                return self.translator.stream_translate(text, source_code, target_code, on_text)
+            finally:
+                loop.call_soon_threadsafe(chunks.put_nowait, None)
+
+        future = asyncio.wrap_future(self.executor.submit(run))
+        while True:
+            chunk = await chunks.get()
+            if chunk is None:
+                break
+            yield chunk
+        await future
+
+    def window(self):
+        """Seconds to keep collecting requests for the current batch"""
+        load = max(self._queue.qsize(), self.average_batch_size - 1)
+        fill = min(1.0, load / self.max_batch_size)
+        return self.min_wait + (self.max_wait - self.min_wait) * fill
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.window()
+
+        while len(batch) < self.max_batch_size:
+            # Anything already queued joins without waiting
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        while True:
+            # Wait for a free slot first so requests keep joining the next batch
+            await self._slots.acquire()
+            batch = await self._collect()
+            self.average_batch_size = 0.8 * self.average_batch_size + 0.2 * len(batch)
+            if self.translator is not None:
+                self.translator.set_load(self._queue.qsize())
+
+            groups = defaultdict(list)
+            for request in batch:
+                groups[request[2]].append(request)
+
+            for index, (target_code, requests) in enumerate(groups.items()):
+                if index:
+                    await self._slots.acquire()
+                self._loop.create_task(self._dispatch(target_code, requests))
+
+    async def _dispatch(self, target_code, requests):
+        texts = [request[0] for request in requests]
+        source_codes = [request[1] for request in requests]
+
+        try:
+            if self.client is not None:
+                results = await self.client.translate_batch(texts, source_codes, target_code,
+                                                            load=self._queue.qsize())
+            else:
+                results = await self._call('translate_batch', texts, source_codes, target_code)
+        except Exception as e:
+            logger.error(f"Batch translation error: {str(e)}")
+            # Callers decide how to fall back
+            for request in requests:
+                if not request[3].done():
+                    request[3].set_exception(e)
+            return
+        finally:
+            self._slots.release()
+
+        for request, result in zip(requests, results):
+            future = request[3]
+            if not future.done():
+                future.set_result(result)
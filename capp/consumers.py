@@ -1,33 +1,64 @@
 from channels.generic.websocket import AsyncWebsocketConsumer
 import json
-from .translation import Translator
+from .batching import TranslationBatcher
+from .translation_router import TranslationRouter
+from .executor import QueueFull
+from .persistence import WriteBehindQueue
+from .langid import LanguageIdentifier
+from .presence import RoomPresence
 import logging
-from asgiref.sync import sync_to_async
-from .models import Room, Message, UserProfile, TranslationMetric
+from asgiref.sync import sync_to_async, async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from .models import Room, Message, MessageTranslation
+from django.db.models import Prefetch
 from channels.exceptions import StopConsumer
+from django.conf import settings
 from django.utils import timezone
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import uuid
 
 logger = logging.getLogger(__name__)
 
+
+def user_group_name(user_id):
+    """Channel layer group of every chat connection of one user"""
+    return f'user_{user_id}'
+
+
+def notify_language_change(user_id, language):
+    """Tell the user's open chat connections about a new preferred language"""
+    try:
+        async_to_sync(get_channel_layer().group_send)(
+            user_group_name(user_id),
+            {'type': 'user_language_changed', 'language': language}
+        )
+    except Exception as e:
+        logger.error(f"Error notifying language change: {str(e)}")
+
+
 class ChatConsumer(AsyncWebsocketConsumer):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.translator = None
-        self.executor = None
+        self.batcher = None
+        self.router = None
+        self.language_identifier = None
+        self.presence = RoomPresence.instance()
+        self.stream_tasks = set()
         self.room = None
         self.user = None
+        self.user_language = None
         self.room_group_name = None
         self.room_id = None
 
     async def initialize(self):
         """Initialize resources that need an event loop"""
-        if self.translator is None:
-            from .translation import Translator
-            self.translator = Translator()  # Will reuse existing instance
-        if self.executor is None:
-            self.executor = ThreadPoolExecutor(max_workers=3)
+        if self.batcher is None:
+            self.batcher = TranslationBatcher.instance()  # Shared by all connections
+        if self.router is None:
+            self.router = TranslationRouter.instance()
+        if self.language_identifier is None:
+            self.language_identifier = LanguageIdentifier.instance()
 
     async def connect(self):
         try:
@@ -44,14 +75,22 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 await self.close()
                 return
 
+            # Resolved once; profile changes arrive as user_language_changed
+            self.user_language = await self.get_user_language()
+
             # Join room group
             await self.channel_layer.group_add(
                 self.room_group_name,
                 self.channel_name
             )
+            if self.user.is_authenticated:
+                await self.channel_layer.group_add(user_group_name(self.user.id), self.channel_name)
 
             await self.accept()
 
+            # Messages are translated into the languages of open connections
+            self.presence.join(self.room_id, self.channel_name, self.user_language)
+
             # Send room history in a separate task
             asyncio.create_task(self.send_room_history())
             
@@ -63,16 +102,14 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     async def disconnect(self, close_code):
         try:
+            self.presence.leave(self.channel_name)
             if self.room_group_name:
                 await self.channel_layer.group_discard(
                     self.room_group_name,
                     self.channel_name
                 )
-            
-            # Clean up resources
-            if self.executor:
-                self.executor.shutdown(wait=False)
-                self.executor = None
+            if self.user and self.user.is_authenticated:
+                await self.channel_layer.group_discard(user_group_name(self.user.id), self.channel_name)
 
             logger.info(f"User {self.user.username if self.user else 'Unknown'} disconnected from room {self.room_id}")
 
@@ -82,44 +119,86 @@ class ChatConsumer(AsyncWebsocketConsumer):
         raise StopConsumer()
 
     async def send_room_history(self):
-        """Send recent chat history to newly connected users"""
+        """Send recent chat history to newly connected users.
+
+        The history goes out first in one frame so the room renders at once,
+        with the stored translations it already has. The other
+        foreign-language messages are then translated in batches, newest
+        first, each batch sent as one history_translations frame keyed by
+        message id and stored for the next replay.
+        """
         try:
-            # Get recent messages
-            recent_messages = await self.get_recent_messages()
-            
-            # Send each message
-            for message in recent_messages:
-                # Get user's preferred language
-                user_language = await self.get_user_language()
-                
-                # Translate if necessary
-                translated = None
-                if message.language != user_language:
-                    translated = await self.translate_message(
-                        message.content,
-                        message.language,
+            user_language = self.user_language
+            recent_messages = await self.get_recent_messages(user_language)
+            recent_messages.reverse()
+            stored = {
+                message.id: message.stored_translations[-1]
+                for message in recent_messages if message.stored_translations
+            }
+
+            await self.send(text_data=json.dumps({
+                'type': 'history',
+                'target_language': user_language,
+                'messages': [
+                    {
+                        'history_id': message.id,
+                        'message': message.content,
+                        'translated_message': stored[message.id].text if message.id in stored else message.content,
+                        'translation_pending': message.language != user_language and message.id not in stored,
+                        'translation_tier': stored[message.id].model_id if message.id in stored else None,
+                        'username': message.user.username,
+                        'source_language': message.language,
+                        'timestamp': str(message.date_added)
+                    }
+                    for message in recent_messages
+                ]
+            }))
+
+            # Newest first: they are at the bottom of the screen
+            foreign = [
+                message for message in reversed(recent_messages)
+                if message.language != user_language and message.id not in stored
+            ]
+            model_id = settings.TRANSLATION_SETTINGS.get('PRIMARY_MODEL', 'nllb')
+            chunk_size = settings.TRANSLATION_SETTINGS.get('HISTORY_CHUNK_SIZE', 25)
+            for offset in range(0, len(foreign), chunk_size):
+                if self.user_language != user_language:
+                    # The language changed; a new replay has started
+                    return
+                chunk = foreign[offset:offset + chunk_size]
+                try:
+                    translations = await self.batcher.translate_batch(
+                        [message.content for message in chunk],
+                        [message.language for message in chunk],
                         user_language
                     )
+                except Exception as e:
+                    logger.error(f"History translation error: {str(e)}")
+                    translations = [message.content for message in chunk]
+                else:
+                    for message, translation in zip(chunk, translations):
+                        self.store_translations(message, {user_language: translation}, {user_language: model_id})
 
-                # Send message
                 await self.send(text_data=json.dumps({
-                    'type': 'chat_message',
-                    'message': message.content,
-                    'translated_message': translated if translated else message.content,
-                    'username': message.user.username,
-                    'source_language': message.language,
-                    'target_language': user_language,
-                    'timestamp': str(message.date_added)
+                    'type': 'history_translations',
+                    'translations': {
+                        message.id: translation for message, translation in zip(chunk, translations)
+                    }
                 }))
 
         except Exception as e:
             logger.error(f"Error sending room history: {str(e)}")
 
     @sync_to_async
-    def get_recent_messages(self):
-        """Get recent messages from the database"""
+    def get_recent_messages(self, target_language):
+        """Get recent messages, with their stored translations into target_language"""
         return list(Message.objects.filter(room=self.room)
                    .select_related('user')
+                   .prefetch_related(Prefetch(
+                       'translations',
+                       queryset=MessageTranslation.objects.filter(target_language=target_language).order_by('id'),
+                       to_attr='stored_translations'
+                   ))
                    .order_by('-date_added')[:50])
 
     @sync_to_async
@@ -130,7 +209,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             return None
 
     async def receive(self, text_data):
-        if not self.translator or not self.executor:
+        if not self.batcher:
             await self.initialize()
             
         try:
@@ -139,35 +218,77 @@ class ChatConsumer(AsyncWebsocketConsumer):
             username = data['username']
             source_language = data['source_language']
             
-            # Get room members' languages
-            room_members_languages = await self.get_room_members_languages()
-            
-            # Create translations for each unique target language
-            translations = {}
-            tasks = []
-            
-            # Create translation tasks
-            for target_language in set(room_members_languages.values()):
-                if target_language != source_language:
-                    translated = await self.translate_message(message, source_language, target_language)
-                    translations[target_language] = translated
+            # Translate into the languages someone in the room is reading in
+            target_languages = [
+                language for language in self.presence.languages(self.room_id)
+                if language != source_language
+            ]
+
+            # Fix a wrong source language and skip targets the text is already in
+            source_language, target_languages = self.language_identifier.resolve(
+                message, source_language, target_languages
+            )
+
+            message_id = uuid.uuid4().hex
+            streaming = settings.TRANSLATION_SETTINGS.get('STREAMING', False)
+            upgrades = {}
+
+            if streaming:
+                # Translations follow as translation_delta events, decoded by
+                # the primary model like the stored translations
+                translations = {}
+                primary = settings.TRANSLATION_SETTINGS.get('PRIMARY_MODEL', 'nllb')
+                tiers = {language: primary for language in target_languages}
+            else:
+                # Fastest tier that fits the latency budget, NLLB when it can;
+                # a slower tier that missed it may upgrade the result later
+                translations, tiers = await self.router.translate_many(
+                    message, source_language, target_languages, upgrades=upgrades
+                )
             
-            # Save original message
-            await self.save_message(username, message, source_language)
+            # Save original message, and its translations after it
+            saved_message = await self.save_message(message, source_language)
+            self.store_translations(saved_message, translations, tiers)
             
             # Broadcast message with translations
             await self.channel_layer.group_send(
                 self.room_group_name,
                 {
                     'type': 'chat_message',
+                    'message_id': message_id,
                     'message': message,
                     'translations': translations,
+                    'tiers': tiers,
+                    'pending_languages': target_languages if streaming else [],
+                    'upgrade_languages': list(upgrades),
                     'username': username,
                     'source_language': source_language,
                     'timestamp': str(timezone.now())
                 }
             )
-            
+
+            if streaming:
+                for target_language in target_languages:
+                    task = asyncio.create_task(
+                        self.stream_translation(message_id, saved_message, source_language, target_language)
+                    )
+                    self.stream_tasks.add(task)
+                    task.add_done_callback(self.stream_tasks.discard)
+
+            for target_language, late in upgrades.items():
+                task = asyncio.create_task(self.send_upgrade(message_id, saved_message, target_language, late))
+                self.stream_tasks.add(task)
+                task.add_done_callback(self.stream_tasks.discard)
+
+        except QueueFull as e:
+            logger.warning(f"Rejected message from {self.user}: {str(e)}")
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'code': 'queue_full',
+                'message': 'Translation is busy right now. Please send your message again in a moment.',
+                'original': message
+            }))
+
         except Exception as e:
             logger.error(f"Receive error: {str(e)}")
             await self.send(text_data=json.dumps({
@@ -177,8 +298,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     async def chat_message(self, event):
         try:
-            # Get user's preferred language
-            user_language = await self.get_user_language()
+            user_language = self.user_language
             
             # Get appropriate translation for this user
             translated_message = event['translations'].get(
@@ -189,8 +309,12 @@ class ChatConsumer(AsyncWebsocketConsumer):
             # Send message to WebSocket
             await self.send(text_data=json.dumps({
                 'type': 'chat_message',
+                'message_id': event.get('message_id'),
                 'message': event['message'],
                 'translated_message': translated_message,
+                'translation_pending': user_language in event.get('pending_languages', []),
+                'translation_tier': event.get('tiers', {}).get(user_language),
+                'upgrade_pending': user_language in event.get('upgrade_languages', []),
                 'username': event['username'],
                 'source_language': event['source_language'],
                 'target_language': user_language,
@@ -204,51 +328,126 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 'message': str(e)
             }))
 
-    async def translate_message(self, message, source_language, target_language):
-        """Translate a single message"""
+    async def user_language_changed(self, event):
+        """The user chose another language in their profile settings"""
+        if event['language'] == self.user_language:
+            return
+        self.user_language = event['language']
+        self.presence.join(self.room_id, self.channel_name, self.user_language)
+        # Show the history again in the new language
+        asyncio.create_task(self.send_room_history())
+
+    async def stream_translation(self, message_id, saved_message, source_language, target_language):
+        """Broadcast one translation piece by piece while it is decoded"""
+        message = saved_message.content
+        parts = []
         try:
-            loop = asyncio.get_running_loop()
-            translated = await loop.run_in_executor(
-                self.executor,
-                self.translator.translate_text,
-                message,
-                source_language,
-                target_language
-            )
-            return translated
+            async for delta in self.batcher.stream(message, source_language, target_language):
+                parts.append(delta)
+                await self.channel_layer.group_send(
+                    self.room_group_name,
+                    {
+                        'type': 'translation_delta',
+                        'message_id': message_id,
+                        'target_language': target_language,
+                        'delta': delta
+                    }
+                )
         except Exception as e:
-            logger.error(f"Translation error: {str(e)}")
-            return message
+            logger.error(f"Streaming error: {str(e)}")
+        else:
+            primary = settings.TRANSLATION_SETTINGS.get('PRIMARY_MODEL', 'nllb')
+            self.store_translations(saved_message, {target_language: ''.join(parts)}, {target_language: primary})
 
-    @sync_to_async
-    def save_message(self, username, content, language):
-        from django.contrib.auth.models import User
-        user = User.objects.get(username=username)
-        Message.objects.create(
-            room=self.room,
-            user=user,
-            content=content,
-            language=language
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                'type': 'translation_done',
+                'message_id': message_id,
+                'target_language': target_language,
+                'translated_message': ''.join(parts) or message
+            }
         )
 
+    async def send_upgrade(self, message_id, saved_message, target_language, late):
+        """Replace a fallback translation with the result of the tier that missed its budget"""
+        outcome = await late
+        if outcome is None:
+            return
+        results, tier = outcome
+        translated = results.get(target_language)
+        if not translated:
+            return
+
+        self.store_translations(saved_message, {target_language: translated}, {target_language: tier})
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                'type': 'translation_upgrade',
+                'message_id': message_id,
+                'target_language': target_language,
+                'translated_message': translated,
+                'tier': tier
+            }
+        )
+
+    async def translation_upgrade(self, event):
+        if event['target_language'] != self.user_language:
+            return
+        await self.send(text_data=json.dumps({
+            'type': 'translation_upgrade',
+            'message_id': event['message_id'],
+            'translated_message': event['translated_message'],
+            'translation_tier': event['tier']
+        }))
+
+    async def translation_delta(self, event):
+        """Forward a streamed translation piece to listeners of that language"""
+        if event['target_language'] != self.user_language:
+            return
+        await self.send(text_data=json.dumps({
+            'type': 'translation_delta',
+            'message_id': event['message_id'],
+            'delta': event['delta']
+        }))
+
+    async def translation_done(self, event):
+        if event['target_language'] != self.user_language:
+            return
+        await self.send(text_data=json.dumps({
+            'type': 'translation_done',
+            'message_id': event['message_id'],
+            'translated_message': event['translated_message']
+        }))
+
+    async def save_message(self, content, language):
+        """Hand the message to the write-behind queue"""
+        message = Message(room=self.room, user=self.user, content=content, language=language)
+        if not WriteBehindQueue.instance().add(message):
+            # Queue full: write this one directly rather than lose it
+            await database_sync_to_async(message.save)()
+        return message
+
+    def store_translations(self, message, translations, tiers):
+        """Queue translations of a message for storage.
+
+        The queue is FIFO, so rows queued after their unsaved Message are
+        written after it and pick up its id. Only translations by the
+        primary model are stored: fallback tiers and untranslated targets
+        are translated again by history, or replaced by a late upgrade.
+        """
+        primary = settings.TRANSLATION_SETTINGS.get('PRIMARY_MODEL', 'nllb')
+        queue = WriteBehindQueue.instance()
+        for target_language, text in translations.items():
+            model_id = tiers.get(target_language, 'none')
+            if model_id != primary or not text or text == message.content:
+                continue
+            queue.add(MessageTranslation(
+                message=message, target_language=target_language, text=text, model_id=model_id
+            ))
+
     @sync_to_async
     def get_user_language(self):
         if hasattr(self.user, 'userprofile'):
             return self.user.userprofile.preferred_language
         return 'eng_Latn'
-
-    @sync_to_async
-    def get_room_members_languages(self):
-        """Get language preferences for all users in the room"""
-        room_messages = Message.objects.filter(room=self.room)
-        users = set(msg.user for msg in room_messages)
-        
-        languages = {}
-        for user in users:
-            try:
-                profile = UserProfile.objects.get(user=user)
-                languages[user.username] = profile.preferred_language
-            except UserProfile.DoesNotExist:
-                languages[user.username] = 'eng_Latn'
-                
-        return languages
@@ -0,0 +1,229 @@
+import math
+import threading
+import logging
+from collections import defaultdict
+from django.conf import settings
+from transformers import StoppingCriteria, StoppingCriteriaList
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLICY = {
+    'ENABLED': True,
+    'DEFAULT_LENGTH_RATIO': 1.3,  # target/source tokens when a pair has no history
+    'LENGTH_MARGIN': 1.5,
+    'LENGTH_SLACK': 8,  # extra tokens on top of the scaled budget
+    'MIN_PAIR_SAMPLES': 20,  # finished outputs before a pair's own ratio is used
+    'SHORT_INPUT_TOKENS': 4,  # single words decode greedily
+    'LONG_INPUT_TOKENS': 128,
+    'BUSY_QUEUE_DEPTH': 8,
+    'OVERLOADED_QUEUE_DEPTH': 32,
+    'MAX_REPEAT_NGRAM': 8,
+    'REPEAT_COUNT': 3,
+}
+
+
+def repeated_tail(ids, max_ngram, repeats):
+    """Length of the n-gram the sequence ends on ``repeats`` times in a row, or 0"""
+    for n in range(1, max_ngram + 1):
+        if len(ids) < n * repeats:
+            break
+        ngram = ids[-n:]
+        if all(ids[-(k + 1) * n:len(ids) - k * n] == ngram for k in range(1, repeats)):
+            return n
+    return 0
+
+
+class RepetitionStoppingCriteria(StoppingCriteria):
+    """Stops generation once every running sequence is stuck in a loop.
+
+    NLLB occasionally repeats a short phrase until it reaches ``max_length``.
+    Checking only the tail of each sequence keeps this cheap per step.
+    """
+
+    def __init__(self, max_ngram, repeats, finished_ids):
+        self.max_ngram = max_ngram
+        self.repeats = repeats
+        self.finished_ids = finished_ids
+        self.triggered = False
+
+    def __call__(self, input_ids, scores, **kwargs):
+        window = self.max_ngram * self.repeats
+        looping = False
+        for row in input_ids[:, -window:].tolist():
+            # Finished rows end in EOS, then padding
+            if row[-1] in self.finished_ids:
+                continue
+            if not repeated_tail(row, self.max_ngram, self.repeats):
+                return False
+            looping = True
+
+        if looping:
+            self.triggered = True
+        return looping
+
+
+class DecodePlan:
+    """What one generate call was planned with, for ``DecodingPolicy.finish``"""
+
+    def __init__(self, criteria, rows, max_new_tokens, prefix_length):
+        self.criteria = criteria
+        self.rows = rows  # (source tokens, source code, target code) per output row
+        self.max_new_tokens = max_new_tokens
+        self.prefix_length = prefix_length
+
+
+class DecodingPolicy:
+    """Chooses decode limits and beam width per generate call.
+
+    * The token budget scales with the source length in tokens using
+      per-pair target/source token ratios. The ratios are learned from the
+      outputs this policy sees finish, so no database work happens on the
+      inference threads.
+    * The beam count shrinks for single words, long inputs and a busy queue.
+    * Repetition loops stop early and the repeated tail is trimmed.
+
+    ``stats`` reports the decode steps saved by stopping loops and the beam
+    steps saved against the static ``MAX_LENGTH`` / ``NUM_BEAMS``
+    configuration, and counts outputs cut off by a budget below
+    ``MAX_LENGTH`` as truncations.
+    """
+
+    def __init__(self, max_length, num_beams, eos_token_id, pad_token_id, options=None):
+        self.max_length = max_length
+        self.num_beams = num_beams
+        self.eos_token_id = eos_token_id
+        self.pad_token_id = pad_token_id
+        self.options = {**DEFAULT_POLICY, **(options or {})}
+
+        self.queue_depth = 0
+        self._lengths = defaultdict(lambda: [0, 0, 0])  # pair -> [source tokens, target tokens, samples]
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.steps_saved = 0
+        self.beam_steps_saved = 0
+        self.loops_stopped = 0
+        self.truncations = 0
+
+    @classmethod
+    def from_settings(cls, max_length, num_beams, eos_token_id, pad_token_id):
+        return cls(max_length, num_beams, eos_token_id, pad_token_id,
+                   settings.NLLB_SETTINGS.get('DECODING_POLICY'))
+
+    @property
+    def enabled(self):
+        return self.options['ENABLED']
+
+    def length_ratio(self, source_code, target_code):
+        source_tokens, target_tokens, samples = self._lengths.get(
+            (source_code, target_code), (0, 0, 0)
+        )
+        if samples < self.options['MIN_PAIR_SAMPLES'] or not source_tokens:
+            return self.options['DEFAULT_LENGTH_RATIO']
+        return min(max(target_tokens / source_tokens, 0.5), 3.0)
+
+    def learn(self, source_tokens, source_code, target_code, target_tokens):
+        """Record the token lengths of one output that finished on its own"""
+        with self._lock:
+            lengths = self._lengths[(source_code, target_code)]
+            lengths[0] += source_tokens
+            lengths[1] += target_tokens
+            lengths[2] += 1
+
+    def plan(self, source_lengths, source_codes, target_codes):
+        """Return (max_new_tokens, num_beams) for one generate call"""
+        longest = max(source_lengths)
+        ratio = max(
+            self.length_ratio(source_code, target_code)
+            for source_code in set(source_codes)
+            for target_code in set(target_codes)
+        )
+        budget = math.ceil(longest * ratio * self.options['LENGTH_MARGIN']) + self.options['LENGTH_SLACK']
+        max_new_tokens = min(budget, self.max_length)
+
+        num_beams = self.num_beams
+        if longest <= self.options['SHORT_INPUT_TOKENS']:
+            num_beams = 1
+        elif longest >= self.options['LONG_INPUT_TOKENS']:
+            num_beams = min(num_beams, 2)
+
+        if self.queue_depth >= self.options['OVERLOADED_QUEUE_DEPTH']:
+            num_beams = 1
+        elif self.queue_depth >= self.options['BUSY_QUEUE_DEPTH']:
+            num_beams = max(1, num_beams // 2)
+
+        return max_new_tokens, num_beams
+
+    def generation_kwargs(self, source_lengths, source_codes, target_codes, prefix_length=1):
+        """Keyword arguments for ``model.generate`` plus the DecodePlan to finish with.
+
+        ``source_codes`` has one code per source text, or a single code for
+        all of them. Output rows are target-major, every text once per target.
+        """
+        max_new_tokens, num_beams = self.plan(source_lengths, source_codes, target_codes)
+        criteria = RepetitionStoppingCriteria(
+            self.options['MAX_REPEAT_NGRAM'],
+            self.options['REPEAT_COUNT'],
+            (self.eos_token_id, self.pad_token_id)
+        )
+        if len(source_codes) != len(source_lengths):
+            source_codes = [source_codes[0]] * len(source_lengths)
+        rows = [
+            (length, source_code, target_code)
+            for target_code in target_codes
+            for length, source_code in zip(source_lengths, source_codes)
+        ]
+        kwargs = {
+            # max_length rather than max_new_tokens: the cached config already sets it
+            'max_length': max_new_tokens + prefix_length,
+            'num_beams': num_beams,
+            'stopping_criteria': StoppingCriteriaList([criteria]),
+        }
+        return kwargs, DecodePlan(criteria, rows, max_new_tokens, prefix_length)
+
+    def finish(self, outputs, kwargs, plan):
+        """Trim repetition loops from generated ids, learn lengths and record the steps saved"""
+        sequences = outputs.tolist()
+        steps = len(sequences[0]) if sequences else 0
+        criteria = plan.criteria
+        # Rows generated with a per-call override of the budget are not the policy's
+        budget = kwargs['max_length'] - plan.prefix_length
+        rows = plan.rows if len(plan.rows) == len(sequences) else [None] * len(sequences)
+
+        self.calls += 1
+        self.beam_steps_saved += (self.num_beams - kwargs['num_beams']) * steps * len(sequences)
+        if criteria.triggered:
+            # Without the policy the loops would have decoded up to MAX_LENGTH
+            self.steps_saved += max(0, self.max_length - steps)
+            self.loops_stopped += 1
+
+        trimmed = []
+        for ids, row in zip(sequences, rows):
+            while ids and ids[-1] == self.pad_token_id:
+                ids = ids[:-1]
+            generated = ids[plan.prefix_length:]
+            if self.eos_token_id in generated:
+                if row is not None:
+                    self.learn(row[0], row[1], row[2], generated.index(self.eos_token_id))
+            elif not criteria.triggered and budget < self.max_length and len(generated) >= budget:
+                # Cut off by the policy's budget, not by MAX_LENGTH
+                self.truncations += 1
+            # Keep one copy of a looping n-gram
+            n = repeated_tail(ids, self.options['MAX_REPEAT_NGRAM'], self.options['REPEAT_COUNT'])
+            while n and ids[-2 * n:-n] == ids[-n:]:
+                ids = ids[:-n]
+            trimmed.append(ids)
+        return trimmed
+
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'steps_saved': self.steps_saved,
+            'beam_steps_saved': self.beam_steps_saved,
+            'loops_stopped': self.loops_stopped,
+            'truncations': self.truncations,
+            'queue_depth': self.queue_depth,
+            'learned_pairs': sum(
+                1 for lengths in self._lengths.values() if lengths[2] >= self.options['MIN_PAIR_SAMPLES']
+            ),
+        }
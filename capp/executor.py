@@ -0,0 +1,125 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+import logging
+from concurrent.futures import Future
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """Raised when the inference queue cannot take more work"""
+
+
+class InferenceExecutor:
+    """Process-wide pool of inference threads with a bounded queue.
+
+    Every model call in the process goes through this one pool, so the
+    number of threads running the model is fixed no matter how many
+    WebSockets are connected. ``submit`` raises ``QueueFull`` instead of
+    queueing without limit, which lets callers tell users to retry.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def instance(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls.from_settings()
+            return cls._instance
+
+    @classmethod
+    def from_settings(cls):
+        options = settings.TRANSLATION_SETTINGS
+        workers = options.get('INFERENCE_WORKERS')
+        if not workers:
+            # Each worker gets a few cores for the model's own threads
+            cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+            workers = max(1, cores // options.get('INFERENCE_CORES_PER_WORKER', 4))
+        return cls(workers, options.get('INFERENCE_QUEUE_SIZE', 64))
+
+    def __init__(self, workers=1, max_queue=64):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._threads = []
+        self._lock = threading.Lock()
+
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.in_flight = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+
+    def _start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f'inference-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue a call and return a Future, or raise QueueFull"""
+        self._start()
+        future = Future()
+        try:
+            self._queue.put_nowait((future, fn, args, kwargs, time.monotonic()))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise QueueFull(f"Inference queue is full ({self.max_queue} waiting)")
+        with self._lock:
+            self.submitted += 1
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    @property
+    def depth(self):
+        return self._queue.qsize()
+
+    def _work(self):
+        while True:
+            future, fn, args, kwargs, queued_at = self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            started = time.monotonic()
+            wait = started - queued_at
+            with self._lock:
+                self.in_flight += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+                    self.completed += 1
+                    self.total_run += time.monotonic() - started
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'queue_depth': self.depth,
+            'max_queue': self.max_queue,
+            'in_flight': self.in_flight,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'avg_wait_ms': (self.total_wait / self.completed) * 1000 if self.completed else 0,
+            'max_wait_ms': self.max_wait * 1000,
+            'avg_run_ms': (self.total_run / self.completed) * 1000 if self.completed else 0,
+        }
@@ -0,0 +1,249 @@
+import copy
+import threading
+import torch
+import logging
+from transformers import TextStreamer
+
+logger = logging.getLogger(__name__)
+
+
+class PairConfig:
+    """Precomputed special tokens and generation config for one language pair"""
+
+    def __init__(self, source_code, target_code, prefix_ids, suffix_ids, generation_config):
+        self.source_code = source_code
+        self.target_code = target_code
+        self.prefix_ids = prefix_ids
+        self.suffix_ids = suffix_ids
+        self.generation_config = generation_config
+
+    @property
+    def forced_bos_token_id(self):
+        return self.generation_config.forced_bos_token_id
+
+
+class CallbackStreamer(TextStreamer):
+    """Hands decoded text to a callback as soon as whole words are ready"""
+
+    def __init__(self, tokenizer, callback):
+        # skip_prompt drops the decoder start token
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        self.callback = callback
+
+    def on_finalized_text(self, text, stream_end=False):
+        if text:
+            self.callback(text)
+
+
+class GenerationEngine:
+    """Runs NLLB generation directly on a loaded model and tokenizer.
+
+    Building a ``transformers`` pipeline per message re-resolves the task,
+    the tokenizer language state and the generation config every time. The
+    engine resolves those once per (source, target) pair and afterwards only
+    tokenizes the text and calls ``model.generate``.
+
+    Source language tokens are added by hand instead of setting
+    ``tokenizer.src_lang``, so one tokenizer can be shared between executor
+    threads and a batch may mix source languages.
+    """
+
+    def __init__(self, model, tokenizer, device, max_length, num_beams, early_stopping):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = device
+        self.max_length = max_length
+
+        self.base_config = copy.deepcopy(model.generation_config)
+        self.base_config.max_length = max_length
+        self.base_config.num_beams = num_beams
+        self.base_config.early_stopping = early_stopping
+
+        # Fan-out decodes pass the target token per row instead
+        self.fanout_config = copy.deepcopy(self.base_config)
+        self.fanout_config.forced_bos_token_id = None
+
+        # Optional DecodingPolicy choosing limits and beams per call
+        self.policy = None
+        # Optional SpeculativeDecoder for pairs with a draft model
+        self.speculative = None
+
+        self._pairs = {}
+        self._target_configs = {}
+        self._lock = threading.Lock()
+
+    def language_id(self, code):
+        """Return the tokenizer id of a FLORES-200 language code"""
+        token_id = self.tokenizer.convert_tokens_to_ids(code)
+        if token_id is None or token_id == self.tokenizer.unk_token_id:
+            raise ValueError(f"Unsupported language code: {code}")
+        return token_id
+
+    def pair_config(self, source_code, target_code):
+        """Get (or build once) the cached config for a language pair"""
+        key = (source_code, target_code)
+        config = self._pairs.get(key)
+        if config is not None:
+            return config
+
+        with self._lock:
+            config = self._pairs.get(key)
+            if config is None:
+                config = self._build_pair_config(source_code, target_code)
+                self._pairs[key] = config
+        return config
+
+    def _build_pair_config(self, source_code, target_code):
+        source_id = self.language_id(source_code)
+        eos_id = self.tokenizer.eos_token_id
+
+        # Mirror NllbTokenizer.set_src_lang_special_tokens
+        if getattr(self.tokenizer, 'legacy_behaviour', False):
+            prefix_ids, suffix_ids = [], [eos_id, source_id]
+        else:
+            prefix_ids, suffix_ids = [source_id], [eos_id]
+
+        # All pairs with the same target share one generation config
+        generation_config = self._target_configs.get(target_code)
+        if generation_config is None:
+            generation_config = copy.deepcopy(self.base_config)
+            generation_config.forced_bos_token_id = self.language_id(target_code)
+            self._target_configs[target_code] = generation_config
+
+        logger.debug(f"Built generation config for {source_code} -> {target_code}")
+        return PairConfig(source_code, target_code, prefix_ids, suffix_ids, generation_config)
+
+    def encode(self, texts, source_codes, target_code):
+        """Tokenize texts into a padded batch, one source language per row"""
+        token_lists = self.tokenizer(list(texts), add_special_tokens=False)['input_ids']
+
+        rows = []
+        for tokens, source_code in zip(token_lists, source_codes):
+            pair = self.pair_config(source_code, target_code)
+            room = self.max_length - len(pair.prefix_ids) - len(pair.suffix_ids)
+            rows.append(pair.prefix_ids + tokens[:room] + pair.suffix_ids)
+
+        width = max(len(row) for row in rows)
+        pad_id = self.tokenizer.pad_token_id
+        input_ids = torch.full((len(rows), width), pad_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(rows), width), dtype=torch.long)
+        for i, row in enumerate(rows):
+            input_ids[i, :len(row)] = torch.tensor(row, dtype=torch.long)
+            attention_mask[i, :len(row)] = 1
+
+        return input_ids.to(self.device), attention_mask.to(self.device)
+
+    def translate(self, texts, source_codes, target_code, **generate_kwargs):
+        """Translate a batch of texts into a single target language.
+
+        ``source_codes`` is either one code for the whole batch or one code
+        per text. Extra keyword arguments override the cached generation
+        config for this call only.
+        """
+        if not texts:
+            return []
+        if isinstance(source_codes, str):
+            source_codes = [source_codes] * len(texts)
+
+        input_ids, attention_mask = self.encode(texts, source_codes, target_code)
+        generation_config = self.pair_config(source_codes[0], target_code).generation_config
+        kwargs, plan = self.policy_kwargs(attention_mask, source_codes, [target_code], 1)
+        kwargs.update(generate_kwargs)
+
+        greedy = kwargs.get('num_beams', generation_config.num_beams) == 1
+        if (self.speculative is not None and len(texts) == 1 and not generate_kwargs and greedy
+                and self.speculative.supports(source_codes[0], target_code)):
+            # A lone sentence decoded greedily is latency bound: let the draft
+            # model save decoder passes, within the same budget and loop check
+            tokens = self.speculative.generate(
+                texts[0], source_codes[0], target_code, input_ids, attention_mask,
+                kwargs.get('max_length'), kwargs.get('stopping_criteria')
+            )
+            return self.decode(torch.tensor([tokens], dtype=torch.long), kwargs, plan)
+
+        with torch.inference_mode():
+            outputs = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                generation_config=generation_config,
+                **kwargs
+            )
+
+        return self.decode(outputs, kwargs, plan)
+
+    def translate_many(self, texts, source_code, target_codes, **generate_kwargs):
+        """Translate texts from one source language into several target languages.
+
+        The encoder runs once over the source texts. Its output is repeated
+        for every target in one batched decode where each row starts with its
+        own target language token instead of a single forced BOS token.
+        Returns one list of translations per target code.
+        """
+        if not texts or not target_codes:
+            return [[] for code in target_codes]
+
+        input_ids, attention_mask = self.encode(texts, [source_code] * len(texts), target_codes[0])
+        kwargs, plan = self.policy_kwargs(attention_mask, [source_code], target_codes, 2)
+        kwargs.update(generate_kwargs)
+
+        # Rows are target-major: every text once per target language
+        count = len(target_codes)
+        start_id = self.model.config.decoder_start_token_id
+        decoder_input_ids = torch.tensor(
+            [[start_id, self.language_id(code)] for code in target_codes for _ in texts],
+            dtype=torch.long,
+            device=self.device
+        )
+
+        with torch.inference_mode():
+            encoder_outputs = self.model.get_encoder()(
+                input_ids=input_ids,
+                attention_mask=attention_mask
+            )
+            encoder_outputs.last_hidden_state = encoder_outputs.last_hidden_state.repeat(count, 1, 1)
+
+            outputs = self.model.generate(
+                encoder_outputs=encoder_outputs,
+                attention_mask=attention_mask.repeat(count, 1),
+                decoder_input_ids=decoder_input_ids,
+                generation_config=self.fanout_config,
+                **kwargs
+            )
+
+        decoded = self.decode(outputs, kwargs, plan)
+        return [decoded[i * len(texts):(i + 1) * len(texts)] for i in range(count)]
+
+    def stream(self, text, source_code, target_code, on_text, **generate_kwargs):
+        """Translate greedily, calling ``on_text`` with each new piece of output.
+
+        Streaming only works with greedy search, so the beam setting is
+        ignored here. Returns the full translation.
+        """
+        input_ids, attention_mask = self.encode([text], [source_code], target_code)
+        generation_config = self.pair_config(source_code, target_code).generation_config
+        kwargs, plan = self.policy_kwargs(attention_mask, [source_code], [target_code], 1)
+        kwargs.update(generate_kwargs)
+        kwargs['num_beams'] = 1
+
+        with torch.inference_mode():
+            outputs = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                generation_config=generation_config,
+                streamer=CallbackStreamer(self.tokenizer, on_text),
+                **kwargs
+            )
+
+        return self.decode(outputs, kwargs, plan)[0]
+
+    def policy_kwargs(self, attention_mask, source_codes, target_codes, prefix_length):
+        """Per-call generate overrides from the decoding policy, if any"""
+        if self.policy is None or not self.policy.enabled:
+            return {}, None
+        source_lengths = attention_mask.sum(dim=1).tolist()
+        return self.policy.generation_kwargs(source_lengths, source_codes, target_codes, prefix_length)
+
+    def decode(self, outputs, kwargs=None, plan=None):
+        if plan is not None:
+            outputs = self.policy.finish(outputs, kwargs, plan)
+        return self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
@@ -0,0 +1,173 @@
+import asyncio
+import itertools
+import json
+import socket
+import struct
+import logging
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Frames are a 4-byte big-endian length followed by a UTF-8 JSON object
+HEADER = struct.Struct('!I')
+
+
+def encode_frame(payload):
+    data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    return HEADER.pack(len(data)) + data
+
+
+async def read_frame(reader):
+    header = await reader.readexactly(HEADER.size)
+    (length,) = HEADER.unpack(header)
+    return json.loads((await reader.readexactly(length)).decode('utf-8'))
+
+
+def _recv_exactly(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Inference server closed the connection")
+        data += chunk
+    return data
+
+
+def request_health(socket_path, timeout=1.0):
+    """Blocking health query for sync views; None when the server is unreachable"""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(socket_path)
+            sock.sendall(encode_frame({'id': 0, 'method': 'health'}))
+            (length,) = HEADER.unpack(_recv_exactly(sock, HEADER.size))
+            frame = json.loads(_recv_exactly(sock, length).decode('utf-8'))
+        return frame.get('result')
+    except (OSError, ValueError) as e:
+        logger.error(f"Inference server health check failed: {str(e)}")
+        return None
+
+
+class InferenceClient:
+    """Async client for ``manage.py run_inference_server``.
+
+    One Unix socket connection per event loop carries every request from
+    this process. Requests are tagged with an id so any number can be in
+    flight at once; the server spreads them over its model replicas.
+    """
+    _instance = None
+
+    @classmethod
+    def instance(cls):
+        """Shared client, or None when inference runs in-process"""
+        socket_path = settings.TRANSLATION_SETTINGS.get('INFERENCE_SERVER_SOCKET')
+        if not socket_path:
+            return None
+        if cls._instance is None:
+            cls._instance = cls(
+                socket_path,
+                timeout=settings.TRANSLATION_SETTINGS.get('INFERENCE_TIMEOUT', 60),
+                max_in_flight=settings.TRANSLATION_SETTINGS.get('INFERENCE_MAX_IN_FLIGHT', 4)
+            )
+        return cls._instance
+
+    def __init__(self, socket_path, timeout=60, max_in_flight=4):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._loop = None
+        self._writer = None
+        self._reader_task = None
+        self._connect_lock = None
+
+    async def _connection(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._writer = None
+            self._connect_lock = asyncio.Lock()
+
+        async with self._connect_lock:
+            if self._writer is None or self._writer.is_closing():
+                reader, self._writer = await asyncio.open_unix_connection(self.socket_path)
+                self._reader_task = loop.create_task(self._read_responses(reader))
+        return self._writer
+
+    async def _read_responses(self, reader):
+        try:
+            while True:
+                frame = await read_frame(reader)
+                target = self._pending.get(frame.get('id'))
+                if target is None:
+                    continue
+                if 'chunk' in frame:
+                    target.put_nowait(frame['chunk'])
+                    continue
+
+                self._pending.pop(frame['id'], None)
+                if isinstance(target, asyncio.Queue):
+                    target.put_nowait(frame)
+                elif 'error' in frame:
+                    target.set_exception(RuntimeError(frame['error']))
+                else:
+                    target.set_result(frame.get('result'))
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            logger.error(f"Lost connection to inference server: {str(e)}")
+        finally:
+            self._fail_pending(ConnectionError("Inference server connection closed"))
+            if self._writer is not None:
+                self._writer.close()
+
+    def _fail_pending(self, error):
+        pending, self._pending = self._pending, {}
+        for target in pending.values():
+            if isinstance(target, asyncio.Queue):
+                target.put_nowait({'error': str(error)})
+            elif not target.done():
+                target.set_exception(error)
+
+    async def _send(self, method, args, target, **options):
+        writer = await self._connection()
+        request_id = next(self._ids)
+        self._pending[request_id] = target
+        writer.write(encode_frame({'id': request_id, 'method': method, 'args': args, **options}))
+        await writer.drain()
+        return request_id
+
+    async def call(self, method, *args, **options):
+        future = asyncio.get_running_loop().create_future()
+        request_id = await self._send(method, list(args), future, **options)
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def translate(self, text, source_code, target_code):
+        return (await self.translate_batch([text], [source_code], target_code))[0]
+
+    async def translate_batch(self, texts, source_codes, target_code, load=0):
+        return await self.call('translate_batch', texts, source_codes, target_code, load=load)
+
+    async def translate_many(self, text, source_code, target_codes):
+        return await self.call('translate_many', text, source_code, target_codes)
+
+    async def stream(self, text, source_code, target_code):
+        """Async iterator over partial translations decoded by a replica"""
+        chunks = asyncio.Queue()
+        request_id = await self._send('stream_translate', [text, source_code, target_code], chunks)
+        try:
+            while True:
+                item = await asyncio.wait_for(chunks.get(), self.timeout)
+                if isinstance(item, dict):
+                    if 'error' in item:
+                        raise RuntimeError(item['error'])
+                    break
+                yield item
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def health(self):
+        return await self.call('health')
@@ -0,0 +1,215 @@
+import asyncio
+import itertools
+import multiprocessing
+import os
+import signal
+import threading
+import logging
+from django import db
+from .inference_client import encode_frame, read_frame
+
+logger = logging.getLogger(__name__)
+
+# Translator methods a client may call
+METHODS = {'translate_batch', 'translate_many', 'stream_translate'}
+
+
+def split_cores(cores, replicas):
+    """Divide the available cores into one contiguous group per replica"""
+    cores = sorted(cores)
+    replicas = max(1, min(replicas, len(cores)))
+    size, extra = divmod(len(cores), replicas)
+    groups = []
+    start = 0
+    for index in range(replicas):
+        end = start + size + (1 if index < extra else 0)
+        groups.append(cores[start:end])
+        start = end
+    return groups
+
+
+def exit_on_signal(signum, frame):
+    raise SystemExit(0)
+
+
+def run_replica(index, cores, jobs, results):
+    """Replica process: pin to its cores, load the model and serve jobs"""
+    # Leave through the finally below rather than dying on the spot
+    signal.signal(signal.SIGTERM, exit_on_signal)
+    os.sched_setaffinity(0, cores)
+    threads = str(len(cores))
+    os.environ['OMP_NUM_THREADS'] = threads
+    os.environ['MKL_NUM_THREADS'] = threads
+
+    import torch
+    torch.set_num_threads(len(cores))
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+
+    from .translation import Translator
+    from .persistence import WriteBehindQueue
+    translator = Translator()
+    translator.ensure_loaded()
+    results.put(('health', index, translator.health()))
+    logger.info(f"Inference replica {index} ready on cores {cores}")
+
+    try:
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            job_id, method, args, load = job
+            try:
+                if method == 'stream_translate':
+                    def on_text(chunk, job_id=job_id):
+                        results.put(('chunk', job_id, chunk))
+                    result = translator.stream_translate(*args, on_text=on_text)
+                else:
+                    translator.set_load(load)
+                    result = getattr(translator, method)(*args)
+                results.put(('result', job_id, result))
+            except Exception as e:
+                logger.error(f"Inference replica {index} error: {str(e)}")
+                results.put(('error', job_id, str(e)))
+    finally:
+        # Multiprocessing children exit through os._exit, which skips the
+        # queue's atexit hook: write the metrics still queued here
+        WriteBehindQueue.instance().close()
+
+
+class InferenceServer:
+    """Hosts model replicas behind a Unix socket.
+
+    Each replica is a separate process pinned to its own group of cores
+    with a matching thread count, so replicas do not compete for CPU and
+    none of them share a GIL with the ASGI workers. Requests from every
+    client connection go onto one shared job queue; whichever replica is
+    free takes the next job.
+
+    With ``preload`` the model is loaded once in this process before the
+    replicas are forked, so they share one copy of the weights.
+    """
+
+    def __init__(self, socket_path, replicas=2, cores=None, preload=False):
+        self.socket_path = socket_path
+        self.preload = preload
+        self.core_groups = split_cores(cores or os.sched_getaffinity(0), replicas)
+
+        context = multiprocessing.get_context('fork')
+        self.context = context
+        self.jobs = context.Queue()
+        self.results = context.Queue()
+        self.processes = []
+
+        self.replica_health = {}
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._loop = None
+
+    def start_replicas(self):
+        if self.preload:
+            # Replicas inherit the loaded weights and share their pages
+            from .translation import Translator
+            if not Translator().preload():
+                logger.error("Preloading the model failed, replicas will load their own copies")
+
+        # Forked children must not share the parent's database connections
+        db.connections.close_all()
+        for index, cores in enumerate(self.core_groups):
+            process = self.context.Process(
+                target=run_replica,
+                args=(index, cores, self.jobs, self.results),
+                name=f'inference-replica-{index}',
+                daemon=True
+            )
+            process.start()
+            self.processes.append(process)
+
+    def stop_replicas(self):
+        for _ in self.processes:
+            self.jobs.put(None)
+        for process in self.processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+
+    def serve(self):
+        # SIGTERM stops the replicas through the finally below, so they get
+        # to write their queued metrics
+        signal.signal(signal.SIGTERM, exit_on_signal)
+        self.start_replicas()
+        try:
+            asyncio.run(self._serve())
+        finally:
+            self.stop_replicas()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        threading.Thread(target=self._forward_results, name='inference-results', daemon=True).start()
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        logger.info(f"Inference server listening on {self.socket_path} with {len(self.processes)} replicas")
+        async with server:
+            await server.serve_forever()
+
+    def _forward_results(self):
+        """Move replica results from the process queue onto the event loop"""
+        while True:
+            message = self.results.get()
+            self._loop.call_soon_threadsafe(self._deliver, *message)
+
+    def _deliver(self, kind, job_id, value):
+        if kind == 'health':
+            self.replica_health[job_id] = value
+            return
+
+        target = self._pending.get(job_id)
+        if target is None:
+            return
+        writer, request_id = target
+        if kind != 'chunk':
+            del self._pending[job_id]
+        if not writer.is_closing():
+            writer.write(encode_frame({'id': request_id, kind: value}))
+
+    def health(self):
+        ready = sum(1 for health in self.replica_health.values() if health.get('ready'))
+        return {
+            'status': 'ready' if ready else 'loading',
+            'ready': ready > 0,
+            'replicas': len(self.processes),
+            'ready_replicas': ready,
+            'alive_replicas': sum(1 for process in self.processes if process.is_alive()),
+            'in_flight': len(self._pending),
+            'cores': self.core_groups,
+            # Measured by each replica once it was ready
+            'replica_memory': {index: health.get('memory') for index, health in self.replica_health.items()},
+        }
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request = await read_frame(reader)
+                method = request.get('method')
+                if method == 'health':
+                    writer.write(encode_frame({'id': request.get('id'), 'result': self.health()}))
+                elif method in METHODS:
+                    job_id = next(self._ids)
+                    self._pending[job_id] = (writer, request.get('id'))
+                    self.jobs.put((job_id, method, request.get('args', []), request.get('load', 0)))
+                else:
+                    writer.write(encode_frame({'id': request.get('id'), 'error': f"Unknown method {method}"}))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            # Results for a closed connection are dropped on arrival
+            for job_id, (job_writer, _) in list(self._pending.items()):
+                if job_writer is writer:
+                    del self._pending[job_id]
+            writer.close()
@@ -0,0 +1,222 @@
+import bisect
+import json
+import os
+import math
+import time
+import threading
+import logging
+from collections import Counter
+from django.conf import settings
+from .flores200_codes import flores_codes
+
+logger = logging.getLogger(__name__)
+
+# (first code point, last code point, script) sorted by first code point
+SCRIPT_RANGES = [
+    (0x0041, 0x024F, 'Latn'),
+    (0x0370, 0x03FF, 'Grek'),
+    (0x0400, 0x052F, 'Cyrl'),
+    (0x0530, 0x058F, 'Armn'),
+    (0x0590, 0x05FF, 'Hebr'),
+    (0x0600, 0x06FF, 'Arab'),
+    (0x0750, 0x077F, 'Arab'),
+    (0x0900, 0x097F, 'Deva'),
+    (0x0980, 0x09FF, 'Beng'),
+    (0x0A00, 0x0A7F, 'Guru'),
+    (0x0A80, 0x0AFF, 'Gujr'),
+    (0x0B00, 0x0B7F, 'Orya'),
+    (0x0B80, 0x0BFF, 'Taml'),
+    (0x0C00, 0x0C7F, 'Telu'),
+    (0x0C80, 0x0CFF, 'Knda'),
+    (0x0D00, 0x0D7F, 'Mlym'),
+    (0x0D80, 0x0DFF, 'Sinh'),
+    (0x0E00, 0x0E7F, 'Thai'),
+    (0x0E80, 0x0EFF, 'Laoo'),
+    (0x0F00, 0x0FFF, 'Tibt'),
+    (0x1000, 0x109F, 'Mymr'),
+    (0x10A0, 0x10FF, 'Geor'),
+    (0x1100, 0x11FF, 'Hang'),
+    (0x1200, 0x139F, 'Ethi'),
+    (0x1780, 0x17FF, 'Khmr'),
+    (0x1C50, 0x1C7F, 'Olck'),
+    (0x1E00, 0x1EFF, 'Latn'),
+    (0x2D30, 0x2D7F, 'Tfng'),
+    (0x3040, 0x30FF, 'Kana'),
+    (0x4E00, 0x9FFF, 'Hani'),
+    (0xAC00, 0xD7AF, 'Hang'),
+    (0xFB50, 0xFDFF, 'Arab'),
+    (0xFE70, 0xFEFF, 'Arab'),
+]
+_RANGE_STARTS = [start for start, _, _ in SCRIPT_RANGES]
+
+# Detected scripts that several FLORES script tags share
+SCRIPT_ALIASES = {
+    'Hani': {'Hans', 'Hant', 'Jpan'},
+    'Kana': {'Jpan'},
+}
+
+ALL_LANGUAGES = sorted(set(flores_codes.values()))
+
+
+def char_script(char):
+    point = ord(char)
+    index = bisect.bisect_right(_RANGE_STARTS, point) - 1
+    if index >= 0:
+        start, end, script = SCRIPT_RANGES[index]
+        if point <= end:
+            return script
+    return None
+
+
+def dominant_script(text):
+    """Most common script among the letters of text"""
+    counts = Counter(char_script(char) for char in text if char.isalpha())
+    counts.pop(None, None)
+    if not counts:
+        return None
+    # Any kana means Japanese even when kanji dominate
+    if counts.get('Kana'):
+        return 'Kana'
+    return counts.most_common(1)[0][0]
+
+
+def script_matches(language_code, script):
+    tag = language_code.split('_')[-1]
+    return tag == script or tag in SCRIPT_ALIASES.get(script, ())
+
+
+def text_ngrams(text, max_n):
+    text = ' ' + ' '.join(text.lower().split()) + ' '
+    for n in range(1, max_n + 1):
+        for i in range(len(text) - n + 1):
+            yield text[i:i + n]
+
+
+class LanguageIdentifier:
+    """Character n-gram language identifier over the FLORES-200 codes.
+
+    The profile file is produced offline by ``manage.py train_langid``. It
+    maps each n-gram to the languages it is frequent in, with log
+    probabilities, so scoring a chat message is a few dictionary lookups per
+    character. Without a profile only the Unicode script is used.
+
+    Candidates are narrowed to the room languages that share the message's
+    script, so most messages are decided among two or three languages.
+    """
+    _instance = None
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            cls._instance = cls.from_settings()
+        return cls._instance
+
+    @classmethod
+    def from_settings(cls):
+        options = settings.TRANSLATION_SETTINGS
+        return cls(
+            profile_path=options.get('LANGID_PROFILE'),
+            min_margin=options.get('LANGID_MIN_MARGIN', 0.3),
+            min_chars=options.get('LANGID_MIN_CHARS', 12),
+            enabled=options.get('LANGID_ENABLED', True)
+        )
+
+    def __init__(self, profile_path=None, min_margin=0.3, min_chars=12, max_chars=200, enabled=True):
+        self.min_margin = min_margin
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.enabled = enabled
+
+        self.max_n = 3
+        self.floor = -15.0
+        self.ngrams = {}
+        self.languages = ALL_LANGUAGES
+        if profile_path and os.path.exists(profile_path):
+            self.load(profile_path)
+
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.corrected = 0
+        self.translations_skipped = 0
+        self.total_seconds = 0.0
+
+    def load(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            profile = json.load(f)
+        self.max_n = profile['max_n']
+        self.floor = profile['floor']
+        self.ngrams = profile['ngrams']
+        self.languages = profile['languages']
+        logger.info(f"Loaded language ID profile for {len(self.languages)} languages")
+
+    def detect(self, text, candidates=None):
+        """Return (language_code, margin) or None when undecided.
+
+        ``margin`` is the average log-probability lead per n-gram of the best
+        language over the runner up; a script-only decision returns infinity.
+        """
+        sample = text[:self.max_chars]
+        script = dominant_script(sample)
+        if script is None:
+            return None
+
+        languages = [code for code in (candidates or self.languages) if script_matches(code, script)]
+        if not languages and candidates:
+            # The text is not in any script the caller expected
+            languages = [code for code in self.languages if script_matches(code, script)]
+        if len(languages) == 1:
+            return languages[0], math.inf
+        if not languages or not self.ngrams or len(sample.strip()) < self.min_chars:
+            return None
+
+        scores = dict.fromkeys(languages, 0.0)
+        count = 0
+        for ngram in text_ngrams(sample, self.max_n):
+            count += 1
+            weights = self.ngrams.get(ngram)
+            if not weights:
+                continue
+            for code in languages:
+                weight = weights.get(code)
+                if weight is not None:
+                    scores[code] += weight - self.floor
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        best, runner_up = ranked[0], ranked[1]
+        return best[0], (best[1] - runner_up[1]) / max(count, 1)
+
+    def resolve(self, text, source_code, target_codes):
+        """Correct the claimed source language and drop targets that need no translation.
+
+        Returns ``(source_code, target_codes)``.
+        """
+        if not self.enabled or not text:
+            return source_code, list(target_codes)
+
+        start = time.perf_counter()
+        detected = self.detect(text, candidates=set(target_codes) | {source_code})
+
+        if detected is not None:
+            code, margin = detected
+            if code != source_code and margin >= self.min_margin:
+                logger.debug(f"Language ID corrected {source_code} to {code}")
+                source_code = code
+                with self._lock:
+                    self.corrected += 1
+
+        remaining = [code for code in target_codes if code != source_code]
+        with self._lock:
+            self.checked += 1
+            self.translations_skipped += len(target_codes) - len(remaining)
+            self.total_seconds += time.perf_counter() - start
+
+        return source_code, remaining
+
+    def stats(self):
+        return {
+            'checked': self.checked,
+            'corrected': self.corrected,
+            'translations_skipped': self.translations_skipped,
+            'avg_ms': (self.total_seconds / self.checked) * 1000 if self.checked else 0,
+            'profile_languages': len(self.languages) if self.ngrams else 0,
+        }
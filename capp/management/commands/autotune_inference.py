@@ -0,0 +1,180 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.utils import timezone
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import logging
+
+from capp.backends import get_backend, apply_threads
+from capp.generation import GenerationEngine
+from capp.tuning import chat_workload
+
+logger = logging.getLogger(__name__)
+
+
+def int_list(value):
+    return [int(item) for item in value.split(',') if item.strip()]
+
+
+def default_threads():
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    counts = []
+    count = 1
+    while count < cores:
+        counts.append(count)
+        count *= 2
+    return ','.join(str(count) for count in counts + [cores])
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks thread counts, batch sizes and beam counts on a synthetic chat workload '
+            'and writes latency and throughput profiles for the Translator')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int_list, default=int_list(default_threads()),
+                            help='Comma separated intra-op thread counts')
+        parser.add_argument('--interop', type=int_list, default=[1, 2],
+                            help='Comma separated inter-op thread counts (one process each)')
+        parser.add_argument('--batch-sizes', type=int_list, default=[1, 4, 8, 16])
+        parser.add_argument('--beams', type=int_list, default=sorted({1, 2, 4, settings.NLLB_SETTINGS['NUM_BEAMS']}))
+        parser.add_argument('--messages', type=int, default=48, help='Synthetic messages per run')
+        parser.add_argument('--source', type=str, default='eng_Latn')
+        parser.add_argument('--target', type=str, default='sna_Latn')
+        parser.add_argument('--min-agreement', type=float, default=0.9,
+                            help='Share of outputs that must match the widest beam search')
+        parser.add_argument('--output', type=str, default=settings.NLLB_SETTINGS.get('TUNING_PROFILE'),
+                            help='Where to write the profile')
+        # Internal: benchmark one inter-op setting and write raw results
+        parser.add_argument('--interop-run', type=int, help=argparse.SUPPRESS)
+        parser.add_argument('--results-file', type=str, help=argparse.SUPPRESS)
+
+    def handle(self, *args, **kwargs):
+        if kwargs['interop_run']:
+            results = self.benchmark(kwargs, kwargs['interop_run'])
+            with open(kwargs['results_file'], 'w', encoding='utf-8') as f:
+                json.dump(results, f)
+            return
+
+        # Inter-op threads can only be set once per process, so each value
+        # gets a fresh process
+        results = []
+        for interop in kwargs['interop']:
+            self.stdout.write(f"Benchmarking with {interop} inter-op thread(s)...")
+            with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+                results_file = f.name
+            command = [
+                sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'autotune_inference',
+                '--interop-run', str(interop),
+                '--results-file', results_file,
+                '--threads', ','.join(map(str, kwargs['threads'])),
+                '--batch-sizes', ','.join(map(str, kwargs['batch_sizes'])),
+                '--beams', ','.join(map(str, kwargs['beams'])),
+                '--messages', str(kwargs['messages']),
+                '--source', kwargs['source'],
+                '--target', kwargs['target'],
+            ]
+            try:
+                subprocess.run(command, check=True)
+                with open(results_file, 'r', encoding='utf-8') as f:
+                    results.extend(json.load(f))
+            except (subprocess.CalledProcessError, OSError, ValueError) as e:
+                self.stdout.write(self.style.ERROR(f"Run with {interop} inter-op thread(s) failed: {str(e)}"))
+            finally:
+                if os.path.exists(results_file):
+                    os.unlink(results_file)
+
+        eligible = [result for result in results if result['agreement'] >= kwargs['min_agreement']]
+        if not eligible:
+            self.stdout.write(self.style.ERROR("No configuration met the agreement threshold"))
+            return
+
+        latency = min(eligible, key=lambda result: (result['p95_ms'], result['threads']))
+        throughput = max(eligible, key=lambda result: (result['sentences_per_second'], -result['threads']))
+        profile = {
+            'model': settings.NLLB_SETTINGS['MODEL_NAME'],
+            'backend': settings.TRANSLATION_SETTINGS.get('BACKEND', 'torch'),
+            'cores': len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count(),
+            'created': timezone.now().isoformat(),
+            'latency': self.settings_of(latency),
+            'throughput': self.settings_of(throughput),
+            'results': results,
+        }
+        with open(kwargs['output'], 'w', encoding='utf-8') as f:
+            json.dump(profile, f, indent=2)
+
+        for mode in ('latency', 'throughput'):
+            best = latency if mode == 'latency' else throughput
+            self.stdout.write(
+                f"{mode}: threads={best['threads']} interop={best['interop_threads']} "
+                f"batch={best['batch_size']} beams={best['num_beams']} "
+                f"p95={best['p95_ms']:.1f}ms {best['sentences_per_second']:.1f} sentences/s"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Tuning profile saved to {kwargs['output']}"))
+        self.stdout.write("Select a mode with NLLB_SETTINGS['TUNING_MODE']")
+
+    def settings_of(self, result):
+        return {key: result[key] for key in ('threads', 'interop_threads', 'batch_size', 'num_beams')}
+
+    def benchmark(self, kwargs, interop):
+        apply_threads(max(kwargs['threads']), interop)
+        backend = get_backend(settings.NLLB_SETTINGS['MODEL_NAME'])
+        model, tokenizer, device = backend.load()
+        engine = GenerationEngine(
+            model,
+            tokenizer,
+            device,
+            max_length=settings.NLLB_SETTINGS['MAX_LENGTH'],
+            num_beams=settings.NLLB_SETTINGS['NUM_BEAMS'],
+            early_stopping=settings.NLLB_SETTINGS['EARLY_STOPPING']
+        )
+
+        source, target = kwargs['source'], kwargs['target']
+        messages = chat_workload(kwargs['messages'])
+
+        # Outputs of the widest beam search are the quality reference
+        reference = [engine.translate([message], source, target, num_beams=max(kwargs['beams']))[0]
+                     for message in messages]
+
+        results = []
+        for threads in kwargs['threads']:
+            apply_threads(threads)
+            for num_beams in kwargs['beams']:
+                for batch_size in kwargs['batch_sizes']:
+                    # One untimed call so allocation costs stay out of the numbers
+                    engine.translate(messages[:batch_size], source, target, num_beams=num_beams)
+
+                    outputs = []
+                    latencies = []
+                    start = time.perf_counter()
+                    for offset in range(0, len(messages), batch_size):
+                        batch = messages[offset:offset + batch_size]
+                        call_start = time.perf_counter()
+                        outputs.extend(engine.translate(batch, source, target, num_beams=num_beams))
+                        # Every message in a batch waits for the whole call
+                        latencies.extend([(time.perf_counter() - call_start) * 1000] * len(batch))
+                    elapsed = time.perf_counter() - start
+
+                    latencies.sort()
+                    result = {
+                        'threads': threads,
+                        'interop_threads': interop,
+                        'batch_size': batch_size,
+                        'num_beams': num_beams,
+                        'p50_ms': statistics.median(latencies),
+                        'p95_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                        'sentences_per_second': len(messages) / elapsed,
+                        'agreement': sum(a == b for a, b in zip(outputs, reference)) / len(messages),
+                    }
+                    results.append(result)
+                    self.stdout.write(
+                        f"threads={threads} interop={interop} batch={batch_size} beams={num_beams}: "
+                        f"p95={result['p95_ms']:.1f}ms {result['sentences_per_second']:.1f}/s "
+                        f"agreement={result['agreement']:.2f}"
+                    )
+        return results
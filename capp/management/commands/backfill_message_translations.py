@@ -0,0 +1,104 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from capp.models import Message, MessageTranslation, Room, UserProfile
+from capp.translation import Translator
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = ('Stores translations of existing messages into the languages of each room\'s members. '
+            'Messages that already have a translation are skipped, so an interrupted run can simply be restarted')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, nargs='*', help='Room ids; all rooms by default')
+        parser.add_argument('--batch-size', type=int, default=100, help='Messages translated per batch')
+        parser.add_argument('--start-after', type=int, default=0, help='Skip messages up to this id')
+        parser.add_argument('--dry-run', action='store_true', help='Count missing translations without translating')
+
+    def room_languages(self, room):
+        """Languages present in a room: its members' preferences and the languages they write in"""
+        preferred = UserProfile.objects.filter(user__user_messages__room=room).values_list('preferred_language', flat=True)
+        written = Message.objects.filter(room=room).values_list('language', flat=True)
+        return sorted(set(preferred) | set(written))
+
+    def handle(self, *args, **kwargs):
+        batch_size = kwargs['batch_size']
+        dry_run = kwargs['dry_run']
+        model_id = settings.TRANSLATION_SETTINGS.get('PRIMARY_MODEL', 'nllb')
+
+        translator = None
+        if not dry_run:
+            translator = Translator()
+            if not translator.ensure_loaded():
+                self.stdout.write(self.style.ERROR("Translator model is not loaded"))
+                return
+
+        rooms = Room.objects.order_by('id')
+        if kwargs['rooms']:
+            rooms = rooms.filter(id__in=kwargs['rooms'])
+
+        total_stored = total_missing = 0
+        start = time.time()
+        for room in rooms:
+            languages = self.room_languages(room)
+            if len(languages) < 2:
+                continue
+            self.stdout.write(f"Room {room.id} ({room.name}): {', '.join(languages)}")
+
+            last_id = kwargs['start_after']
+            while True:
+                batch = list(Message.objects.filter(room=room, id__gt=last_id)
+                             .order_by('id')
+                             .values_list('id', 'content', 'language')[:batch_size])
+                if not batch:
+                    break
+                last_id = batch[-1][0]
+
+                existing = set(MessageTranslation.objects
+                               .filter(message_id__in=[row[0] for row in batch])
+                               .values_list('message_id', 'target_language'))
+
+                rows = []
+                for target_language in languages:
+                    missing = [
+                        (message_id, content, language) for message_id, content, language in batch
+                        if language != target_language and content
+                        and (message_id, target_language) not in existing
+                    ]
+                    total_missing += len(missing)
+                    if dry_run or not missing:
+                        continue
+
+                    try:
+                        translations = translator.translate_batch(
+                            [content for _, content, _ in missing],
+                            [language for _, _, language in missing],
+                            target_language
+                        )
+                    except Exception as e:
+                        logger.error(f"Error translating messages up to {last_id} into {target_language}: {str(e)}")
+                        continue
+
+                    rows.extend(
+                        MessageTranslation(message_id=message_id, target_language=target_language,
+                                           text=translation, model_id=model_id)
+                        for (message_id, content, _), translation in zip(missing, translations)
+                        # Unchanged text means the translation failed
+                        if translation and translation != content
+                    )
+
+                if rows:
+                    MessageTranslation.objects.bulk_create(rows)
+                    total_stored += len(rows)
+                self.stdout.write(f"  up to message {last_id}: {len(rows)} translations stored")
+
+        elapsed = time.time() - start
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(f"{total_missing} translations missing"))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Stored {total_stored} of {total_missing} missing translations in {elapsed:.1f}s"
+            ))
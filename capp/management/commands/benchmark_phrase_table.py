@@ -0,0 +1,98 @@
+from django.core.management.base import BaseCommand
+import random
+import string
+import time
+import logging
+
+from capp.shona_translations import build_phrase_tables
+
+logger = logging.getLogger(__name__)
+
+
+def random_word(rng):
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9)))
+
+
+def synthetic_entries(count, rng):
+    """English to Shona pairs of one to four words each"""
+    for _ in range(count):
+        english = ' '.join(random_word(rng) for _ in range(rng.randint(1, 4)))
+        shona = ' '.join(random_word(rng) for _ in range(rng.randint(1, 4)))
+        yield english, shona
+
+
+def legacy_translate_from_shona(text, translations):
+    """The dictionary scan used before the phrase table, for comparison"""
+    text = text.lower().strip()
+    reverse_dict = {v: k for k, v in translations.items()}
+    if text in reverse_dict:
+        return reverse_dict[text]
+    words = text.split()
+    translated_words = []
+    i = 0
+    while i < len(words):
+        for j in range(min(4, len(words) - i), 0, -1):
+            phrase = ' '.join(words[i:i + j])
+            if phrase in reverse_dict:
+                translated_words.append(reverse_dict[phrase])
+                i += j
+                break
+        else:
+            translated_words.append(words[i])
+            i += 1
+    return ' '.join(translated_words)
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks phrase table lookups against table size and text length'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=str, default='1000,100000,500000',
+                            help='Comma separated numbers of phrases')
+        parser.add_argument('--lengths', type=str, default='10,100,1000',
+                            help='Comma separated text lengths in words')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--legacy', action='store_true',
+                            help='Also time the old per-call reverse dictionary lookup')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **kwargs):
+        rng = random.Random(kwargs['seed'])
+        lengths = [int(length) for length in kwargs['lengths'].split(',')]
+        iterations = kwargs['iterations']
+
+        self.stdout.write(f"{'Phrases':>10}{'Build s':>10}{'Words':>8}{'Lookup ms':>12}{'us/word':>10}{'Legacy ms':>12}")
+        for size in [int(size) for size in kwargs['sizes'].split(',')]:
+            entries = list(synthetic_entries(size, rng))
+            start = time.perf_counter()
+            to_shona, from_shona = build_phrase_tables(entries)
+            build_seconds = time.perf_counter() - start
+
+            # Texts mixing known Shona phrases and unknown words
+            vocabulary = [shona for _, shona in entries[:1000]] + [random_word(rng) for _ in range(200)]
+            for length in lengths:
+                words = []
+                while len(words) < length:
+                    words.extend(rng.choice(vocabulary).split())
+                text = ' '.join(words[:length])
+
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    from_shona.translate(text)
+                lookup_ms = (time.perf_counter() - start) * 1000 / iterations
+
+                legacy = ''
+                if kwargs['legacy']:
+                    translations = dict(entries)
+                    start = time.perf_counter()
+                    legacy_translate_from_shona(text, translations)
+                    legacy = f"{(time.perf_counter() - start) * 1000:.1f}"
+
+                self.stdout.write(
+                    f"{from_shona.size:>10}{build_seconds:>10.2f}{length:>8}"
+                    f"{lookup_ms:>12.3f}{lookup_ms * 1000 / length:>10.2f}{legacy:>12}"
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            "Per-word lookup time should stay flat as the table grows and total time grow linearly with length"
+        ))
@@ -0,0 +1,93 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+import statistics
+import time
+import logging
+
+from capp.translation import Translator
+from capp.speculative import DraftModel, SpeculativeDecoder
+
+logger = logging.getLogger(__name__)
+
+CHAT_MESSAGES = [
+    "Hello, how are you?",
+    "Thank you very much.",
+    "Ok see you tomorrow",
+    "Where are you now?",
+    "I am going to the market.",
+    "Can we move the meeting to three o'clock?",
+    "Please call me when you get home.",
+    "The children are at school today.",
+    "I have sent the documents to your email, please check them.",
+    "We will meet at the church on Sunday morning.",
+]
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks speculative decoding with a draft model against plain greedy and beam search'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=3)
+        parser.add_argument('--source', type=str, default='eng_Latn')
+        parser.add_argument('--target', type=str, default='sna_Latn')
+        parser.add_argument('--draft', type=str, default=None,
+                            help='Draft model registry key; defaults to the DRAFT_MODELS entry for the pair')
+        parser.add_argument('--draft-tokens', type=int, default=settings.NLLB_SETTINGS.get('SPECULATIVE_TOKENS', 8))
+
+    def handle(self, *args, **kwargs):
+        source, target = kwargs['source'], kwargs['target']
+        iterations = kwargs['iterations']
+
+        draft_name = kwargs['draft']
+        if draft_name is None:
+            for draft_source, draft_target, key in settings.NLLB_SETTINGS.get('DRAFT_MODELS', []):
+                if (draft_source, draft_target) == (source, target):
+                    draft_name = key
+        if draft_name is None:
+            self.stdout.write(self.style.ERROR(f"No draft model configured for {source} -> {target}"))
+            return
+
+        translator = Translator()
+        if not translator.ensure_loaded():
+            self.stdout.write(self.style.ERROR("Translator model is not loaded"))
+            return
+        engine = translator.engine
+        speculative = SpeculativeDecoder(
+            engine, {(source, target): DraftModel(draft_name)}, kwargs['draft_tokens']
+        )
+
+        def timed(function, text):
+            times = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                output = function(text)
+                times.append((time.perf_counter() - start) * 1000)
+            return output, statistics.median(times)
+
+        greedy_ms, speculative_ms, beam_ms = [], [], []
+        identical = 0
+        for text in CHAT_MESSAGES:
+            greedy, greedy_time = timed(lambda text: engine.translate([text], source, target, num_beams=1)[0], text)
+            guessed, speculative_time = timed(lambda text: speculative.translate(text, source, target), text)
+            _, beam_time = timed(lambda text: engine.translate([text], source, target, num_beams=translator.num_beams)[0], text)
+
+            greedy_ms.append(greedy_time)
+            speculative_ms.append(speculative_time)
+            beam_ms.append(beam_time)
+            if guessed == greedy:
+                identical += 1
+            else:
+                self.stdout.write(self.style.WARNING(f"Differs: {text!r}\n  greedy:      {greedy}\n  speculative: {guessed}"))
+
+        stats = speculative.stats()
+        self.stdout.write(f"Draft model:          {draft_name} ({kwargs['draft_tokens']} tokens per pass)")
+        self.stdout.write(f"Beam search ({translator.num_beams}):      {statistics.mean(beam_ms):.1f} ms/message")
+        self.stdout.write(f"Greedy:               {statistics.mean(greedy_ms):.1f} ms/message")
+        self.stdout.write(f"Speculative:          {statistics.mean(speculative_ms):.1f} ms/message "
+                          f"(draft {stats['avg_draft_ms']:.1f} ms)")
+        self.stdout.write(f"Accepted draft tokens: {stats['acceptance_rate']:.1f}%")
+        self.stdout.write(f"Tokens per NLLB pass: {stats['tokens_per_pass']:.2f}")
+        self.stdout.write(f"Same output as greedy: {identical}/{len(CHAT_MESSAGES)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Speedup over greedy: {statistics.mean(greedy_ms) / statistics.mean(speculative_ms):.2f}x"
+        ))
@@ -0,0 +1,92 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from transformers import pipeline
+import statistics
+import time
+import logging
+
+from capp.translation import Translator
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_MESSAGES = [
+    "Hello, how are you?",
+    "Thank you very much.",
+    "Ok see you tomorrow",
+    "Can we move the meeting to three o'clock?",
+    "I have sent the documents to your email, please check them.",
+]
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks per-call translation overhead of the pipeline path against the generation engine'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--source', type=str, default='eng_Latn')
+        parser.add_argument('--target', type=str, default='sna_Latn')
+
+    def handle(self, *args, **kwargs):
+        iterations = kwargs['iterations']
+        source, target = kwargs['source'], kwargs['target']
+
+        translator = Translator()
+        if not translator.ensure_loaded():
+            self.stdout.write(self.style.ERROR("Translator model is not loaded"))
+            return
+
+        generate_kwargs = {
+            'max_length': settings.NLLB_SETTINGS['MAX_LENGTH'],
+            'num_beams': settings.NLLB_SETTINGS['NUM_BEAMS'],
+            'early_stopping': settings.NLLB_SETTINGS['EARLY_STOPPING'],
+        }
+
+        def pipeline_setup():
+            return pipeline('translation', model=translator.model, tokenizer=translator.tokenizer,
+                            src_lang=source, tgt_lang=target)
+
+        def pipeline_call(text):
+            return pipeline_setup()(text, **generate_kwargs)[0]['translation_text']
+
+        def engine_setup():
+            return translator.engine.pair_config(source, target)
+
+        def engine_call(text):
+            return translator.engine.translate([text], source, target)[0]
+
+        # Warm both paths so first-run allocations are not counted
+        pipeline_call(SAMPLE_MESSAGES[0])
+        engine_call(SAMPLE_MESSAGES[0])
+
+        results = {
+            'pipeline setup': self.time_calls(lambda text: pipeline_setup(), iterations),
+            'engine setup': self.time_calls(lambda text: engine_setup(), iterations),
+            'pipeline translate': self.time_calls(pipeline_call, iterations),
+            'engine translate': self.time_calls(engine_call, iterations),
+        }
+
+        self.stdout.write(f"{source} -> {target}, {iterations} calls per row")
+        self.stdout.write(f"{'path':<20}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+        for name, timings in results.items():
+            self.stdout.write(
+                f"{name:<20}{statistics.mean(timings):>10.2f}"
+                f"{statistics.median(timings):>10.2f}{self.percentile(timings, 95):>10.2f}"
+            )
+
+        saved = statistics.mean(results['pipeline translate']) - statistics.mean(results['engine translate'])
+        self.stdout.write(self.style.SUCCESS(f"Per-call overhead removed: {saved:.2f} ms"))
+
+    def time_calls(self, fn, iterations):
+        """Return per-call wall time in milliseconds"""
+        timings = []
+        for i in range(iterations):
+            text = SAMPLE_MESSAGES[i % len(SAMPLE_MESSAGES)]
+            start = time.perf_counter()
+            fn(text)
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    def percentile(self, values, pct):
+        ordered = sorted(values)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
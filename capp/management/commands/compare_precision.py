@@ -0,0 +1,112 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+import io
+import json
+import os
+import time
+import torch
+import logging
+
+from capp.model_evaluation import ModelEvaluator
+from capp.backends import PRECISION_MODES, apply_precision
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks NLLB precision modes on CPU and compares their quality with ModelEvaluator'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--test-file',
+            type=str,
+            help='Path to test data file',
+            default='test_data/language_pairs.json'
+        )
+        parser.add_argument(
+            '--modes',
+            type=str,
+            default=','.join(PRECISION_MODES),
+            help='Comma separated precision modes to compare'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            default='precision_report.json',
+            help='Where to record the comparison'
+        )
+
+    def handle(self, *args, **kwargs):
+        test_file = kwargs['test_file']
+        if not os.path.exists(test_file):
+            self.stdout.write(self.style.ERROR(f"Test file not found: {test_file}"))
+            return
+
+        model_name = settings.NLLB_SETTINGS['MODEL_NAME']
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+        report = {}
+        for mode in kwargs['modes'].split(','):
+            mode = mode.strip()
+            self.stdout.write(f"Evaluating {mode}...")
+
+            start = time.perf_counter()
+            model = AutoModelForSeq2SeqLM.from_pretrained(model_name).eval()
+            model = apply_precision(model, mode, 'cpu')
+            load_time = time.perf_counter() - start
+
+            evaluator = ModelEvaluator(models={mode: {'tokenizer': tokenizer, 'model': model}},
+                                       test_file=test_file)
+            if not evaluator.test_data:
+                self.stdout.write(self.style.ERROR("No test pairs found"))
+                return
+
+            # Warm up once so the first sentence does not pay allocation costs
+            pair = evaluator.test_data[0]
+            evaluator.translate_text(mode, pair['source_text'], pair['source_lang'], pair['target_lang'])
+
+            start = time.perf_counter()
+            with torch.inference_mode():
+                results = evaluator.evaluate_models()
+            elapsed = time.perf_counter() - start
+
+            if mode not in results:
+                self.stdout.write(self.style.WARNING(f"{mode} produced no translations"))
+                continue
+
+            report[mode] = {
+                'load_seconds': load_time,
+                'size_mb': self.model_size_mb(model),
+                'ms_per_sentence': elapsed * 1000 / len(evaluator.test_data),
+                'avg_bleu': results[mode]['avg_bleu'],
+                'avg_meteor': results[mode]['avg_meteor'],
+                'accuracy': results[mode]['accuracy'],
+            }
+            del model, evaluator
+
+        if not report:
+            return
+
+        baseline = report.get('fp32')
+        self.stdout.write(f"{'mode':<14}{'size MB':>10}{'ms/sent':>10}{'BLEU':>8}{'METEOR':>8}{'speedup':>9}")
+        for mode, row in report.items():
+            speedup = baseline['ms_per_sentence'] / row['ms_per_sentence'] if baseline else 1.0
+            row['speedup_vs_fp32'] = speedup
+            if baseline:
+                row['bleu_delta_vs_fp32'] = row['avg_bleu'] - baseline['avg_bleu']
+            self.stdout.write(
+                f"{mode:<14}{row['size_mb']:>10.0f}{row['ms_per_sentence']:>10.1f}"
+                f"{row['avg_bleu']:>8.4f}{row['avg_meteor']:>8.4f}{speedup:>8.2f}x"
+            )
+
+        with open(kwargs['output'], 'w', encoding='utf-8') as f:
+            json.dump({'model': model_name, 'test_file': test_file, 'modes': report}, f, indent=4)
+
+        self.stdout.write(self.style.SUCCESS(f"Comparison saved to {kwargs['output']}"))
+
+    def model_size_mb(self, model):
+        """Serialized state dict size, which also counts packed int8 weights"""
+        buffer = io.BytesIO()
+        torch.save(model.state_dict(), buffer)
+        return buffer.tell() / (1024 * 1024)
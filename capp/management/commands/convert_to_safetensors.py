@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Converts the NLLB checkpoint to a single safetensors file for the mmap load mode'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            type=str,
+            default=settings.NLLB_SETTINGS['MODEL_NAME'],
+            help='Hugging Face model id or local path to convert'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=settings.TRANSLATION_MODELS['SAFETENSORS_PATH'],
+            help='Directory to write the converted model to'
+        )
+
+    def handle(self, *args, **kwargs):
+        model_name = kwargs['model']
+        output_dir = kwargs['output']
+        os.makedirs(output_dir, exist_ok=True)
+
+        try:
+            self.stdout.write(f"Converting {model_name} to safetensors...")
+
+            model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+            # One unsharded file keeps the memory map simple
+            model.save_pretrained(output_dir, safe_serialization=True, max_shard_size='100GB')
+            tokenizer.save_pretrained(output_dir)
+
+            self.stdout.write(self.style.SUCCESS(f"Safetensors model saved to {output_dir}"))
+            self.stdout.write("Set NLLB_SETTINGS['LOAD_MODE'] = 'mmap' to use it")
+
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"Failed to convert {model_name}: {str(e)}"))
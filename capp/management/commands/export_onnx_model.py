@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from transformers import AutoTokenizer
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Exports the NLLB model to ONNX (encoder plus KV-cache decoder) for the onnx backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            type=str,
+            default=settings.NLLB_SETTINGS['MODEL_NAME'],
+            help='Hugging Face model id or local path to export'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=settings.TRANSLATION_MODELS['ONNX_PATH'],
+            help='Directory to write the ONNX model to'
+        )
+
+    def handle(self, *args, **kwargs):
+        try:
+            from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        except ImportError:
+            self.stdout.write(self.style.ERROR(
+                "ONNX export needs `pip install optimum[onnxruntime]`"
+            ))
+            return
+
+        model_name = kwargs['model']
+        output_dir = kwargs['output']
+        os.makedirs(output_dir, exist_ok=True)
+
+        try:
+            self.stdout.write(f"Exporting {model_name} to ONNX...")
+
+            # use_cache exports the decoder with past key values as well
+            model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True, use_cache=True)
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+            model.save_pretrained(output_dir)
+            tokenizer.save_pretrained(output_dir)
+
+            self.stdout.write(self.style.SUCCESS(f"ONNX model saved to {output_dir}"))
+            self.stdout.write("Set TRANSLATION_SETTINGS['BACKEND'] = 'onnx' to use it")
+
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"Failed to export {model_name}: {str(e)}"))
@@ -0,0 +1,123 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from django import db
+import multiprocessing
+import os
+import statistics
+import time
+import logging
+
+from capp.backends import LOAD_MODES, process_memory
+from capp.translation import Translator
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_MESSAGE = "Can we move the meeting to three o'clock?"
+
+
+def run_worker(preloaded, source, target, barrier, results):
+    start = time.perf_counter()
+    translator = Translator()
+    if not preloaded and not translator.preload():
+        results.put({'error': translator.error})
+        barrier.abort()
+        return
+    load_seconds = time.perf_counter() - start
+
+    # Touch every layer once, like serving the first message would
+    translator.engine.translate([SAMPLE_MESSAGE], source, target)
+
+    # Measure while all workers are alive, so shared pages count as shared
+    try:
+        barrier.wait()
+        results.put({'load_seconds': load_seconds, **process_memory()})
+        barrier.wait()
+    except multiprocessing.BrokenBarrierError:
+        pass
+
+
+def run_master(load_mode, prefork, workers, source, target, results):
+    """One scenario: optionally load in this process, then fork the workers"""
+    settings.NLLB_SETTINGS['LOAD_MODE'] = load_mode
+    master_seconds = 0.0
+    if prefork:
+        start = time.perf_counter()
+        if not Translator().preload():
+            results.put({'error': Translator().error})
+            return
+        master_seconds = time.perf_counter() - start
+
+    context = multiprocessing.get_context('fork')
+    barrier = context.Barrier(workers)
+    processes = [
+        context.Process(target=run_worker, args=(prefork, source, target, barrier, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    results.put({'master_seconds': master_seconds})
+
+
+class Command(BaseCommand):
+    help = 'Reports startup time and per-worker unique memory for the model load modes, with and without pre-fork loading'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--modes', type=str, default=','.join(LOAD_MODES),
+                            help='Comma separated load modes to compare')
+        parser.add_argument('--no-prefork', action='store_true', help='Skip the pre-fork scenarios')
+        parser.add_argument('--source', type=str, default='eng_Latn')
+        parser.add_argument('--target', type=str, default='sna_Latn')
+
+    def handle(self, *args, **kwargs):
+        workers = kwargs['workers']
+        scenarios = []
+        for mode in kwargs['modes'].split(','):
+            mode = mode.strip()
+            if mode == 'mmap' and not os.path.isdir(settings.TRANSLATION_MODELS['SAFETENSORS_PATH']):
+                self.stdout.write(self.style.WARNING("Skipping mmap: run `manage.py convert_to_safetensors` first"))
+                continue
+            scenarios.append((mode, False))
+            if not kwargs['no_prefork']:
+                scenarios.append((mode, True))
+
+        # Forked processes must not share our database connection
+        db.connections.close_all()
+        context = multiprocessing.get_context('fork')
+
+        self.stdout.write(f"{'Scenario':<18}{'Startup s':>10}{'USS MB':>10}{'PSS MB':>10}{'RSS MB':>10}  per worker")
+        for mode, prefork in scenarios:
+            name = f"{mode}{' + prefork' if prefork else ''}"
+            results = context.Queue()
+            master = context.Process(
+                target=run_master,
+                args=(mode, prefork, workers, kwargs['source'], kwargs['target'], results)
+            )
+            master.start()
+
+            reports = []
+            master_seconds = None
+            error = None
+            while master_seconds is None and error is None:
+                report = results.get()
+                if 'error' in report:
+                    error = report['error']
+                elif 'master_seconds' in report:
+                    master_seconds = report['master_seconds']
+                else:
+                    reports.append(report)
+            master.join()
+
+            if error or not reports:
+                self.stdout.write(self.style.ERROR(f"{name}: failed ({error or 'no workers reported'})"))
+                continue
+
+            startup = master_seconds + max(report['load_seconds'] for report in reports)
+            self.stdout.write(
+                f"{name:<18}{startup:>10.1f}"
+                f"{statistics.mean(report['uss_mb'] for report in reports):>10.0f}"
+                f"{statistics.mean(report['pss_mb'] for report in reports):>10.0f}"
+                f"{statistics.mean(report['rss_mb'] for report in reports):>10.0f}"
+            )
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+import os
+import logging
+
+from capp.inference_server import InferenceServer
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Runs the translation models in separate core-pinned processes behind a Unix socket'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--socket',
+            type=str,
+            default=settings.TRANSLATION_SETTINGS.get('INFERENCE_SERVER_SOCKET') or '/tmp/biznest-inference.sock',
+            help='Unix socket path the ASGI workers connect to'
+        )
+        parser.add_argument(
+            '--replicas',
+            type=int,
+            default=settings.TRANSLATION_SETTINGS.get('INFERENCE_REPLICAS', 2),
+            help='Model replicas; the available cores are split evenly between them'
+        )
+        parser.add_argument(
+            '--no-preload',
+            action='store_true',
+            help='Let every replica load its own copy of the model'
+        )
+
+    def handle(self, *args, **kwargs):
+        cores = sorted(os.sched_getaffinity(0))
+        preload = settings.TRANSLATION_SETTINGS.get('INFERENCE_PRELOAD', True) and not kwargs['no_preload']
+        server = InferenceServer(kwargs['socket'], replicas=kwargs['replicas'], cores=cores, preload=preload)
+        for index, group in enumerate(server.core_groups):
+            self.stdout.write(f"Replica {index}: cores {group}")
+
+        self.stdout.write(self.style.SUCCESS(f"Serving translations on {kwargs['socket']}"))
+        self.stdout.write("Set TRANSLATION_SETTINGS['INFERENCE_SERVER_SOCKET'] to this path in the ASGI workers")
+        try:
+            server.serve()
+        except KeyboardInterrupt:
+            self.stdout.write("Inference server stopped")
@@ -1,10 +1,10 @@
 from django.core.management.base import BaseCommand
-from django.conf import settings
 import os
 import json
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
 import logging
 
+from capp.model_registry import ModelRegistry
+
 logger = logging.getLogger(__name__)
 
 class Command(BaseCommand):
@@ -32,18 +32,23 @@ class Command(BaseCommand):
             with open(test_file, 'r', encoding='utf-8') as f:
                 test_data = json.load(f)
             
-            # Load models
-            models = self.load_models()
-            if not models:
+            # Find models
+            model_names = self.downloaded_models()
+            if not model_names:
                 self.stdout.write(self.style.ERROR("No models available for testing"))
                 return
             
-            # Test each model
+            # Test each model, holding only the one under test
+            registry = ModelRegistry.instance()
             results = {}
-            for model_name, model_info in models.items():
+            for model_name in model_names:
                 self.stdout.write(f"Testing {model_name} model...")
-                model_results = self.test_model(model_info, test_data['test_pairs'])
-                results[model_name] = model_results
+                try:
+                    with registry.use(model_name) as loaded:
+                        model_info = {'tokenizer': loaded.tokenizer, 'model': loaded.model}
+                        results[model_name] = self.test_model(model_info, test_data['test_pairs'])
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f"Error loading {model_name} model: {str(e)}"))
             
             # Generate report
             self.generate_report(results)
@@ -51,27 +56,10 @@ class Command(BaseCommand):
         except Exception as e:
             self.stdout.write(self.style.ERROR(f"Error during testing: {str(e)}"))
 
-    def load_models(self):
-        """Load available translation models"""
-        models = {}
-        config_file = settings.TRANSLATION_MODELS['CONFIG_FILE']
-        
-        try:
-            with open(config_file, 'r') as f:
-                models_config = json.load(f)
-                
-            for model_key, info in models_config.items():
-                if info['status'] == 'downloaded':
-                    models[model_key] = {
-                        'tokenizer': AutoTokenizer.from_pretrained(info['path']),
-                        'model': AutoModelForSeq2SeqLM.from_pretrained(info['path'])
-                    }
-                    self.stdout.write(f"Loaded {model_key} model")
-                    
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f"Error loading models: {str(e)}"))
-            
-        return models
+    def downloaded_models(self):
+        """Names of the downloaded translation models"""
+        registry = ModelRegistry.instance()
+        return [model_key for model_key, spec in registry.specs.items() if spec.downloaded]
 
     def test_model(self, model_info, test_pairs):
         """Test a single model on test data"""
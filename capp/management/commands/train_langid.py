@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from collections import Counter, defaultdict
+import json
+import math
+import os
+import logging
+
+from capp.flores200_codes import flores_codes
+from capp.langid import text_ngrams
+from capp.models import Message
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Trains the character n-gram language ID profile over the FLORES-200 languages'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--flores-dir',
+            type=str,
+            help='Directory of FLORES-200 files named <code>.dev / <code>.devtest'
+        )
+        parser.add_argument(
+            '--from-messages',
+            action='store_true',
+            help='Also train on stored chat messages using their language field'
+        )
+        parser.add_argument('--max-n', type=int, default=3)
+        parser.add_argument('--top', type=int, default=2000, help='N-grams kept per language')
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=settings.TRANSLATION_SETTINGS.get('LANGID_PROFILE'),
+            help='Where to write the profile'
+        )
+
+    def handle(self, *args, **kwargs):
+        codes = set(flores_codes.values())
+        max_n = kwargs['max_n']
+        counts = defaultdict(Counter)
+
+        if kwargs['flores_dir']:
+            for filename in sorted(os.listdir(kwargs['flores_dir'])):
+                code = filename.split('.')[0]
+                if code not in codes:
+                    continue
+                with open(os.path.join(kwargs['flores_dir'], filename), 'r', encoding='utf-8') as f:
+                    for line in f:
+                        counts[code].update(text_ngrams(line, max_n))
+
+        if kwargs['from_messages']:
+            for content, language in Message.objects.values_list('content', 'language').iterator():
+                if language in codes:
+                    counts[language].update(text_ngrams(content, max_n))
+
+        if not counts:
+            self.stdout.write(self.style.ERROR("No training text found"))
+            return
+
+        # Keep each language's most frequent n-grams as log probabilities
+        ngrams = defaultdict(dict)
+        floor = 0.0
+        for code, counter in counts.items():
+            total = sum(counter.values())
+            for ngram, count in counter.most_common(kwargs['top']):
+                weight = round(math.log(count / total), 2)
+                ngrams[ngram][code] = weight
+                floor = min(floor, weight)
+
+        profile = {
+            'max_n': max_n,
+            'floor': floor - 1.0,
+            'languages': sorted(counts),
+            'ngrams': ngrams,
+        }
+        with open(kwargs['output'], 'w', encoding='utf-8') as f:
+            json.dump(profile, f, ensure_ascii=False)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Language ID profile for {len(counts)} languages saved to {kwargs['output']}"
+        ))
@@ -0,0 +1,99 @@
+from collections import defaultdict
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from capp.models import Message, TranslationMetric, UserProfile
+from capp.translation import Translator
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Fills the translation cache from stored TranslationMetric and Message rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=50000,
+            help='Most recent successful translation metrics to re-translate'
+        )
+        parser.add_argument(
+            '--messages',
+            type=int,
+            default=0,
+            help='Most frequent chat messages to translate into every profile language'
+        )
+        parser.add_argument(
+            '--max-chars',
+            type=int,
+            default=200,
+            help='Skip texts longer than this'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=16,
+            help='Texts translated per batch'
+        )
+
+    def handle(self, *args, **kwargs):
+        translator = Translator()
+        if translator.cache is None:
+            self.stdout.write(self.style.ERROR("Translation cache is disabled"))
+            return
+
+        # The memory would answer texts seen before without reaching the model
+        # or the cache; warming has to go through the model. Re-translations
+        # are not new traffic, so they are not recorded as metrics either
+        translator.memory = None
+        translator.record_metrics = False
+
+        max_chars = kwargs['max_chars']
+        batch_size = kwargs['batch_size']
+
+        # Texts translated before are translated again rather than copied from
+        # the metrics: the cache holds single sentences under the current
+        # decoding settings, while a metric holds a whole message, possibly
+        # from streamed greedy decoding or an older setting
+        metrics = (TranslationMetric.objects
+                   .filter(success=True)
+                   .order_by('-timestamp')
+                   .values_list('original_text', 'source_language', 'target_language')
+                   [:kwargs['limit']])
+        by_target = defaultdict(dict)
+        for original, source_code, target_code in metrics.iterator():
+            if original and len(original) <= max_chars and source_code != target_code:
+                by_target[target_code][(original, source_code)] = None
+
+        warmed = 0
+        for target_code, texts in by_target.items():
+            texts = list(texts)
+            for offset in range(0, len(texts), batch_size):
+                batch = texts[offset:offset + batch_size]
+                translator.translate_batch(
+                    [text for text, _ in batch], [source_code for _, source_code in batch], target_code
+                )
+                warmed += len(batch)
+
+        self.stdout.write(f"Translated {warmed} texts from metrics")
+
+        # Frequent chat lines are translated into every language users prefer
+        if kwargs['messages']:
+            targets = list(UserProfile.objects.values_list('preferred_language', flat=True).distinct())
+            frequent = (Message.objects
+                        .values('content', 'language')
+                        .annotate(count=Count('id'))
+                        .order_by('-count')[:kwargs['messages']])
+
+            translated = 0
+            for row in frequent:
+                if len(row['content']) <= max_chars:
+                    translator.translate_many(row['content'], row['language'], targets)
+                    translated += 1
+
+            self.stdout.write(f"Translated {translated} frequent messages into {len(targets)} languages")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Translation cache '{translator.cache.alias}' is warm"
+        ))
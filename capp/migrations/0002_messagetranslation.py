@@ -0,0 +1,26 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('capp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageTranslation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target_language', models.CharField(max_length=20)),
+                ('text', models.TextField()),
+                ('model_id', models.CharField(max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('message', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='translations', to='capp.message')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['message', 'target_language'], name='capp_messag_message_052c35_idx')],
+            },
+        ),
+    ]
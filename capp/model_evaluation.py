@@ -1,15 +1,14 @@
 import json
 import torch
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
-from nltk.translate.bleu_score import sentence_bleu
+from nltk.translate.bleu_score import sentence_bleu, SmoothingFunction
 from nltk.translate.meteor_score import meteor_score
 import nltk
 from tqdm import tqdm
 import pandas as pd
 from sklearn.metrics import precision_score, recall_score, f1_score
 import logging
-from django.conf import settings
 import os
+from .model_registry import ModelRegistry
 
 # Download required NLTK data
 nltk.download('wordnet')
@@ -18,38 +17,28 @@ nltk.download('punkt')
 logger = logging.getLogger(__name__)
 
 class ModelEvaluator:
-    def __init__(self):
-        self.models = self.load_models()
-        self.test_data = self.load_test_data()
+    def __init__(self, models=None, test_file='test_data/language_pairs.json'):
+        # Callers may pass already loaded models, e.g. to compare precisions;
+        # otherwise the downloaded models are loaded one at a time
+        self.preloaded = models is not None
+        self.models = models if models is not None else {}
+        self.test_data = self.load_test_data(test_file)
         self.metrics = {}
 
-    def load_models(self):
-        """Load all available translation models"""
-        models = {}
-        config_file = settings.TRANSLATION_MODELS['CONFIG_FILE']
-        
-        try:
-            with open(config_file, 'r') as f:
-                models_config = json.load(f)
-                
-            for model_key, info in models_config.items():
-                if info['status'] == 'downloaded':
-                    models[model_key] = {
-                        'tokenizer': AutoTokenizer.from_pretrained(info['path']),
-                        'model': AutoModelForSeq2SeqLM.from_pretrained(info['path'])
-                    }
-                    logger.info(f"Loaded {model_key} model")
-                    
-        except Exception as e:
-            logger.error(f"Error loading models: {str(e)}")
-            
-        return models
+    def downloaded_models(self):
+        """Keys of the registry models that have been downloaded"""
+        registry = ModelRegistry.instance()
+        return [model_key for model_key, spec in registry.specs.items() if spec.downloaded]
 
     def load_test_data(self, file_path='test_data/language_pairs.json'):
         """Load test data from JSON file"""
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+                data = json.load(f)
+            # Accept both a bare list and the {'test_pairs': [...]} layout used by test_models
+            if isinstance(data, dict):
+                return data.get('test_pairs', [])
+            return data
         except Exception as e:
             logger.error(f"Error loading test data: {str(e)}")
             return []
@@ -62,6 +51,8 @@ class ModelEvaluator:
             model = model_info['model']
 
             # Prepare input
+            if hasattr(tokenizer, 'src_lang'):
+                tokenizer.src_lang = source_lang
             inputs = tokenizer(text, return_tensors="pt", padding=True)
             
             # Generate translation
@@ -94,11 +85,20 @@ class ModelEvaluator:
             
             # Length ratio
             length_ratio = len(candidate) / len(reference)
+
+            # BLEU and METEOR on whitespace tokens
+            ref_tokens = reference.lower().split()
+            cand_tokens = candidate.lower().split()
+            bleu = sentence_bleu([ref_tokens], cand_tokens,
+                                 smoothing_function=SmoothingFunction().method1)
+            meteor = meteor_score([ref_tokens], cand_tokens)
             
             return {
                 'exact_match': exact_match,
                 'word_overlap': overlap,
-                'length_ratio': length_ratio
+                'length_ratio': length_ratio,
+                'bleu': bleu,
+                'meteor': meteor
             }
         except Exception as e:
             logger.error(f"Error calculating metrics: {str(e)}")
@@ -107,57 +107,88 @@ class ModelEvaluator:
     def evaluate_models(self):
         """Evaluate all models on test data"""
         results = {}
-        
-        for model_key in self.models:
-            logger.info(f"Evaluating {model_key} model...")
-            model_results = {
-                'translations': [],
-                'metrics': {
-                    'bleu_scores': [],
-                    'meteor_scores': [],
-                    'exact_matches': []
-                }
+
+        if self.preloaded:
+            for model_key in self.models:
+                model_results = self.evaluate_model(model_key)
+                if model_results:
+                    results[model_key] = model_results
+            return results
+
+        registry = ModelRegistry.instance()
+        for model_key in self.downloaded_models():
+            try:
+                # Held only while it is evaluated, so the registry can evict
+                # it to make room for the next one
+                with registry.use(model_key) as loaded:
+                    self.models[model_key] = {
+                        'tokenizer': loaded.tokenizer,
+                        'model': loaded.model
+                    }
+                    model_results = self.evaluate_model(model_key)
+            except Exception as e:
+                logger.error(f"Error evaluating {model_key} model: {str(e)}")
+                continue
+            finally:
+                self.models.pop(model_key, None)
+            if model_results:
+                results[model_key] = model_results
+
+        return results
+
+    def evaluate_model(self, model_key):
+        """Evaluate one loaded model on test data"""
+        logger.info(f"Evaluating {model_key} model...")
+        model_results = {
+            'translations': [],
+            'metrics': {
+                'bleu_scores': [],
+                'meteor_scores': [],
+                'exact_matches': []
             }
+        }
+        
+        for pair in tqdm(self.test_data):
+            source_text = pair['source_text']
+            target_text = pair['target_text']
+            source_lang = pair['source_lang']
+            target_lang = pair['target_lang']
             
-            for pair in tqdm(self.test_data):
-                source_text = pair['source_text']
-                target_text = pair['target_text']
-                source_lang = pair['source_lang']
-                target_lang = pair['target_lang']
-                
-                # Get translation
-                translated = self.translate_text(
-                    model_key, 
-                    source_text, 
-                    source_lang, 
-                    target_lang
-                )
+            # Get translation
+            translated = self.translate_text(
+                model_key, 
+                source_text, 
+                source_lang, 
+                target_lang
+            )
+            
+            if translated:
+                # Calculate metrics
+                metrics = self.calculate_metrics(target_text, translated)
                 
-                if translated:
-                    # Calculate metrics
-                    metrics = self.calculate_metrics(target_text, translated)
+                if metrics:
+                    model_results['translations'].append({
+                        'source': source_text,
+                        'reference': target_text,
+                        'translation': translated,
+                        'metrics': metrics
+                    })
                     
-                    if metrics:
-                        model_results['translations'].append({
-                            'source': source_text,
-                            'reference': target_text,
-                            'translation': translated,
-                            'metrics': metrics
-                        })
-                        
-                        model_results['metrics']['bleu_scores'].append(metrics['bleu'])
-                        model_results['metrics']['meteor_scores'].append(metrics['meteor'])
-                        model_results['metrics']['exact_matches'].append(metrics['exact_match'])
-            
-            # Calculate average scores
-            results[model_key] = {
-                'avg_bleu': sum(model_results['metrics']['bleu_scores']) / len(model_results['metrics']['bleu_scores']),
-                'avg_meteor': sum(model_results['metrics']['meteor_scores']) / len(model_results['metrics']['meteor_scores']),
-                'accuracy': sum(model_results['metrics']['exact_matches']) / len(model_results['metrics']['exact_matches']),
-                'translations': model_results['translations']
-            }
-            
-        return results
+                    model_results['metrics']['bleu_scores'].append(metrics['bleu'])
+                    model_results['metrics']['meteor_scores'].append(metrics['meteor'])
+                    model_results['metrics']['exact_matches'].append(metrics['exact_match'])
+        
+        if not model_results['translations']:
+            logger.error(f"No translations produced by {model_key}")
+            return None
+
+        # Calculate average scores
+        return {
+            'avg_bleu': sum(model_results['metrics']['bleu_scores']) / len(model_results['metrics']['bleu_scores']),
+            'avg_meteor': sum(model_results['metrics']['meteor_scores']) / len(model_results['metrics']['meteor_scores']),
+            'accuracy': sum(model_results['metrics']['exact_matches']) / len(model_results['metrics']['exact_matches']),
+            'translations': model_results['translations']
+        }
 
     def generate_report(self, results, output_file='model_evaluation_report.html'):
         """Generate HTML report with evaluation results"""
@@ -0,0 +1,272 @@
+import gc
+import json
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from django.conf import settings
+from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+from .backends import get_backend
+
+logger = logging.getLogger(__name__)
+
+WEIGHT_SUFFIXES = ('.safetensors', '.bin', '.onnx')
+
+
+def read_models_config(path):
+    """Downloaded models from the models_config.json of `download_nllb_model`"""
+    try:
+        with open(path, 'r') as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.error(f"Error reading {path}: {str(e)}")
+        return {}
+    return {key: info for key, info in config.items() if info.get('status') == 'downloaded'}
+
+
+def weights_size(path):
+    """Bytes of weight files under a model directory, or None"""
+    if not path or not os.path.isdir(path):
+        return None
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            if name.endswith(WEIGHT_SUFFIXES):
+                total += os.path.getsize(os.path.join(root, name))
+    return total or None
+
+
+class ModelSpec:
+    """A model the registry can load, and the language pairs it is good enough for.
+
+    ``pairs`` of None means every pair. ``source`` is the downloaded path
+    when there is one (``downloaded``), otherwise the Hugging Face model name.
+    """
+
+    def __init__(self, key, source, pairs=None, primary=False, downloaded=False):
+        self.key = key
+        self.source = source
+        self.pairs = pairs
+        self.primary = primary
+        self.downloaded = downloaded
+        self.disk_bytes = weights_size(source)
+
+    def supports(self, source_code, target_code):
+        return self.pairs is None or (source_code, target_code) in self.pairs
+
+
+class LoadedModel:
+    def __init__(self, key, model, tokenizer, device, backend=None):
+        self.key = key
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = device
+        self.backend = backend
+        self.size_bytes = self.measure(model)
+        self.in_use = 0
+        self.pinned = False
+        self.last_used = time.monotonic()
+
+    @staticmethod
+    def measure(model):
+        try:
+            return sum(param.numel() * param.element_size() for param in model.parameters())
+        except Exception:
+            # e.g. ONNX Runtime sessions have no parameters to count
+            return 0
+
+
+class ModelRegistry:
+    """Loads translation models on demand and keeps them within a RAM budget.
+
+    Models come from ``TRANSLATION_MODELS['CONFIG_FILE']`` (written by
+    `manage.py download_nllb_model`), falling back to the Hugging Face names
+    in settings for models that were not downloaded. The primary model
+    (``TRANSLATION_SETTINGS['PRIMARY_MODEL']``) covers every pair and is
+    loaded through the inference backend; the others cover the pairs listed
+    in ``TRANSLATION_MODELS['PAIR_MODELS']``.
+
+    ``route`` picks the cheapest model that covers a pair, by loaded or
+    on-disk size. After each load, models that are neither pinned nor in
+    use are evicted least recently used first until the resident models
+    fit in ``MEMORY_BUDGET_MB``.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def instance(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls.from_settings()
+            return cls._instance
+
+    @classmethod
+    def from_settings(cls):
+        options = settings.TRANSLATION_MODELS
+        primary = settings.TRANSLATION_SETTINGS.get('PRIMARY_MODEL', 'nllb')
+        downloaded = read_models_config(options['CONFIG_FILE'])
+        fallback_sources = {
+            primary: settings.NLLB_SETTINGS['MODEL_NAME'],
+            'opus': options['OPUS_MODEL_NAME'],
+        }
+
+        specs = []
+        pair_models = options.get('PAIR_MODELS', {})
+        for key in dict.fromkeys([primary, *pair_models, *downloaded]):
+            source = downloaded.get(key, {}).get('path') or fallback_sources.get(key)
+            if source is None:
+                continue
+            is_downloaded = key in downloaded
+            if key == primary:
+                specs.append(ModelSpec(key, source, primary=True, downloaded=is_downloaded))
+            elif key in pair_models:
+                specs.append(ModelSpec(key, source, {tuple(pair) for pair in pair_models[key]},
+                                       downloaded=is_downloaded))
+            else:
+                # Downloaded, but not configured for any pair: evaluation only
+                specs.append(ModelSpec(key, source, set(), downloaded=True))
+        return cls(specs, options.get('MEMORY_BUDGET_MB', 4096))
+
+    def __init__(self, specs, budget_mb=4096):
+        self.specs = {spec.key: spec for spec in specs}
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {key: threading.Lock() for key in self.specs}
+
+        self.loads = 0
+        self.evictions = 0
+        self.hits = 0
+        self.load_seconds = 0.0
+
+    @property
+    def primary(self):
+        return next((key for key, spec in self.specs.items() if spec.primary), None)
+
+    def cost(self, key):
+        loaded = self._loaded.get(key)
+        if loaded is not None and loaded.size_bytes:
+            return loaded.size_bytes
+        return self.specs[key].disk_bytes
+
+    def route(self, source_code, target_code):
+        """Key of the cheapest model good enough for the pair.
+
+        Unknown sizes rank after known ones; a model configured for specific
+        pairs ranks before the primary, which is the general fallback.
+        """
+        candidates = [spec for spec in self.specs.values() if spec.supports(source_code, target_code)]
+        if not candidates:
+            return None
+        best = min(candidates, key=lambda spec: (
+            self.cost(spec.key) is None, self.cost(spec.key) or 0, spec.primary
+        ))
+        return best.key
+
+    def is_loaded(self, key):
+        return key in self._loaded
+
+    def load(self, key, pin=False, hold=False, **backend_options):
+        """Return the LoadedModel for ``key``, loading it if needed.
+
+        Pinned models are never evicted; callers that keep references to
+        the model for the life of the process should pin it. ``hold`` marks
+        the model in use until the caller releases it (see ``use``).
+        """
+        if key not in self.specs:
+            raise KeyError(f"Unknown model: {key}")
+
+        with self._load_locks[key]:
+            with self._lock:
+                loaded = self._loaded.get(key)
+                if loaded is not None:
+                    self.hits += 1
+                    self._touch(loaded, pin, hold)
+                    return loaded
+
+            start = time.time()
+            loaded = self._load(self.specs[key], backend_options)
+            elapsed = time.time() - start
+            logger.info(f"Loaded {key} model in {elapsed:.1f}s ({loaded.size_bytes / 1024 / 1024:.0f} MB)")
+
+            with self._lock:
+                self.loads += 1
+                self.load_seconds += elapsed
+                self._loaded[key] = loaded
+                self._touch(loaded, pin, hold)
+                self._evict(keep=key)
+            return loaded
+
+    @contextmanager
+    def use(self, key):
+        """Load ``key`` and keep it from being evicted while in the block"""
+        loaded = self.load(key, hold=True)
+        try:
+            yield loaded
+        finally:
+            with self._lock:
+                loaded.in_use -= 1
+                loaded.last_used = time.monotonic()
+
+    def _touch(self, loaded, pin=False, hold=False):
+        loaded.pinned = loaded.pinned or pin
+        if hold:
+            loaded.in_use += 1
+        loaded.last_used = time.monotonic()
+        self._loaded.move_to_end(loaded.key)
+
+    def _load(self, spec, backend_options):
+        if spec.primary:
+            backend = get_backend(spec.source, **backend_options)
+            model, tokenizer, device = backend.load()
+            return LoadedModel(spec.key, model, tokenizer, device, backend)
+
+        tokenizer = AutoTokenizer.from_pretrained(spec.source)
+        model = AutoModelForSeq2SeqLM.from_pretrained(spec.source).eval()
+        return LoadedModel(spec.key, model, tokenizer, 'cpu')
+
+    def resident_bytes(self):
+        return sum(loaded.size_bytes for loaded in self._loaded.values())
+
+    def _evict(self, keep=None):
+        """Drop idle models, least recently used first, until within budget"""
+        evicted = False
+        for key in list(self._loaded):
+            if self.resident_bytes() <= self.budget_bytes:
+                break
+            loaded = self._loaded[key]
+            if loaded.pinned or loaded.in_use or key == keep:
+                continue
+            del self._loaded[key]
+            self.evictions += 1
+            evicted = True
+            logger.info(f"Evicted {key} model to stay within the memory budget")
+        if evicted:
+            gc.collect()
+        if self.resident_bytes() > self.budget_bytes:
+            logger.warning("Pinned and in-use models exceed the memory budget")
+
+    def stats(self):
+        return {
+            'budget_mb': self.budget_bytes / 1024 / 1024,
+            'resident_mb': self.resident_bytes() / 1024 / 1024,
+            'loads': self.loads,
+            'evictions': self.evictions,
+            'hits': self.hits,
+            'load_seconds': self.load_seconds,
+            'models': [
+                {
+                    'key': key,
+                    'loaded': key in self._loaded,
+                    'size_mb': (self.cost(key) or 0) / 1024 / 1024,
+                    'pinned': key in self._loaded and self._loaded[key].pinned,
+                    'in_use': self._loaded[key].in_use if key in self._loaded else 0,
+                }
+                for key in self.specs
+            ],
+        }
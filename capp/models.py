@@ -26,6 +26,23 @@ class Message(models.Model):
         return f"{self.user.username}: {self.content[:20]}"
 
 
+class MessageTranslation(models.Model):
+    """A stored translation of a chat message, so it is translated only once per language"""
+    message = models.ForeignKey(Message, related_name='translations', on_delete=models.CASCADE)
+    target_language = models.CharField(max_length=20)
+    text = models.TextField()
+    model_id = models.CharField(max_length=50)  # Tier or model that produced it: 'nllb', 'opus', ...
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # Not unique: two connections replaying the same history may both
+        # write a row; readers take the latest
+        indexes = [models.Index(fields=['message', 'target_language'])]
+
+    def __str__(self):
+        return f"{self.message_id} -> {self.target_language} ({self.model_id})"
+
+
 class Feedback(models.Model):
     nameer = models.ForeignKey(User, on_delete=models.CASCADE)
     feedinfo = models.TextField()
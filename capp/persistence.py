@@ -0,0 +1,163 @@
+import atexit
+import queue
+import threading
+import time
+import logging
+from django import db
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """Buffers unsaved model instances and writes them on a dedicated thread.
+
+    Callers hand over instances with ``add`` and return immediately. The
+    writer collects up to ``PERSISTENCE_BATCH_SIZE`` rows or waits up to
+    ``PERSISTENCE_FLUSH_MS``, then saves consecutive rows of the same model
+    with one ``bulk_create`` each, all inside one transaction.
+
+    There is a single writer and a single FIFO queue, so rows are written
+    in the order they were added and each room's messages keep their
+    order. Rows may reference an unsaved instance queued before them
+    (a MessageTranslation of its Message): ``bulk_create`` sets the primary
+    keys on backends that return them (SQLite 3.35+, PostgreSQL, MariaDB
+    10.5+) before the later run is written. ``auto_now_add`` fields get
+    the flush time, which is at most one flush interval late. The queue
+    holds at most ``PERSISTENCE_QUEUE_SIZE`` rows; ``add`` returns False
+    instead of growing past that. Anything still queued is written when
+    the process exits.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def instance(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                options = settings.TRANSLATION_SETTINGS
+                cls._instance = cls(
+                    max_size=options.get('PERSISTENCE_QUEUE_SIZE', 10000),
+                    batch_size=options.get('PERSISTENCE_BATCH_SIZE', 200),
+                    flush_interval=options.get('PERSISTENCE_FLUSH_MS', 200) / 1000
+                )
+            return cls._instance
+
+    def __init__(self, max_size=10000, batch_size=200, flush_interval=0.2):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_size)
+        self._thread = None
+        self._lock = threading.Lock()
+
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def _start(self):
+        with self._lock:
+            # Also restarts the writer in a forked child, where it does not run
+            if self._thread is None or not self._thread.is_alive():
+                if self._thread is None:
+                    atexit.register(self.close)
+                self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+                self._thread.start()
+
+    def add(self, instance):
+        """Queue an unsaved instance; returns False when the queue is full"""
+        self._start()
+        try:
+            self._queue.put_nowait(instance)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            logger.warning(f"Write-behind queue full, {type(instance).__name__} not queued")
+            return False
+
+    def flush(self):
+        """Block until everything queued so far has been written"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        """Write what is left and stop the writer"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size and batch[-1] is not _STOP:
+            timeout = deadline - time.monotonic()
+            try:
+                if timeout > 0:
+                    batch.append(self._queue.get(timeout=timeout))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            stop = batch[-1] is _STOP
+            rows = [row for row in batch if row is not _STOP]
+            try:
+                if rows:
+                    self._write(rows)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                db.connections.close_all()
+                return
+
+    def _write(self, rows):
+        db.close_old_connections()
+
+        # Runs of the same model, in queue order
+        runs = []
+        for row in rows:
+            if runs and type(runs[-1][0]) is type(row):
+                runs[-1].append(row)
+            else:
+                runs.append([row])
+
+        try:
+            with transaction.atomic():
+                for run in runs:
+                    type(run[0]).objects.bulk_create(run)
+            written = len(rows)
+        except Exception as e:
+            logger.error(f"Error writing batch of {len(rows)} rows: {str(e)}")
+            # Save one by one so a single bad row does not lose the batch
+            written = 0
+            for row in rows:
+                try:
+                    row.save()
+                    written += 1
+                except Exception as e:
+                    logger.error(f"Error saving {type(row).__name__}: {str(e)}")
+
+        with self._lock:
+            self.written += written
+            self.failed += len(rows) - written
+            self.batches += 1
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize(),
+            'written': self.written,
+            'batches': self.batches,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'avg_batch': self.written / self.batches if self.batches else 0,
+        }
@@ -0,0 +1,114 @@
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def load_phrase_file(path):
+    """Yield (source, target) pairs from a tab separated phrase file.
+
+    One pair per line; blank lines and lines starting with ``#`` are skipped.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            line = line.rstrip('\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+            parts = line.split('\t')
+            if len(parts) != 2:
+                logger.warning(f"{path}:{number}: expected source<TAB>target")
+                continue
+            yield parts[0].strip(), parts[1].strip()
+
+
+class PhraseTable:
+    """Word-level trie of phrases with greedy longest-match translation.
+
+    Each position of the input is matched against the trie once, walking at
+    most as many words as the longest phrase, so translating is linear in
+    the length of the text and does not depend on how many phrases the
+    table holds.
+
+    Words no phrase covers can be split on a fixed-length prefix
+    (``prefix_length``), e.g. Shona verb prefixes such as ``tino-``. Output
+    fixes are applied in a single regex pass.
+    """
+
+    def __init__(self, entries=(), prefix_length=None, fixes=None):
+        self.root = {}
+        self.size = 0
+        self.max_words = 0
+        self.prefix_length = prefix_length
+        self.prefixes = {}
+        for source, target in entries:
+            self.add(source, target)
+        self.set_fixes(fixes or {})
+
+    def add(self, phrase, translation):
+        """Add or replace a phrase; later entries win"""
+        words = phrase.lower().split()
+        if not words:
+            return
+        node = self.root
+        for word in words:
+            node = node.setdefault(word, {})
+        if None not in node:
+            self.size += 1
+        # The None key holds the translation of the phrase ending here
+        node[None] = translation
+        self.max_words = max(self.max_words, len(words))
+
+        if self.prefix_length and len(words) == 1 and len(words[0]) == self.prefix_length:
+            self.prefixes[words[0]] = translation
+
+    def set_fixes(self, fixes):
+        self.fixes = dict(fixes)
+        if self.fixes:
+            # Longer fixes first so they win over fixes they contain
+            alternatives = sorted(self.fixes, key=len, reverse=True)
+            self._fix_pattern = re.compile('|'.join(re.escape(wrong) for wrong in alternatives))
+        else:
+            self._fix_pattern = None
+
+    def lookup(self, word):
+        node = self.root.get(word)
+        return node.get(None) if node else None
+
+    def longest_match(self, words, start):
+        """Return (translation, word_count) of the longest phrase at ``start``"""
+        node = self.root
+        best, best_length = None, 0
+        for index in range(start, len(words)):
+            node = node.get(words[index])
+            if node is None:
+                break
+            if None in node:
+                best, best_length = node[None], index - start + 1
+        return best, best_length
+
+    def translate(self, text):
+        words = text.lower().split()
+        output = []
+        i = 0
+        while i < len(words):
+            translation, length = self.longest_match(words, i)
+            if length:
+                output.append(translation)
+                i += length
+                continue
+
+            word = words[i]
+            prefix = word[:self.prefix_length] if self.prefix_length else None
+            if prefix and len(word) >= self.prefix_length and prefix in self.prefixes:
+                output.append(self.prefixes[prefix])
+                rest = word[self.prefix_length:]
+                if rest:
+                    output.append(self.lookup(rest) or rest)
+            else:
+                output.append(word)
+            i += 1
+
+        translation = ' '.join(output)
+        if self._fix_pattern is not None:
+            translation = self._fix_pattern.sub(lambda match: self.fixes[match.group(0)], translation)
+        return translation
@@ -0,0 +1,63 @@
+import threading
+from collections import Counter, defaultdict
+
+
+class RoomPresence:
+    """Languages of the connections currently open in each room.
+
+    Each connection is registered with its room and language on connect
+    and removed on disconnect. Every room keeps a count per language, so a
+    language stays listed until the last connection reading in it leaves.
+
+    The registry lives in the process, like the in-memory channel layer it
+    sits next to; it only sees connections served by this process.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def instance(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def __init__(self):
+        self._rooms = defaultdict(Counter)  # room -> language -> connections
+        self._connections = {}  # channel name -> (room, language)
+        self._lock = threading.Lock()
+
+    def join(self, room_id, channel_name, language):
+        with self._lock:
+            self._leave(channel_name)
+            self._connections[channel_name] = (room_id, language)
+            self._rooms[room_id][language] += 1
+
+    def leave(self, channel_name):
+        with self._lock:
+            self._leave(channel_name)
+
+    def _leave(self, channel_name):
+        entry = self._connections.pop(channel_name, None)
+        if entry is None:
+            return
+        room_id, language = entry
+        counts = self._rooms[room_id]
+        counts[language] -= 1
+        if counts[language] <= 0:
+            del counts[language]
+        if not counts:
+            del self._rooms[room_id]
+
+    def languages(self, room_id):
+        """Languages someone in the room is reading in right now"""
+        with self._lock:
+            return set(self._rooms.get(room_id, ()))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rooms': len(self._rooms),
+                'connections': len(self._connections),
+                'room_languages': sum(len(counts) for counts in self._rooms.values()),
+            }
@@ -0,0 +1,133 @@
+import re
+
+# Sentence-final punctuation by script (the suffix of a FLORES-200 code)
+DEFAULT_TERMINATORS = '.!?'
+SCRIPT_TERMINATORS = {
+    'Arab': '.!?؟۔',
+    'Armn': '։.!?',
+    'Beng': '।॥.!?',
+    'Deva': '।॥.!?',
+    'Ethi': '።፧፨.!?',
+    'Grek': '.!;',
+    'Hang': '.!?。',
+    'Hans': '。！？.!?',
+    'Hant': '。！？.!?',
+    'Jpan': '。！？.!?',
+    'Khmr': '។៕!?',
+    'Mymr': '။!?',
+    'Sinh': '.!?෴',
+    'Thai': '!?',
+    'Tibt': '།༎!?',
+}
+
+# Scripts written without spaces may break right after the terminator
+NO_SPACE_SCRIPTS = {'Hans', 'Hant', 'Jpan'}
+
+# Words ending in a period that do not end a sentence, by language
+ABBREVIATIONS = {
+    'eng': {'mr', 'mrs', 'ms', 'dr', 'prof', 'st', 'jr', 'sr', 'vs', 'etc', 'e.g', 'i.e', 'a.m', 'p.m', 'no', 'approx', 'dept'},
+    'fra': {'m', 'mme', 'mlle', 'dr', 'st', 'etc', 'p.ex', 'cf'},
+    'deu': {'hr', 'fr', 'dr', 'prof', 'str', 'usw', 'bzw', 'z.b', 'ca', 'nr'},
+    'spa': {'sr', 'sra', 'srta', 'dr', 'dra', 'etc', 'ud', 'uds'},
+    'por': {'sr', 'sra', 'dr', 'dra', 'etc'},
+}
+
+CLOSING = '"\'”’»)]}'
+
+
+def script_of(language_code):
+    return language_code.split('_')[-1] if language_code else ''
+
+
+def _ends_with_abbreviation(text, language_code):
+    words = text.rstrip('.').split()
+    if not words:
+        return False
+    word = words[-1].lower().lstrip('(["\'')
+    # Initials such as "J. Smith"
+    if len(word) == 1 and word.isalpha():
+        return True
+    return word in ABBREVIATIONS.get((language_code or '').split('_')[0], ())
+
+
+def split_sentences(text, language_code=None):
+    """Split text into sentence and whitespace pieces.
+
+    Returns a list of ``(piece, is_sentence)`` tuples. Joining every piece
+    gives back the original text exactly, so translated sentences can be
+    reassembled with the original spacing and line breaks.
+    """
+    script = script_of(language_code)
+    terminators = SCRIPT_TERMINATORS.get(script, DEFAULT_TERMINATORS)
+    needs_space = script not in NO_SPACE_SCRIPTS
+    pattern = re.compile(
+        '[{t}]+[{c}]*'.format(t=re.escape(terminators), c=re.escape(CLOSING))
+        + (r'(?=\s|$)' if needs_space else '')
+        + '|\n\\s*\n'  # paragraph breaks always end a sentence
+    )
+
+    pieces = []
+    start = 0
+    for match in pattern.finditer(text):
+        end = match.end()
+        sentence = text[start:end]
+        if match.group().startswith('.') and _ends_with_abbreviation(sentence, language_code):
+            continue
+        _append_sentence(pieces, sentence)
+        start = end
+    if start < len(text):
+        _append_sentence(pieces, text[start:])
+
+    return pieces
+
+
+def _append_sentence(pieces, chunk):
+    """Add a chunk as leading whitespace, sentence and trailing whitespace pieces"""
+    stripped = chunk.strip()
+    if not stripped:
+        if chunk:
+            pieces.append((chunk, False))
+        return
+
+    leading = chunk[:len(chunk) - len(chunk.lstrip())]
+    trailing = chunk[len(chunk.rstrip()):]
+    if leading:
+        pieces.append((leading, False))
+    pieces.append((stripped, True))
+    if trailing:
+        pieces.append((trailing, False))
+
+
+def respace(pieces, target_code):
+    """Adjust the whitespace between sentences to the target script.
+
+    Pieces keep the source's spacing, which is wrong when only one side is
+    written without spaces: Chinese sentences follow each other directly,
+    English ones need a space. Line breaks and leading or trailing
+    whitespace are kept as they are.
+    """
+    if not target_code:
+        return pieces
+    needs_space = script_of(target_code) not in NO_SPACE_SCRIPTS
+    last = len(pieces) - 1
+
+    result = []
+    for index, (piece, is_sentence) in enumerate(pieces):
+        if is_sentence:
+            if needs_space and result and result[-1][1]:
+                result.append((' ', False))
+            result.append((piece, True))
+        elif needs_space or '\n' in piece or index in (0, last):
+            result.append((piece, False))
+    return result
+
+
+def join_pieces(pieces, translations, target_code=None):
+    """Rebuild text from pieces, replacing sentences via the translations dict.
+
+    With ``target_code`` the spacing between sentences follows the target script.
+    """
+    return ''.join(
+        translations.get(piece, piece) if is_sentence else piece
+        for piece, is_sentence in respace(pieces, target_code)
+    )
@@ -1,3 +1,10 @@
+import threading
+import logging
+from django.conf import settings
+from .phrase_table import PhraseTable, load_phrase_file
+
+logger = logging.getLogger(__name__)
+
 # Dictionary mapping English phrases to Shona translations
 SHONA_TRANSLATIONS = {
     # Greetings and Common Phrases
@@ -50,105 +57,60 @@ SHONA_TRANSLATIONS = {
     'tinotenda zvikuru': 'we thank you very much',
 }
 
+# Post-processing fixes for English produced by translate_from_shona
+COMMON_FIXES = {
+    'we do happy': 'we are happy',
+    'we do thank you': 'we thank you',
+    'i do happy': 'i am happy',
+    'they do happy': 'they are happy',
+}
+
+# Shona verb prefixes such as "tino" are the first 4 letters of a word
+PREFIX_LENGTH = 4
+
+_tables = None
+_tables_lock = threading.Lock()
+
+
+def phrase_entries():
+    """English to Shona pairs: the built-in table, then the phrase files"""
+    yield from SHONA_TRANSLATIONS.items()
+    for path in settings.TRANSLATION_SETTINGS.get('PHRASE_TABLE_FILES', []):
+        try:
+            yield from load_phrase_file(path)
+        except OSError as e:
+            logger.error(f"Error loading phrase file {path}: {str(e)}")
+
+
+def build_phrase_tables(entries):
+    """Compile (to_shona, from_shona) phrase tables from English to Shona pairs"""
+    to_shona = PhraseTable()
+    from_shona = PhraseTable(prefix_length=PREFIX_LENGTH, fixes=COMMON_FIXES)
+    for english, shona in entries:
+        to_shona.add(english, shona)
+        from_shona.add(shona, english)
+    return to_shona, from_shona
+
+
+def get_phrase_tables():
+    """Phrase tables compiled once per process"""
+    global _tables
+    if _tables is None:
+        with _tables_lock:
+            if _tables is None:
+                _tables = build_phrase_tables(phrase_entries())
+                logger.info(f"Compiled phrase tables with {_tables[0].size} entries")
+    return _tables
+
+
 def translate_to_shona(text):
     """
     Translate English text to Shona using the dictionary
     """
-    text = text.lower().strip()
-    
-    # Check for exact match
-    if text in SHONA_TRANSLATIONS:
-        return SHONA_TRANSLATIONS[text]
-        
-    # Split into words and translate each
-    words = text.split()
-    translated_words = []
-    
-    i = 0
-    while i < len(words):
-        translated = False
-        
-        # Try to match phrases of decreasing length
-        for j in range(min(4, len(words) - i), 0, -1):
-            phrase = ' '.join(words[i:i+j])
-            if phrase in SHONA_TRANSLATIONS:
-                translated_words.append(SHONA_TRANSLATIONS[phrase])
-                i += j
-                translated = True
-                break
-        
-        if not translated:
-            translated_words.append(words[i])
-            i += 1
-    
-    return ' '.join(translated_words)
+    return get_phrase_tables()[0].translate(text)
 
 def translate_from_shona(text):
     """
     Translate Shona text to English using reverse dictionary lookup
     """
-    text = text.lower().strip()
-    
-    # Create reverse dictionary
-    reverse_dict = {v: k for k, v in SHONA_TRANSLATIONS.items()}
-    
-    # Check for exact match
-    if text in reverse_dict:
-        return reverse_dict[text]
-    
-    # Split into words and translate each
-    words = text.split()
-    translated_words = []
-    
-    i = 0
-    while i < len(words):
-        translated = False
-        
-        # Try to match phrases of decreasing length
-        for j in range(min(4, len(words) - i), 0, -1):
-            phrase = ' '.join(words[i:i+j])
-            if phrase in reverse_dict:
-                translated_words.append(reverse_dict[phrase])
-                i += j
-                translated = True
-                break
-                
-        # Try to match verb prefixes
-        if not translated and len(words[i]) >= 4:
-            prefix = words[i][:4]  # Get first 4 letters
-            if prefix in reverse_dict:
-                # Handle verb prefixes
-                translated_words.append(reverse_dict[prefix])
-                if len(words[i]) > 4:
-                    # Add the rest of the word if there's more
-                    rest = words[i][4:]
-                    if rest in reverse_dict:
-                        translated_words.append(reverse_dict[rest])
-                    else:
-                        translated_words.append(rest)
-                i += 1
-                translated = True
-        
-        if not translated:
-            # Check if word exists in reverse translations
-            if words[i] in reverse_dict:
-                translated_words.append(reverse_dict[words[i]])
-            else:
-                translated_words.append(words[i])
-            i += 1
-    
-    # Clean up the translation
-    translation = ' '.join(translated_words)
-    
-    # Common post-processing fixes
-    common_fixes = {
-        'we do happy': 'we are happy',
-        'we do thank you': 'we thank you',
-        'i do happy': 'i am happy',
-        'they do happy': 'they are happy',
-    }
-    
-    for wrong, right in common_fixes.items():
-        translation = translation.replace(wrong, right)
-    
-    return translation
\ No newline at end of file
+    return get_phrase_tables()[1].translate(text)
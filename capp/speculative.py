@@ -0,0 +1,197 @@
+import threading
+import time
+import torch
+import logging
+from django.conf import settings
+from .model_registry import ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+
+def crop_cache(past_key_values, length):
+    """Drop cached decoder self-attention states past ``length`` tokens"""
+    if hasattr(past_key_values, 'crop'):
+        past_key_values.crop(length)
+        return past_key_values
+    # Legacy tuples: (self key, self value, cross key, cross value) per layer
+    return tuple(
+        (layer[0][:, :, :length], layer[1][:, :, :length]) + tuple(layer[2:])
+        for layer in past_key_values
+    )
+
+
+class DraftModel:
+    """A small translation model from the registry that writes the first draft for one pair"""
+
+    def __init__(self, key):
+        self.key = key
+        # Kept for the life of the decoder, so pinned
+        self.loaded = ModelRegistry.instance().load(key, pin=True)
+
+    def translate(self, text, max_length):
+        tokenizer, model = self.loaded.tokenizer, self.loaded.model
+        inputs = tokenizer([text], return_tensors='pt', truncation=True).to(self.loaded.device)
+        with torch.inference_mode():
+            outputs = model.generate(**inputs, num_beams=1, max_new_tokens=max_length)
+        return tokenizer.batch_decode(outputs, skip_special_tokens=True)[0]
+
+
+class SpeculativeDecoder:
+    """Greedy NLLB decoding that checks a draft translation instead of
+    producing every token with its own forward pass.
+
+    For pairs with a draft model (e.g. OPUS-MT English to Shona) the draft
+    translates the sentence first. Its text is re-tokenized with the NLLB
+    tokenizer, since the two models do not share a vocabulary. NLLB then
+    runs one decoder pass over up to ``draft_tokens`` proposed tokens and
+    keeps the longest prefix that matches its own greedy choice, plus its
+    own next token, so every pass yields at least one token.
+
+    After a mismatch the draft is re-aligned by finding the last generated
+    tokens in it and proposing what follows. Accepted tokens are exactly
+    the ones greedy search would have picked, so the output matches NLLB
+    greedy decoding; the draft only decides how many passes that takes.
+    ``generate`` takes the same length limit and stopping criteria as
+    ``model.generate``, so the decoding policy applies as usual.
+    """
+
+    def __init__(self, engine, drafts, draft_tokens=8):
+        self.engine = engine
+        self.drafts = drafts
+        self.draft_tokens = draft_tokens
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.passes = 0
+        self.generated = 0
+        self.drafted = 0
+        self.accepted = 0
+        self.draft_seconds = 0.0
+
+    @classmethod
+    def from_settings(cls, engine):
+        options = settings.NLLB_SETTINGS
+        if not options.get('SPECULATIVE_DECODING', False):
+            return None
+        drafts = {}
+        for source_code, target_code, key in options.get('DRAFT_MODELS', []):
+            try:
+                drafts[(source_code, target_code)] = DraftModel(key)
+                logger.info(f"Loaded draft model {key} for {source_code} -> {target_code}")
+            except Exception as e:
+                logger.error(f"Error loading draft model {key}: {str(e)}")
+        if not drafts:
+            return None
+        return cls(engine, drafts, options.get('SPECULATIVE_TOKENS', 8))
+
+    def supports(self, source_code, target_code):
+        return (source_code, target_code) in self.drafts
+
+    def propose(self, draft, generated, cursor):
+        """Return (tokens, cursor): the draft tokens following what was generated"""
+        if not generated:
+            return draft[:self.draft_tokens], 0
+        for size in (3, 2, 1):
+            if len(generated) < size:
+                continue
+            suffix = generated[-size:]
+            matches = [
+                start + size for start in range(len(draft) - size + 1)
+                if draft[start:start + size] == suffix
+            ]
+            if matches:
+                # The occurrence nearest to where the last proposal ended
+                position = min(matches, key=lambda end: abs(end - cursor))
+                return draft[position:position + self.draft_tokens], position
+        return [], cursor
+
+    def translate(self, text, source_code, target_code):
+        input_ids, attention_mask = self.engine.encode([text], [source_code], target_code)
+        tokens = self.generate(text, source_code, target_code, input_ids, attention_mask)
+        return self.engine.tokenizer.decode(tokens, skip_special_tokens=True)
+
+    def generate(self, text, source_code, target_code, input_ids, attention_mask,
+                 max_length=None, stopping_criteria=None):
+        """Token ids of the greedy translation of one encoded sentence.
+
+        Decoding ends at EOS, at ``max_length`` tokens or once
+        ``stopping_criteria`` (a ``StoppingCriteriaList``) says so.
+        """
+        engine = self.engine
+        tokenizer = engine.tokenizer
+        model = engine.model
+        eos_id = tokenizer.eos_token_id
+        max_length = min(max_length or engine.max_length, engine.max_length)
+
+        start = time.perf_counter()
+        draft_text = self.drafts[(source_code, target_code)].translate(text, max_length)
+        draft = tokenizer(draft_text, add_special_tokens=False)['input_ids'] + [eos_id]
+        draft_seconds = time.perf_counter() - start
+
+        tokens = [model.config.decoder_start_token_id, engine.language_id(target_code)]
+        prefix_length = len(tokens)
+        cached = 0
+        cursor = 0
+        past_key_values = None
+        passes = drafted = accepted = 0
+
+        with torch.inference_mode():
+            encoder_outputs = model.get_encoder()(input_ids=input_ids, attention_mask=attention_mask)
+            while len(tokens) < max_length and tokens[-1] != eos_id:
+                proposal, cursor = self.propose(draft, tokens[prefix_length:], cursor)
+                proposal = proposal[:max_length - len(tokens) - 1]
+                step = tokens[cached:] + proposal
+                outputs = model(
+                    encoder_outputs=encoder_outputs,
+                    attention_mask=attention_mask,
+                    decoder_input_ids=torch.tensor([step], dtype=torch.long, device=engine.device),
+                    past_key_values=past_key_values,
+                    use_cache=True
+                )
+                passes += 1
+                drafted += len(proposal)
+
+                # predicted[i] is the greedy token after step[i]
+                predicted = outputs.logits[0].argmax(dim=-1).tolist()
+                offset = len(tokens) - cached - 1
+                kept = 0
+                for token in proposal:
+                    if predicted[offset + kept] != token:
+                        break
+                    kept += 1
+                    if token == eos_id:
+                        break
+
+                valid = len(tokens) + kept
+                tokens.extend(proposal[:kept])
+                if tokens[-1] != eos_id:
+                    tokens.append(predicted[offset + kept])
+                cursor += kept
+                accepted += kept
+
+                # Keep the cache for tokens that stay; the rejected tail goes
+                past_key_values = crop_cache(outputs.past_key_values, valid)
+                cached = valid
+
+                if stopping_criteria is not None and stopping_criteria(torch.tensor([tokens]), None):
+                    break
+
+        with self._lock:
+            self.calls += 1
+            self.passes += passes
+            self.generated += len(tokens) - prefix_length
+            self.drafted += drafted
+            self.accepted += accepted
+            self.draft_seconds += draft_seconds
+
+        return tokens
+
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'acceptance_rate': self.accepted / self.drafted * 100 if self.drafted else 0,
+            'tokens_per_pass': self.generated / self.passes if self.passes else 0,
+            'drafted': self.drafted,
+            'accepted': self.accepted,
+            'avg_draft_ms': self.draft_seconds / self.calls * 1000 if self.calls else 0,
+        }
@@ -1,3 +1,830 @@
-from django.test import TestCase
+import asyncio
+import math
+import os
+import random
+import shutil
+import tempfile
+from collections import Counter
+import threading
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from unittest import mock
 
-# Create your tests here.
+from .batching import TranslationBatcher
+from .decoding import DecodingPolicy
+from .segmentation import split_sentences, join_pieces
+from .langid import LanguageIdentifier, dominant_script, text_ngrams
+from .management.commands.benchmark_phrase_table import legacy_translate_from_shona
+from .model_registry import LoadedModel, ModelRegistry, ModelSpec
+from .models import Message, MessageTranslation, Room
+from .persistence import WriteBehindQueue
+from .presence import RoomPresence
+from .views import translator_health
+from .phrase_table import PhraseTable, load_phrase_file
+from .shona_translations import SHONA_TRANSLATIONS, build_phrase_tables
+from .translation_cache import FileCache, TranslationCache
+from .translation_memory import TranslationMemory
+from .translation_router import CircuitBreaker, Tier, TranslationRouter
+from .executor import InferenceExecutor, QueueFull
+
+
+class FakeTranslator:
+    """Records translate_batch calls; blocks while ``gate`` is clear"""
+
+    def __init__(self, fail=False):
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.fail = fail
+
+    def translate_batch(self, texts, source_codes, target_code):
+        self.gate.wait(5)
+        self.calls.append((list(texts), target_code))
+        if self.fail:
+            raise RuntimeError("model failed")
+        return [f"{target_code}:{text}" for text in texts]
+
+    def set_load(self, depth):
+        pass
+
+
+class TranslationBatcherTests(SimpleTestCase):
+    def make_batcher(self, translator, workers=1):
+        batcher = TranslationBatcher(translator=translator, executor=InferenceExecutor(workers, 8))
+        batcher.max_batch_size = 16
+        batcher.min_wait = 0.01
+        batcher.max_wait = 0.05
+        return batcher
+
+    async def test_concurrent_requests_batch_per_target_language(self):
+        translator = FakeTranslator()
+        batcher = self.make_batcher(translator, workers=2)
+        requests = [(f"text {i}", 'sna_Latn' if i % 2 else 'fra_Latn') for i in range(6)]
+
+        results = await asyncio.gather(*[
+            batcher.translate(text, 'eng_Latn', target) for text, target in requests
+        ])
+
+        self.assertEqual(results, [f"{target}:{text}" for text, target in requests])
+        self.assertEqual(sorted(target for _, target in translator.calls), ['fra_Latn', 'sna_Latn'])
+        self.assertTrue(all(len(texts) == 3 for texts, _ in translator.calls))
+
+    async def test_same_language_is_not_translated(self):
+        translator = FakeTranslator()
+        batcher = self.make_batcher(translator)
+        self.assertEqual(await batcher.translate("hello", 'eng_Latn', 'eng_Latn'), "hello")
+        self.assertEqual(translator.calls, [])
+
+    async def test_window_grows_with_queue_depth(self):
+        batcher = self.make_batcher(FakeTranslator())
+        batcher._ensure_worker()
+        batcher._worker.cancel()
+        self.assertAlmostEqual(batcher.window(), batcher.min_wait)
+
+        for i in range(batcher.max_batch_size):
+            batcher._queue.put_nowait((f"text {i}", 'eng_Latn', 'sna_Latn', None))
+        self.assertAlmostEqual(batcher.window(), batcher.max_wait)
+
+    async def test_queue_full_when_too_many_requests_wait(self):
+        translator = FakeTranslator()
+        translator.gate.clear()
+        batcher = self.make_batcher(translator)
+        batcher.max_pending = 2
+
+        # The first request takes the only slot; the next two wait in the queue
+        running = asyncio.ensure_future(batcher.translate("first", 'eng_Latn', 'sna_Latn'))
+        await asyncio.sleep(0.1)
+        waiting = [asyncio.ensure_future(batcher.translate(f"text {i}", 'eng_Latn', 'sna_Latn')) for i in range(2)]
+        await asyncio.sleep(0)
+
+        with self.assertRaises(QueueFull):
+            await batcher.translate("one too many", 'eng_Latn', 'sna_Latn')
+        self.assertEqual(batcher.rejected, 1)
+
+        translator.gate.set()
+        self.assertEqual(await running, "sna_Latn:first")
+        self.assertEqual(await asyncio.gather(*waiting), ["sna_Latn:text 0", "sna_Latn:text 1"])
+
+    async def test_batch_error_reaches_every_caller(self):
+        batcher = self.make_batcher(FakeTranslator(fail=True))
+        results = await asyncio.gather(
+            batcher.translate("a", 'eng_Latn', 'sna_Latn'),
+            batcher.translate("b", 'eng_Latn', 'sna_Latn'),
+            return_exceptions=True
+        )
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+
+
+class InferenceExecutorTests(SimpleTestCase):
+    def test_calls_run_on_the_pool(self):
+        executor = InferenceExecutor(2, 8)
+        futures = [executor.submit(pow, i, 2) for i in range(5)]
+        self.assertEqual([future.result(5) for future in futures], [0, 1, 4, 9, 16])
+        self.assertEqual(executor.stats()['completed'], 5)
+        self.assertLessEqual(len(executor._threads), 2)
+
+    def test_submit_raises_queue_full_instead_of_growing(self):
+        executor = InferenceExecutor(1, 2)
+        gate = threading.Event()
+        running = executor.submit(gate.wait, 5)
+        # Wait for the worker to take the first call off the queue
+        while executor.depth:
+            threading.Event().wait(0.01)
+        queued = [executor.submit(str, i) for i in range(2)]
+
+        with self.assertRaises(QueueFull):
+            executor.submit(str, 'one too many')
+        self.assertEqual(executor.stats()['rejected'], 1)
+
+        gate.set()
+        self.assertTrue(running.result(5))
+        self.assertEqual([future.result(5) for future in queued], ['0', '1'])
+
+    def test_exceptions_reach_the_caller(self):
+        executor = InferenceExecutor(1, 2)
+        with self.assertRaises(ZeroDivisionError):
+            executor.submit(divmod, 1, 0).result(5)
+
+    async def test_run_awaits_the_result(self):
+        executor = InferenceExecutor(1, 2)
+        self.assertEqual(await executor.run(sum, [1, 2, 3]), 6)
+
+
+class FakeOutputs:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def tolist(self):
+        return [list(row) for row in self.rows]
+
+
+class DecodingPolicyTests(SimpleTestCase):
+    EOS, PAD = 2, 1
+
+    def make_policy(self, **options):
+        return DecodingPolicy(400, 5, self.EOS, self.PAD, {'MIN_PAIR_SAMPLES': 2, **options})
+
+    def test_budget_uses_learned_token_ratio(self):
+        policy = self.make_policy()
+        default_budget, _ = policy.plan([10], ['eng_Latn'], ['zho_Hans'])
+        self.assertEqual(default_budget, math.ceil(10 * 1.3 * 1.5) + 8)
+
+        # Two outputs of 20 tokens for 10 source tokens: ratio 2
+        for _ in range(2):
+            kwargs, plan = policy.generation_kwargs([10], ['eng_Latn'], ['zho_Hans'])
+            policy.finish(FakeOutputs([[0] + [5] * 20 + [self.EOS]]), kwargs, plan)
+
+        self.assertEqual(policy.length_ratio('eng_Latn', 'zho_Hans'), 2.0)
+        budget, _ = policy.plan([10], ['eng_Latn'], ['zho_Hans'])
+        self.assertEqual(budget, 10 * 2 * 1.5 + 8)
+        self.assertEqual(policy.stats()['learned_pairs'], 1)
+
+    def test_output_cut_by_budget_is_a_truncation_not_a_saving(self):
+        policy = self.make_policy()
+        kwargs, plan = policy.generation_kwargs([4], ['eng_Latn'], ['sna_Latn'])
+        budget = kwargs['max_length'] - 1
+        policy.finish(FakeOutputs([[0] + [5 + i % 7 for i in range(budget)]]), kwargs, plan)
+
+        stats = policy.stats()
+        self.assertEqual(stats['truncations'], 1)
+        self.assertEqual(stats['steps_saved'], 0)
+        self.assertEqual(policy.length_ratio('eng_Latn', 'sna_Latn'), 1.3)
+
+    def test_stopped_loop_counts_saved_steps_and_is_trimmed(self):
+        policy = self.make_policy()
+        kwargs, plan = policy.generation_kwargs([4], ['eng_Latn'], ['sna_Latn'])
+        plan.criteria.triggered = True
+        trimmed = policy.finish(FakeOutputs([[0, 7, 8, 9, 8, 9, 8, 9]]), kwargs, plan)
+
+        self.assertEqual(trimmed, [[0, 7, 8, 9]])
+        self.assertEqual(policy.stats()['loops_stopped'], 1)
+        self.assertEqual(policy.stats()['steps_saved'], 400 - 8)
+        self.assertEqual(policy.stats()['truncations'], 0)
+
+    def test_fan_out_rows_are_target_major(self):
+        policy = self.make_policy()
+        _, plan = policy.generation_kwargs([3, 5], ['eng_Latn'], ['sna_Latn', 'fra_Latn'], prefix_length=2)
+        self.assertEqual(plan.rows, [
+            (3, 'eng_Latn', 'sna_Latn'), (5, 'eng_Latn', 'sna_Latn'),
+            (3, 'eng_Latn', 'fra_Latn'), (5, 'eng_Latn', 'fra_Latn'),
+        ])
+
+
+class SegmentationTests(SimpleTestCase):
+    def sentences(self, pieces):
+        return [piece for piece, is_sentence in pieces if is_sentence]
+
+    def test_pieces_join_back_to_the_original(self):
+        texts = [
+            ("Hello there. How are you?  Fine!\n\nNew paragraph", 'eng_Latn'),
+            ("  leading and trailing  ", 'eng_Latn'),
+            ("你好。我很好！你呢？", 'zho_Hans'),
+            ("Mangwanani. Makadii?", 'sna_Latn'),
+            ("", 'eng_Latn'),
+        ]
+        for text, code in texts:
+            self.assertEqual(join_pieces(split_sentences(text, code), {}), text)
+
+    def test_abbreviations_and_initials_do_not_end_sentences(self):
+        pieces = split_sentences("Dr. Smith met J. Brown at 3 p.m. today. It went well.", 'eng_Latn')
+        self.assertEqual(self.sentences(pieces), ["Dr. Smith met J. Brown at 3 p.m. today.", "It went well."])
+
+    def test_cjk_terminators_split_without_spaces(self):
+        pieces = split_sentences("你好。我很好！", 'zho_Hans')
+        self.assertEqual(self.sentences(pieces), ["你好。", "我很好！"])
+
+    def test_cjk_to_spaced_script_gets_spaces_between_sentences(self):
+        pieces = split_sentences("你好。我很好。", 'zho_Hans')
+        translations = {"你好。": "Hello.", "我很好。": "I'm fine."}
+        self.assertEqual(join_pieces(pieces, translations, 'eng_Latn'), "Hello. I'm fine.")
+
+    def test_spaced_script_to_cjk_drops_spaces_between_sentences(self):
+        pieces = split_sentences("Hello. I'm fine.\nBye.", 'eng_Latn')
+        translations = {"Hello.": "你好。", "I'm fine.": "我很好。", "Bye.": "再见。"}
+        self.assertEqual(join_pieces(pieces, translations, 'zho_Hans'), "你好。我很好。\n再见。")
+
+    def test_spacing_is_kept_between_spaced_scripts(self):
+        pieces = split_sentences("Hello.  How are you?", 'eng_Latn')
+        translations = {"Hello.": "Mhoro.", "How are you?": "Makadii?"}
+        self.assertEqual(join_pieces(pieces, translations, 'sna_Latn'), "Mhoro.  Makadii?")
+
+
+TRAINING_TEXT = {
+    'eng_Latn': "hello how are you today the weather is good thank you very much where are you going "
+                "i am going to the market with my friends we will meet at the church on sunday",
+    'sna_Latn': "mhoro makadii nhasi mamuka sei ndatenda zvikuru muri kuenda kupi ndiri kuenda kumusika "
+                "neshamwari dzangu tichasangana kuchechi nesvondo mangwanani",
+}
+
+
+def train_profile(texts, max_n=3):
+    """A tiny profile in the format of `manage.py train_langid`"""
+    ngrams, floor = {}, 0.0
+    for code, text in texts.items():
+        counter = Counter(text_ngrams(text, max_n))
+        total = sum(counter.values())
+        for ngram, count in counter.items():
+            weight = math.log(count / total)
+            ngrams.setdefault(ngram, {})[code] = weight
+            floor = min(floor, weight)
+    return ngrams, floor - 1.0
+
+
+class LanguageIdentifierTests(SimpleTestCase):
+    def make_identifier(self, **options):
+        identifier = LanguageIdentifier(profile_path=None, **options)
+        identifier.ngrams, identifier.floor = train_profile(TRAINING_TEXT)
+        identifier.languages = sorted(TRAINING_TEXT)
+        return identifier
+
+    def test_dominant_script(self):
+        self.assertEqual(dominant_script("Hello there"), 'Latn')
+        self.assertEqual(dominant_script("Привет, как дела?"), 'Cyrl')
+        self.assertEqual(dominant_script("日本語のテキスト"), 'Kana')
+        self.assertIsNone(dominant_script("123 !!"))
+
+    def test_script_alone_corrects_the_source_language(self):
+        identifier = LanguageIdentifier(profile_path=None)
+        source, targets = identifier.resolve("Привет, как дела?", 'eng_Latn', ['rus_Cyrl', 'sna_Latn'])
+        self.assertEqual(source, 'rus_Cyrl')
+        self.assertEqual(targets, ['sna_Latn'])
+        self.assertEqual(identifier.stats()['translations_skipped'], 1)
+
+    def test_ngrams_correct_a_wrong_claim_among_room_languages(self):
+        identifier = self.make_identifier()
+        source, targets = identifier.resolve("mhoro makadii, muri kuenda kupi nhasi?", 'eng_Latn', ['sna_Latn'])
+        self.assertEqual(source, 'sna_Latn')
+        self.assertEqual(targets, [])
+        self.assertEqual(identifier.stats()['corrected'], 1)
+
+    def test_correct_claim_is_kept(self):
+        identifier = self.make_identifier()
+        source, targets = identifier.resolve("where are you going today my friend?", 'eng_Latn', ['sna_Latn'])
+        self.assertEqual((source, targets), ('eng_Latn', ['sna_Latn']))
+        self.assertEqual(identifier.stats()['corrected'], 0)
+
+    def test_short_text_is_left_alone(self):
+        identifier = self.make_identifier()
+        self.assertEqual(identifier.resolve("ok", 'sna_Latn', ['eng_Latn']), ('sna_Latn', ['eng_Latn']))
+
+    def test_disabled_identifier_changes_nothing(self):
+        identifier = LanguageIdentifier(profile_path=None, enabled=False)
+        self.assertEqual(
+            identifier.resolve("Привет", 'eng_Latn', ['rus_Cyrl']), ('eng_Latn', ['rus_Cyrl'])
+        )
+
+
+class WriteBehindQueueTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='writer')
+        self.room = Room.objects.create(name='Room', slug='room')
+
+    def message(self, content, user=None):
+        return Message(room=self.room, user=user or self.user, content=content, language='eng_Latn')
+
+    def test_rows_are_written_in_order_and_pick_up_earlier_ids(self):
+        queue = WriteBehindQueue(batch_size=3, flush_interval=0.01)
+        for i in range(5):
+            message = self.message(f"hello {i}")
+            queue.add(message)
+            # Batches of three split some messages from their translations
+            queue.add(MessageTranslation(message=message, target_language='sna_Latn',
+                                         text=f"mhoro {i}", model_id='nllb'))
+        queue.close()
+
+        self.assertEqual(list(Message.objects.order_by('id').values_list('content', flat=True)),
+                         [f"hello {i}" for i in range(5)])
+        self.assertEqual(
+            list(MessageTranslation.objects.order_by('id').values_list('message__content', 'text')),
+            [(f"hello {i}", f"mhoro {i}") for i in range(5)]
+        )
+        self.assertEqual(queue.stats()['written'], 10)
+
+    def test_bad_row_does_not_lose_the_batch(self):
+        queue = WriteBehindQueue(batch_size=10, flush_interval=0.05)
+        queue.add(self.message("before"))
+        queue.add(Message(room=self.room, user_id=999999, content="no such user", language='eng_Latn'))
+        queue.add(self.message("after"))
+        queue.close()
+
+        self.assertEqual(sorted(Message.objects.values_list('content', flat=True)), ["after", "before"])
+        stats = queue.stats()
+        self.assertEqual((stats['written'], stats['failed']), (2, 1))
+
+    def test_add_refuses_rows_beyond_the_queue_size(self):
+        queue = WriteBehindQueue(max_size=1)
+        queue._start = lambda: None  # No writer, so nothing drains the queue
+        self.assertTrue(queue.add(self.message("first")))
+        self.assertFalse(queue.add(self.message("second")))
+        self.assertEqual(queue.stats()['dropped'], 1)
+
+
+class FakeTier(Tier):
+    def __init__(self, name, pairs=None, delay=0.0, fail=False, threshold=3, loaded=True):
+        super().__init__(CircuitBreaker(threshold, reset_seconds=60))
+        self.name = name
+        self.model_key = name
+        self.pairs = pairs
+        self.delay = delay
+        self.fail = fail
+        self.loaded = loaded
+        self.calls = 0
+
+    def supports(self, source_code, target_code):
+        return self.pairs is None or (source_code, target_code) in self.pairs
+
+    def ready(self):
+        return self.loaded
+
+    async def translate_many(self, text, source_code, target_codes):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("tier failed")
+        return {code: f"{self.name}:{code}:{text}" for code in target_codes}
+
+
+class FakeRouteRegistry:
+    """Routes every pair to OPUS, so the router tries it first"""
+
+    def route(self, source_code, target_code):
+        return 'opus'
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_opens_after_repeated_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.trips, 1)
+
+    def test_half_open_lets_one_probe_through(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+        breaker.record_failure()
+        breaker.opened_at -= 60
+        self.assertEqual(breaker.state, 'half_open')
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+
+    def test_failed_probe_opens_again(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+        breaker.record_failure()
+        breaker.opened_at -= 60
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        self.assertEqual(breaker.trips, 1)
+
+
+class TranslationRouterTests(SimpleTestCase):
+    ENG_SNA = {('eng_Latn', 'sna_Latn')}
+
+    async def test_slow_tier_without_fallback_is_awaited(self):
+        primary = FakeTier('nllb', delay=0.1)
+        router = TranslationRouter([primary, FakeTier('dictionary', self.ENG_SNA)], budget_ms=20)
+
+        translations, tiers = await router.translate_many("hi", 'eng_Latn', ['fra_Latn'])
+
+        self.assertEqual(translations, {'fra_Latn': "nllb:fra_Latn:hi"})
+        self.assertEqual(tiers, {'fra_Latn': 'nllb'})
+        self.assertEqual(primary.failed, 0)
+
+    async def test_slow_tier_with_fallback_is_upgraded_later(self):
+        primary = FakeTier('nllb', delay=0.1)
+        router = TranslationRouter([primary, FakeTier('dictionary', self.ENG_SNA)], budget_ms=20)
+        upgrades = {}
+
+        translations, tiers = await router.translate_many("hi", 'eng_Latn', ['sna_Latn'], upgrades=upgrades)
+
+        self.assertEqual(tiers, {'sna_Latn': 'dictionary'})
+        self.assertEqual(primary.failed, 1)
+        results, tier = await upgrades['sna_Latn']
+        self.assertEqual((results['sna_Latn'], tier), ("nllb:sna_Latn:hi", 'nllb'))
+
+    async def test_mixed_targets_wait_for_the_pair_without_fallback(self):
+        primary = FakeTier('nllb', delay=0.05)
+        router = TranslationRouter([primary, FakeTier('dictionary', self.ENG_SNA)], budget_ms=10)
+
+        _, tiers = await router.translate_many("hi", 'eng_Latn', ['sna_Latn', 'fra_Latn'])
+
+        self.assertEqual(tiers, {'sna_Latn': 'nllb', 'fra_Latn': 'nllb'})
+        self.assertEqual(primary.calls, 1)
+
+    async def test_open_breaker_only_skips_tiers_with_a_fallback(self):
+        primary = FakeTier('nllb', threshold=1)
+        primary.record_failure()
+        router = TranslationRouter([primary, FakeTier('dictionary', self.ENG_SNA)], budget_ms=1000)
+
+        _, tiers = await router.translate_many("hi", 'eng_Latn', ['sna_Latn', 'fra_Latn'])
+        self.assertEqual(tiers, {'sna_Latn': 'nllb', 'fra_Latn': 'nllb'})
+
+        # That success closed the breaker
+        primary.record_failure()
+        _, tiers = await router.translate_many("hi", 'eng_Latn', ['sna_Latn'])
+        self.assertEqual(tiers, {'sna_Latn': 'dictionary'})
+
+    async def test_failing_tier_falls_back_and_untranslatable_targets_stay_original(self):
+        primary = FakeTier('nllb', fail=True)
+        router = TranslationRouter([primary, FakeTier('dictionary', self.ENG_SNA)], budget_ms=1000)
+
+        translations, tiers = await router.translate_many("hi", 'eng_Latn', ['sna_Latn', 'fra_Latn'])
+
+        self.assertEqual(tiers, {'sna_Latn': 'dictionary', 'fra_Latn': 'none'})
+        self.assertEqual(translations['fra_Latn'], "hi")
+        self.assertEqual(primary.failed, 1)
+
+    async def test_loading_tier_is_awaited_when_nothing_is_behind_it(self):
+        primary = FakeTier('nllb', loaded=False)
+        router = TranslationRouter([primary, FakeTier('dictionary', self.ENG_SNA)], budget_ms=1000)
+
+        _, tiers = await router.translate_many("hi", 'eng_Latn', ['sna_Latn', 'fra_Latn'])
+        self.assertEqual(tiers, {'sna_Latn': 'nllb', 'fra_Latn': 'nllb'})
+
+        # With a fallback for every target it is skipped until it is ready
+        _, tiers = await router.translate_many("hi", 'eng_Latn', ['sna_Latn'])
+        self.assertEqual(tiers, {'sna_Latn': 'dictionary'})
+
+    async def test_late_result_never_replaces_a_higher_ranked_tier(self):
+        opus = FakeTier('opus', self.ENG_SNA, delay=0.1)
+        router = TranslationRouter(
+            [FakeTier('nllb'), opus, FakeTier('dictionary', self.ENG_SNA)], budget_ms=20, registry=FakeRouteRegistry()
+        )
+        upgrades = {}
+
+        _, tiers = await router.translate_many("hi", 'eng_Latn', ['sna_Latn', 'fra_Latn'], upgrades=upgrades)
+
+        # OPUS is tried first for its pair and misses the budget; NLLB is the
+        # only tier for French, so it is awaited and serves both
+        self.assertEqual(tiers, {'sna_Latn': 'nllb', 'fra_Latn': 'nllb'})
+        self.assertEqual(opus.failed, 1)
+        self.assertEqual(upgrades, {})
+
+    async def test_late_results_upgrade_lower_ranked_tiers(self):
+        router = TranslationRouter(
+            [FakeTier('nllb', delay=0.2), FakeTier('opus', self.ENG_SNA, delay=0.1),
+             FakeTier('dictionary', self.ENG_SNA)],
+            budget_ms=20
+        )
+        upgrades = {}
+
+        _, tiers = await router.translate_many("hi", 'eng_Latn', ['sna_Latn'], upgrades=upgrades)
+
+        self.assertEqual(tiers, {'sna_Latn': 'dictionary'})
+        # Both missed the budget; the best ranked one is the upgrade
+        results, tier = await upgrades['sna_Latn']
+        self.assertEqual((results['sna_Latn'], tier), ("nllb:sna_Latn:hi", 'nllb'))
+
+    async def test_queue_full_everywhere_is_raised(self):
+        class FullTier(FakeTier):
+            async def translate_many(self, text, source_code, target_codes):
+                raise QueueFull("busy")
+
+        router = TranslationRouter([FullTier('nllb')], budget_ms=1000)
+        with self.assertRaises(QueueFull):
+            await router.translate_many("hi", 'eng_Latn', ['fra_Latn'])
+
+
+class PhraseTableTests(SimpleTestCase):
+    def test_matches_the_legacy_dictionary_scan(self):
+        reverse_dict = {shona: english for english, shona in SHONA_TRANSLATIONS.items()}
+        table = PhraseTable(reverse_dict.items())
+        vocabulary = [word for phrase in reverse_dict for word in phrase.split()] + ['unknown', 'words']
+        rng = random.Random(0)
+        for _ in range(500):
+            text = ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(1, 12)))
+            self.assertEqual(table.translate(text), legacy_translate_from_shona(text, SHONA_TRANSLATIONS), text)
+
+    def test_longest_phrase_wins(self):
+        table = PhraseTable([('we', 'tino'), ('we are', 'tiri'), ('we are very happy', 'tinofara zvikuru')])
+        self.assertEqual(table.translate("We are very happy"), "tinofara zvikuru")
+        self.assertEqual(table.translate("we are very tired"), "tiri very tired")
+        self.assertEqual(table.longest_match(['we', 'are', 'here'], 0), ('tiri', 2))
+        self.assertEqual(table.longest_match(['hello'], 0), (None, 0))
+
+    def test_phrases_longer_than_four_words(self):
+        table = PhraseTable([('thank you very much indeed friend', 'ndatenda zvikuru shamwari')])
+        self.assertEqual(table.translate("thank you very much indeed friend"), "ndatenda zvikuru shamwari")
+
+    def test_later_entries_replace_earlier_ones(self):
+        table = PhraseTable([('hi', 'mhoro'), ('hi', 'mhoroi')])
+        self.assertEqual(table.size, 1)
+        self.assertEqual(table.translate("hi"), "mhoroi")
+
+    def test_prefix_split_and_fixes(self):
+        _, from_shona = build_phrase_tables(SHONA_TRANSLATIONS.items())
+        self.assertEqual(from_shona.translate("tinozvikuru"), "we very")
+        self.assertEqual(from_shona.translate("tinofara zvikuru"), "we are very happy")
+
+        table = PhraseTable([('tino', 'we do'), ('fara', 'happy')], prefix_length=4,
+                            fixes={'we do happy': 'we are happy', 'do': 'did'})
+        self.assertEqual(table.translate("tinofara"), "we are happy")
+        self.assertEqual(table.translate("tinoenda"), "we did enda")
+
+    def test_phrase_file_skips_comments_and_bad_lines(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.tsv', delete=False, encoding='utf-8') as f:
+            f.write("# english\tshona\nhello\tmhoro\n\nno tab here\ngood night\tusiku hwakanaka\n")
+        self.addCleanup(os.remove, f.name)
+        with self.assertLogs('capp.phrase_table', level='WARNING'):
+            pairs = list(load_phrase_file(f.name))
+        self.assertEqual(pairs, [('hello', 'mhoro'), ('good night', 'usiku hwakanaka')])
+
+
+class TranslationMemoryTests(SimpleTestCase):
+    def memory(self, **kwargs):
+        memory = TranslationMemory(**kwargs)
+        # Nothing to load from TranslationMetric here
+        memory._loaded = True
+        for text, translation in [
+            ("I will be at the meeting tomorrow", "Ndichange ndiri kumusangano mangwana"),
+            ("I cant come to the meeting", "Handikwanisi kuuya kumusangano"),
+            ("Please send him the report", "Ndapota mutumire mushumo"),
+            ("Meet me at 10 tomorrow morning", "Sangana neni na10 mangwana mangwanani"),
+        ]:
+            memory.add(text, translation, 'eng_Latn', 'sna_Latn')
+        return memory
+
+    def test_exact_hits_ignore_case_and_outer_spacing(self):
+        memory = self.memory()
+        self.assertEqual(memory.lookup("  please send HIM the report ", 'eng_Latn', 'sna_Latn'),
+                         "Ndapota mutumire mushumo")
+        self.assertIsNone(memory.lookup("Please send him the report", 'eng_Latn', 'fra_Latn'))
+        self.assertEqual((memory.exact_hits, memory.misses), (1, 1))
+
+    def test_fuzzy_matching_is_off_by_default(self):
+        memory = self.memory()
+        self.assertIsNone(memory.lookup("I will be at the meeting tomorrow.", 'eng_Latn', 'sna_Latn'))
+
+    def test_fuzzy_matches_only_differ_in_punctuation(self):
+        memory = self.memory(fuzzy=True)
+        self.assertEqual(memory.lookup("I will be at the meeting, tomorrow.", 'eng_Latn', 'sna_Latn'),
+                         "Ndichange ndiri kumusangano mangwana")
+        self.assertEqual(memory.fuzzy_hits, 1)
+
+    def test_fuzzy_never_swaps_words(self):
+        memory = self.memory(fuzzy=True, threshold=0.8)
+        for text in ["I can come to the meeting", "Please send me the report", "Meet me at 11 tomorrow morning"]:
+            self.assertIsNone(memory.lookup(text, 'eng_Latn', 'sna_Latn'), text)
+        self.assertEqual(memory.fuzzy_hits, 0)
+
+
+class TranslationCacheTests(SimpleTestCase):
+    def setUp(self):
+        # The locmem default cache stands in for the shared file cache
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+
+    def cache(self, max_entries=2):
+        return TranslationCache('nllb', {'NUM_BEAMS': 4}, max_entries=max_entries, ttl=60, alias='default')
+
+    def in_memory(self, cache, text):
+        return cache.key(text, 'eng_Latn', 'sna_Latn') in cache._entries
+
+    def test_memory_hit(self):
+        cache = self.cache()
+        cache.set("Hello", 'eng_Latn', 'sna_Latn', "Mhoro")
+        self.assertEqual(cache.get("  Hello ", 'eng_Latn', 'sna_Latn'), "Mhoro")
+        self.assertIsNone(cache.get("Hello", 'eng_Latn', 'fra_Latn'))
+        self.assertEqual((cache.memory_hits, cache.disk_hits, cache.misses), (1, 0, 1))
+
+    def test_capacity_evicts_least_recently_used(self):
+        cache = self.cache()
+        cache.set("one", 'eng_Latn', 'sna_Latn', "imwe")
+        cache.set("two", 'eng_Latn', 'sna_Latn', "piri")
+        # A hit moves "one" to the back, so "two" goes first
+        cache.get("one", 'eng_Latn', 'sna_Latn')
+        cache.set("three", 'eng_Latn', 'sna_Latn', "tatu")
+
+        self.assertTrue(self.in_memory(cache, "one"))
+        self.assertFalse(self.in_memory(cache, "two"))
+        self.assertEqual(cache.evictions, 1)
+
+    def test_evicted_entries_fall_through_to_the_shared_cache(self):
+        cache = self.cache(max_entries=1)
+        cache.set("one", 'eng_Latn', 'sna_Latn', "imwe")
+        cache.set("two", 'eng_Latn', 'sna_Latn', "piri")
+
+        self.assertEqual(cache.get("one", 'eng_Latn', 'sna_Latn'), "imwe")
+        self.assertEqual(cache.disk_hits, 1)
+        # The disk hit is promoted back into memory
+        self.assertTrue(self.in_memory(cache, "one"))
+        self.assertEqual(cache.get("one", 'eng_Latn', 'sna_Latn'), "imwe")
+        self.assertEqual(cache.memory_hits, 1)
+
+    def test_other_processes_see_the_shared_cache(self):
+        self.cache().set("Hello", 'eng_Latn', 'sna_Latn', "Mhoro")
+        other = self.cache()
+        self.assertEqual(other.get("Hello", 'eng_Latn', 'sna_Latn'), "Mhoro")
+        # Different decoding settings never share entries
+        changed = TranslationCache('nllb', {'NUM_BEAMS': 1}, alias='default')
+        self.assertIsNone(changed.get("Hello", 'eng_Latn', 'sna_Latn'))
+
+    def test_file_cache_culls_every_interval(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        cache = FileCache(directory, {'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_INTERVAL': 5, 'CULL_FREQUENCY': 2}})
+
+        for i in range(40):
+            cache.set(f"key{i}", i)
+        # Never more than MAX_ENTRIES plus the writes between two counts
+        self.assertLessEqual(len(os.listdir(directory)), 10 + 5)
+
+
+MB = 1024 * 1024
+
+
+class FakeParameter:
+    def __init__(self, size_bytes):
+        self.size_bytes = size_bytes
+
+    def numel(self):
+        return self.size_bytes
+
+    def element_size(self):
+        return 1
+
+
+class FakeModel:
+    def __init__(self, size_bytes):
+        self.size_bytes = size_bytes
+
+    def parameters(self):
+        return [FakeParameter(self.size_bytes)]
+
+
+class FakeRegistry(ModelRegistry):
+    """Registry whose models are 1 MB stand-ins instead of downloads"""
+
+    def _load(self, spec, backend_options):
+        return LoadedModel(spec.key, FakeModel(MB), None, 'cpu')
+
+
+class ModelRegistryTests(SimpleTestCase):
+    def registry(self, budget_mb=2):
+        return FakeRegistry([ModelSpec(key, f"/missing/{key}", set()) for key in ('a', 'b', 'c')], budget_mb)
+
+    def test_least_recently_used_model_is_evicted_over_budget(self):
+        registry = self.registry()
+        registry.load('a')
+        registry.load('b')
+        registry.load('a')
+        registry.load('c')
+
+        self.assertEqual([key for key in 'abc' if registry.is_loaded(key)], ['a', 'c'])
+        self.assertEqual((registry.loads, registry.hits, registry.evictions), (3, 1, 1))
+        self.assertLessEqual(registry.resident_bytes(), 2 * MB)
+
+    def test_models_in_use_are_not_evicted(self):
+        registry = self.registry()
+        with registry.use('a') as loaded:
+            registry.load('b')
+            registry.load('c')
+            self.assertEqual(loaded.in_use, 1)
+            self.assertEqual([key for key in 'abc' if registry.is_loaded(key)], ['a', 'c'])
+
+        self.assertEqual(loaded.in_use, 0)
+        # Released, "a" is the least recently loaded again
+        registry.load('b')
+        self.assertEqual([key for key in 'abc' if registry.is_loaded(key)], ['b', 'c'])
+
+    def test_pinned_models_are_never_evicted(self):
+        registry = self.registry(budget_mb=1)
+        registry.load('a', pin=True)
+        with self.assertLogs('capp.model_registry', level='WARNING'):
+            registry.load('b')
+        registry.load('c')
+        self.assertEqual([key for key in 'abc' if registry.is_loaded(key)], ['a', 'c'])
+
+    def test_route_prefers_the_cheapest_model_covering_the_pair(self):
+        primary = ModelSpec('nllb', '/missing/nllb', primary=True)
+        opus = ModelSpec('opus', '/missing/opus', {('eng_Latn', 'sna_Latn')})
+        registry = FakeRegistry([primary, opus])
+        primary.disk_bytes, opus.disk_bytes = 2400 * MB, 300 * MB
+
+        self.assertEqual(registry.route('eng_Latn', 'sna_Latn'), 'opus')
+        # Pairs the small model does not cover fall back to the primary
+        self.assertEqual(registry.route('sna_Latn', 'eng_Latn'), 'nllb')
+        # A model of unknown size ranks after one of known size
+        opus.disk_bytes = None
+        self.assertEqual(registry.route('eng_Latn', 'sna_Latn'), 'nllb')
+
+    def test_route_without_a_primary(self):
+        registry = FakeRegistry([ModelSpec('opus', '/missing/opus', {('eng_Latn', 'sna_Latn')})])
+        self.assertIsNone(registry.route('eng_Latn', 'fra_Latn'))
+        with self.assertRaises(KeyError):
+            registry.load('nllb')
+
+
+class RoomPresenceTests(SimpleTestCase):
+    def test_language_stays_until_the_last_socket_leaves(self):
+        presence = RoomPresence()
+        # One user with two tabs open, and someone else
+        presence.join(1, 'tab-1', 'sna_Latn')
+        presence.join(1, 'tab-2', 'sna_Latn')
+        presence.join(1, 'other', 'fra_Latn')
+        self.assertEqual(presence.languages(1), {'sna_Latn', 'fra_Latn'})
+
+        presence.leave('tab-1')
+        self.assertEqual(presence.languages(1), {'sna_Latn', 'fra_Latn'})
+        presence.leave('tab-2')
+        self.assertEqual(presence.languages(1), {'fra_Latn'})
+
+    def test_rejoining_moves_the_socket(self):
+        presence = RoomPresence()
+        presence.join(1, 'tab-1', 'sna_Latn')
+        # A language change, then a move to another room
+        presence.join(1, 'tab-1', 'fra_Latn')
+        self.assertEqual(presence.languages(1), {'fra_Latn'})
+        presence.join(2, 'tab-1', 'fra_Latn')
+        self.assertEqual(presence.languages(1), set())
+        self.assertEqual(presence.languages(2), {'fra_Latn'})
+
+    def test_empty_rooms_are_dropped(self):
+        presence = RoomPresence()
+        self.assertEqual(presence.languages(1), set())
+        presence.join(1, 'tab-1', 'sna_Latn')
+        presence.leave('tab-1')
+        # Leaving twice is harmless
+        presence.leave('tab-1')
+
+        self.assertEqual(presence.languages(1), set())
+        self.assertEqual(presence.stats(), {'rooms': 0, 'connections': 0, 'room_languages': 0})
+
+
+class FakeLazyTranslator:
+    def __init__(self):
+        self.status = 'cold'
+        self.loads_started = 0
+
+    @property
+    def ready(self):
+        return self.status == 'ready'
+
+    def start_background_load(self):
+        self.loads_started += 1
+        self.status = 'loading'
+
+    def health(self):
+        return {'status': self.status, 'live': True, 'ready': self.ready}
+
+
+@override_settings(TRANSLATION_SETTINGS={'INFERENCE_SERVER_SOCKET': ''})
+class TranslatorHealthTests(SimpleTestCase):
+    def test_probe_starts_a_lazy_load(self):
+        translator = FakeLazyTranslator()
+        request = RequestFactory().get('/healthz/translator/')
+        with mock.patch('capp.views.Translator', return_value=translator):
+            response = translator_health(request)
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(translator.loads_started, 1)
+
+            translator.status = 'ready'
+            response = translator_health(request)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(translator.loads_started, 1)
@@ -1,13 +1,30 @@
 # translation.py
-import torch
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM, pipeline
+import gc
 import time
+import threading
 from .models import TranslationMetric
+from .backends import process_memory
+from .model_registry import ModelRegistry
+from .generation import GenerationEngine
+from .decoding import DecodingPolicy
+from .speculative import SpeculativeDecoder
+from .translation_cache import TranslationCache
+from .translation_memory import TranslationMemory
+from .segmentation import split_sentences, join_pieces, respace
+from .tuning import load_profile
+from .persistence import WriteBehindQueue
 import logging
+import os
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
+# Sentences run through each warm-up pair before the worker reports ready
+WARMUP_TEXTS = [
+    "Hello, how are you?",
+    "Thank you for your message. I will send the documents tomorrow morning.",
+]
+
 class Translator:
     _instance = None
     _initialized = False
@@ -21,64 +38,396 @@ class Translator:
         if not Translator._initialized:
             self.model = None
             self.tokenizer = None
+            self.engine = None
+            self.backend = None
             self.model_name = settings.NLLB_SETTINGS['MODEL_NAME']
-            self.initialize()
+            self.model_key = settings.TRANSLATION_SETTINGS.get('PRIMARY_MODEL', 'nllb')
+            # Thread, batch and beam settings found by `manage.py autotune_inference`
+            self.tuning = load_profile(
+                settings.NLLB_SETTINGS.get('TUNING_PROFILE'),
+                settings.NLLB_SETTINGS.get('TUNING_MODE', 'throughput')
+            )
+            self.num_beams = self.tuning.get('num_beams', settings.NLLB_SETTINGS['NUM_BEAMS'])
+            self.max_batch_rows = self.tuning.get('batch_size', settings.NLLB_SETTINGS.get('MAX_BATCH_ROWS', 32))
+            self.cache = self.create_cache()
+            self.memory = TranslationMemory.from_settings()
+            # Off while `manage.py warm_translation_cache` re-translates old texts
+            self.record_metrics = True
+            # cold -> loading -> loaded -> warming -> ready, or failed
+            self.status = 'cold'
+            self.error = None
+            self.load_seconds = None
+            self.warmup_seconds = None
+            self._load_lock = threading.Lock()
+            self._load_thread = None
             Translator._initialized = True
 
+    @property
+    def ready(self):
+        return self.status == 'ready'
+
+    def ensure_loaded(self):
+        """Load and warm up the model on first use; returns True once ready"""
+        if self.status in ('ready', 'failed'):
+            return self.ready
+
+        with self._load_lock:
+            if not self._load():
+                return False
+            if self.status == 'loaded':
+                start = time.time()
+                self.status = 'warming'
+                self.warm_up()
+                self.warmup_seconds = time.time() - start
+                self.status = 'ready'
+                logger.info(
+                    f"Translator ready (load {self.load_seconds:.1f}s, warm-up {self.warmup_seconds:.1f}s)"
+                )
+        return self.ready
+
+    def _load(self):
+        """Load the model if nobody has yet; call with the load lock held"""
+        if self.status == 'cold':
+            start = time.time()
+            self.status = 'loading'
+            if not self.initialize():
+                self.status = 'failed'
+                return False
+            self.load_seconds = time.time() - start
+            self.status = 'loaded'
+        return self.status != 'failed'
+
+    def preload(self):
+        """Load the model in a pre-fork master process.
+
+        Forked workers then share the weight pages copy-on-write. The
+        warm-up is left to each worker, since running inference before
+        forking leaves thread pools in an unusable state in the children.
+        ``gc.freeze`` moves the loaded objects out of the collector's reach,
+        so collections in the workers do not touch (and copy) their pages.
+        """
+        with self._load_lock:
+            loaded = self._load()
+        gc.freeze()
+        return loaded
+
+    def start_background_load(self):
+        """Load the model on a daemon thread so startup is not blocked"""
+        with self._load_lock:
+            if self.status not in ('cold', 'loaded') or self._load_thread is not None:
+                return
+            self._load_thread = threading.Thread(
+                target=self.ensure_loaded, name='translator-load', daemon=True
+            )
+        self._load_thread.start()
+
+    def health(self):
+        return {
+            'status': self.status,
+            'live': self.status != 'failed',
+            'ready': self.ready,
+            'model': self.model_name,
+            'backend': self.backend.name if self.backend else None,
+            'load_seconds': self.load_seconds,
+            'warmup_seconds': self.warmup_seconds,
+            'memory': process_memory(),
+            'error': self.error,
+        }
+
+    def warm_up(self):
+        """Run a small batch through each configured pair.
+
+        The first generate calls allocate buffers and pick kernels, so this
+        moves that cost off the first real message.
+        """
+        pairs = settings.TRANSLATION_SETTINGS.get('WARMUP_PAIRS', [])
+        for source_code, target_code in pairs:
+            try:
+                self.engine.translate(WARMUP_TEXTS, [source_code] * len(WARMUP_TEXTS), target_code)
+            except Exception as e:
+                logger.error(f"Warm-up failed for {source_code}->{target_code}: {str(e)}")
+
     def initialize(self):
         """Initialize the NLLB model"""
         try:
-            # Use CUDA if available
-            device = "cuda" if torch.cuda.is_available() else "cpu"
-            logger.info(f"Using device: {device}")
-
-            # Load model and tokenizer
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-            self.model = AutoModelForSeq2SeqLM.from_pretrained(self.model_name).to(device)
-            
-            # Keep model in evaluation mode
-            self.model.eval()
-            logger.info("NLLB model loaded successfully")
+            # Load model and tokenizer through the configured backend
+            threads = self.tuning.get('threads')
+            if threads and hasattr(os, 'sched_getaffinity'):
+                # Never more threads than the cores this process may use
+                threads = min(threads, len(os.sched_getaffinity(0)))
+            loaded = ModelRegistry.instance().load(
+                self.model_key,
+                pin=True,
+                threads=threads,
+                interop_threads=self.tuning.get('interop_threads')
+            )
+            self.backend = loaded.backend
+            self.model, self.tokenizer, device = loaded.model, loaded.tokenizer, loaded.device
+
+            # Reuse tokens and generation configs across calls
+            self.engine = GenerationEngine(
+                self.model,
+                self.tokenizer,
+                device,
+                max_length=settings.NLLB_SETTINGS['MAX_LENGTH'],
+                num_beams=self.num_beams,
+                early_stopping=settings.NLLB_SETTINGS['EARLY_STOPPING']
+            )
+            self.engine.policy = DecodingPolicy.from_settings(
+                settings.NLLB_SETTINGS['MAX_LENGTH'],
+                self.num_beams,
+                self.tokenizer.eos_token_id,
+                self.tokenizer.pad_token_id
+            )
+            if self.backend.name == 'torch':
+                self.engine.speculative = SpeculativeDecoder.from_settings(self.engine)
+            logger.info(f"NLLB model loaded successfully ({self.backend.name} backend)")
+            if self.tuning:
+                logger.info(f"Applied {settings.NLLB_SETTINGS.get('TUNING_MODE')} tuning profile: {self.tuning}")
+            return True
         except Exception as e:
+            self.error = str(e)
             logger.error(f"Error initializing NLLB model: {str(e)}")
+            return False
+
+    def create_cache(self):
+        """Create the result cache keyed on this model and its decoding settings"""
+        if not settings.TRANSLATION_SETTINGS.get('CACHE_ENABLED', True):
+            return None
+
+        params = {
+            key: settings.NLLB_SETTINGS[key]
+            for key in ('MAX_LENGTH', 'EARLY_STOPPING')
+        }
+        params['NUM_BEAMS'] = self.num_beams
+        params['PRECISION'] = settings.NLLB_SETTINGS.get('PRECISION', 'fp32')
+        params['BACKEND'] = settings.TRANSLATION_SETTINGS.get('BACKEND', 'torch')
+        # Speculative decoding gives greedy output for single sentences
+        params['SPECULATIVE'] = settings.NLLB_SETTINGS.get('SPECULATIVE_DECODING', False)
+        return TranslationCache.from_settings(self.model_name, params)
+
+    def set_load(self, queue_depth):
+        """Let the decoding policy know how many requests are waiting"""
+        if self.engine is not None and self.engine.policy is not None:
+            self.engine.policy.queue_depth = queue_depth
+
+    def decoding_stats(self):
+        if self.engine is None or self.engine.policy is None:
+            return None
+        return self.engine.policy.stats()
+
+    def speculative_stats(self):
+        if self.engine is None or self.engine.speculative is None:
+            return None
+        return self.engine.speculative.stats()
+
+    def cached_translation(self, text, source_code, target_code):
+        if self.cache is None:
+            return None
+        return self.cache.get(text, source_code, target_code)
+
+    def cache_translation(self, text, source_code, target_code, translated_text):
+        if self.cache is not None:
+            self.cache.set(text, source_code, target_code, translated_text)
+
+    def remembered_translation(self, text, source_code, target_code):
+        """Translation of the same or a near-identical text from the translation memory"""
+        if self.memory is None:
+            return None
+        try:
+            return self.memory.lookup(text, source_code, target_code)
+        except Exception as e:
+            logger.error(f"Translation memory error: {str(e)}")
+            return None
 
     def translate_text(self, text, source_code, target_code):
         """Translate text using NLLB model"""
         if not text or not source_code or not target_code:
             return text
 
+        return self.translate_batch([text], [source_code], target_code)[0]
+
+    def translate_batch(self, texts, source_codes, target_code):
+        """Translate several texts into one target language.
+
+        Texts are split into sentences. Each distinct sentence is looked up in
+        the cache, and the misses from all texts are translated together in
+        batched generate calls before the texts are reassembled.
+        Texts found in the translation memory skip all of this.
+        """
+        if isinstance(source_codes, str):
+            source_codes = [source_codes] * len(texts)
+
+        results = list(texts)
+        pending = [
+            i for i, (text, source_code) in enumerate(zip(texts, source_codes))
+            if text and source_code and target_code and source_code != target_code
+        ]
+
+        # Texts translated before, or nearly so, skip the model
+        remembered = {i: self.remembered_translation(texts[i], source_codes[i], target_code) for i in pending}
+        for i, translation in remembered.items():
+            if translation is not None:
+                results[i] = translation
+        pending = [i for i in pending if remembered[i] is None]
+
+        if not pending or not self.ensure_loaded():
+            return results
+
+        pieces = {i: split_sentences(texts[i], source_codes[i]) for i in pending}
+        sentences = {}
+        for i in pending:
+            for piece, is_sentence in pieces[i]:
+                if is_sentence:
+                    sentences[(piece, source_codes[i])] = None
+
+        # Repeated sentences are served from the cache
+        misses = []
+        for key in sentences:
+            sentences[key] = self.cached_translation(key[0], key[1], target_code)
+            if sentences[key] is None:
+                misses.append(key)
+
         start_time = time.time()
         try:
-            # Create translation pipeline (reusing existing model and tokenizer)
-            translator = pipeline('translation', 
-                               model=self.model, 
-                               tokenizer=self.tokenizer,
-                               src_lang=source_code,
-                               tgt_lang=target_code)
-
-            # Perform translation
-            output = translator(text, 
-                             max_length=settings.NLLB_SETTINGS['MAX_LENGTH'],
-                             num_beams=settings.NLLB_SETTINGS['NUM_BEAMS'],
-                             early_stopping=settings.NLLB_SETTINGS['EARLY_STOPPING'])
-            
-            translated = output[0]['translation_text']
-
-            # Store metrics asynchronously
-            self.store_metrics(text, translated, source_code, target_code, start_time)
-            
-            return translated
+            for offset in range(0, len(misses), self.max_batch_rows):
+                chunk = misses[offset:offset + self.max_batch_rows]
+                translated = self.engine.translate(
+                    [key[0] for key in chunk],
+                    [key[1] for key in chunk],
+                    target_code
+                )
+                for key, output in zip(chunk, translated):
+                    sentences[key] = output
+                    self.cache_translation(key[0], key[1], target_code, output)
 
         except Exception as e:
             logger.error(f"Translation error: {str(e)}")
+
+        missed = set(misses)
+        for i in pending:
+            translations = {
+                piece: sentences[(piece, source_codes[i])]
+                for piece, is_sentence in pieces[i]
+                if is_sentence and sentences[(piece, source_codes[i])] is not None
+            }
+            results[i] = join_pieces(pieces[i], translations, target_code)
+
+            if any((piece, source_codes[i]) in missed for piece in translations):
+                # Store metrics asynchronously
+                self.store_metrics(texts[i], results[i], source_codes[i], target_code, start_time)
+
+        return results
+
+    def translate_many(self, text, source_code, target_codes):
+        """Translate one text into several target languages, encoding it only once"""
+        targets = [code for code in dict.fromkeys(target_codes) if code and code != source_code]
+        results = {code: text for code in targets}
+        if not text or not source_code:
+            return results
+
+        for target_code in list(targets):
+            translation = self.remembered_translation(text, source_code, target_code)
+            if translation is not None:
+                results[target_code] = translation
+                targets.remove(target_code)
+        if not targets or not self.ensure_loaded():
+            return results
+
+        pieces = split_sentences(text, source_code)
+        sentences = list(dict.fromkeys(piece for piece, is_sentence in pieces if is_sentence))
+
+        found = {code: {} for code in targets}
+        for target_code in targets:
+            for sentence in sentences:
+                cached = self.cached_translation(sentence, source_code, target_code)
+                if cached is not None:
+                    found[target_code][sentence] = cached
+
+        missing_targets = [code for code in targets if len(found[code]) < len(sentences)]
+        missing = [
+            sentence for sentence in sentences
+            if any(sentence not in found[code] for code in missing_targets)
+        ]
+
+        decoded = {code: set() for code in missing_targets}
+        start_time = time.time()
+        try:
+            # Every sentence is decoded once per target language
+            step = max(1, self.max_batch_rows // max(1, len(missing_targets)))
+            for offset in range(0, len(missing), step):
+                chunk = missing[offset:offset + step]
+                translated = self.engine.translate_many(chunk, source_code, missing_targets)
+                for target_code, outputs in zip(missing_targets, translated):
+                    for sentence, output in zip(chunk, outputs):
+                        if sentence not in found[target_code]:
+                            found[target_code][sentence] = output
+                            decoded[target_code].add(sentence)
+                        self.cache_translation(sentence, source_code, target_code, output)
+
+        except Exception as e:
+            logger.error(f"Translation error: {str(e)}")
+
+        for target_code in targets:
+            results[target_code] = join_pieces(pieces, found[target_code], target_code)
+            if decoded.get(target_code):
+                # Store metrics asynchronously
+                self.store_metrics(text, results[target_code], source_code, target_code, start_time)
+
+        return results
+
+    def stream_translate(self, text, source_code, target_code, on_text):
+        """Translate text, passing partial output to ``on_text`` as it is decoded.
+
+        Sentences are streamed one after another, so the first sentence shows
+        up before later ones are decoded. Cached sentences are handed over in
+        one piece. Streamed results come from greedy search, so they are not
+        written back to the beam-search cache.
+        """
+        if not text or not source_code or not target_code or source_code == target_code:
+            on_text(text)
             return text
 
+        translation = self.remembered_translation(text, source_code, target_code)
+        if translation is not None:
+            on_text(translation)
+            return translation
+        if not self.ensure_loaded():
+            on_text(text)
+            return text
+
+        start_time = time.time()
+        decoded = False
+        parts = []
+        for piece, is_sentence in respace(split_sentences(text, source_code), target_code):
+            output = self.cached_translation(piece, source_code, target_code) if is_sentence else None
+            if output is not None or not is_sentence:
+                output = output if output is not None else piece
+                on_text(output)
+            else:
+                try:
+                    output = self.engine.stream(piece, source_code, target_code, on_text)
+                    decoded = True
+                except Exception as e:
+                    logger.error(f"Streaming translation error: {str(e)}")
+                    output = piece
+                    on_text(piece)
+            parts.append(output)
+
+        translated = ''.join(parts)
+        if decoded:
+            self.store_metrics(text, translated, source_code, target_code, start_time)
+        return translated
+
     def store_metrics(self, original_text, translated_text, source_code, target_code, start_time):
         """Store translation metrics"""
+        if not self.record_metrics:
+            return
         try:
             translation_time = time.time() - start_time
-            
-            TranslationMetric.objects.create(
+
+            # Written by the write-behind queue, off the inference thread
+            WriteBehindQueue.instance().add(TranslationMetric(
                 source_language=source_code,
                 target_language=target_code,
                 original_text=original_text,
@@ -88,6 +437,8 @@ class Translator:
                 word_count=len(original_text.split()),
                 confidence_score=0.8,
                 success=True
-            )
+            ))
+            if self.memory is not None:
+                self.memory.add(original_text, translated_text, source_code, target_code)
         except Exception as e:
             logger.error(f"Error saving metrics: {str(e)}")
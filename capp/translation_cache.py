@@ -0,0 +1,160 @@
+import hashlib
+import json
+import threading
+import time
+import unicodedata
+import logging
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text):
+    """Normalize text for cache lookups without changing its meaning"""
+    return unicodedata.normalize('NFC', ' '.join(text.split()))
+
+
+class FileCache(FileBasedCache):
+    """File-based cache that enforces ``MAX_ENTRIES`` every few writes.
+
+    Django's file cache lists the whole cache directory on every ``set`` to
+    count its entries, which makes each write cost O(entries). This one only
+    counts every ``CULL_INTERVAL`` writes per process, so the cache can
+    exceed ``MAX_ENTRIES`` by at most that many entries per process between
+    checks.
+    """
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self._cull_interval = max(1, int(params.get('OPTIONS', {}).get('CULL_INTERVAL', 500)))
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+
+    def _cull(self):
+        with self._writes_lock:
+            self._writes += 1
+            if self._writes < self._cull_interval:
+                return
+            self._writes = 0
+        super()._cull()
+
+
+class TranslationCache:
+    """Two-tier cache of finished translations.
+
+    The first tier is a bounded in-process LRU with a TTL. The second tier is
+    a Django cache (by default a file-based cache under ``BASE_DIR``) that all
+    worker processes on the host share, so a phrase translated by one daphne
+    worker is a cache hit for the others.
+
+    Keys cover the normalized text, the language pair, the model id and the
+    decoding parameters, so changing any of them never serves stale output.
+    """
+
+    def __init__(self, model_id, params, max_entries=10000, ttl=86400, alias='translations'):
+        self.model_id = model_id
+        self.params = params
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.alias = alias
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_settings(cls, model_id, params):
+        options = settings.TRANSLATION_SETTINGS
+        return cls(
+            model_id,
+            params,
+            max_entries=options.get('CACHE_MAX_ENTRIES', 10000),
+            ttl=options.get('CACHE_TTL', 86400),
+            alias=options.get('CACHE_ALIAS', 'translations')
+        )
+
+    @property
+    def disk(self):
+        return caches[self.alias]
+
+    def key(self, text, source_code, target_code):
+        payload = json.dumps(
+            [self.model_id, self.params, source_code, target_code, normalize_text(text)],
+            ensure_ascii=False,
+            sort_keys=True
+        )
+        return 'translation:' + hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, text, source_code, target_code):
+        """Return a cached translation or None"""
+        key = self.key(text, source_code, target_code)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return value
+                del self._entries[key]
+                self.evictions += 1
+
+        try:
+            value = self.disk.get(key)
+        except Exception as e:
+            logger.error(f"Translation cache read error: {str(e)}")
+            value = None
+
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.disk_hits += 1
+        self._remember(key, value, now)
+        return value
+
+    def set(self, text, source_code, target_code, translated_text):
+        """Store a translation in both tiers"""
+        if not text or not translated_text:
+            return
+
+        key = self.key(text, source_code, target_code)
+        self._remember(key, translated_text, time.monotonic())
+
+        try:
+            self.disk.set(key, translated_text, self.ttl)
+        except Exception as e:
+            logger.error(f"Translation cache write error: {str(e)}")
+
+    def _remember(self, key, value, now):
+        with self._lock:
+            self._entries[key] = (value, now + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        hits = self.memory_hits + self.disk_hits
+        return {
+            'entries': len(self._entries),
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': (hits / lookups) * 100 if lookups else 0,
+        }
@@ -0,0 +1,223 @@
+import heapq
+import re
+import threading
+import logging
+from collections import Counter, OrderedDict, defaultdict
+from django.conf import settings
+from .translation_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r'\w+')
+
+# Candidates scored by edit distance per lookup
+MAX_CANDIDATES = 32
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance, or ``limit + 1`` once it is known to exceed ``limit``"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            ))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class TranslationMemory:
+    """Reuses translations of texts that were translated before.
+
+    Every stored pair is indexed by its character trigrams. A lookup first
+    tries an exact match on the normalized text. With ``fuzzy`` set it then
+    finds candidates through the trigram index and scores them by edit
+    distance; the closest one is returned when its similarity
+    (1 - distance / length) is at least ``threshold``. Only texts with the
+    same words match that way, differing in punctuation or spacing, since
+    "can" for "can't" or a changed number is worse than a slower
+    translation.
+
+    A text within ``k`` edits of the query has all but at most ``3k`` of
+    its trigrams, so only texts that share that many are considered, and
+    of those only the ``MAX_CANDIDATES`` sharing the most are scored.
+
+    The memory is filled from ``TranslationMetric`` on first use and kept
+    current with ``add``. It holds at most ``max_entries`` pairs, dropping
+    the oldest first.
+    """
+
+    def __init__(self, fuzzy=False, threshold=0.9, max_entries=50000, max_chars=500):
+        self.fuzzy = fuzzy
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+
+        self._entries = OrderedDict()  # id -> (pair, text, translation)
+        self._exact = {}  # (pair, text) -> id
+        self._postings = defaultdict(set)  # (pair, trigram) -> ids
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._loaded = False
+
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_settings(cls):
+        options = settings.TRANSLATION_SETTINGS
+        if not options.get('MEMORY_ENABLED', True):
+            return None
+        return cls(
+            fuzzy=options.get('MEMORY_FUZZY', False),
+            threshold=options.get('MEMORY_THRESHOLD', 0.9),
+            max_entries=options.get('MEMORY_MAX_ENTRIES', 50000),
+            max_chars=options.get('MEMORY_MAX_CHARS', 500)
+        )
+
+    def normalize(self, text):
+        return normalize_text(text).casefold()
+
+    def load(self):
+        """Fill the memory from the most recent successful translation metrics"""
+        from .models import TranslationMetric
+        try:
+            rows = list(
+                TranslationMetric.objects.filter(success=True)
+                .order_by('-id')
+                .values_list('source_language', 'target_language', 'original_text', 'translated_text')
+                [:self.max_entries]
+            )
+        except Exception as e:
+            logger.error(f"Error loading translation memory: {str(e)}")
+            return
+        for source_code, target_code, original_text, translated_text in reversed(rows):
+            self._add(original_text, translated_text, source_code, target_code)
+        logger.info(f"Loaded {len(self._entries)} translations into the translation memory")
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self.load()
+                    self._loaded = True
+
+    def add(self, original_text, translated_text, source_code, target_code):
+        self._ensure_loaded()
+        with self._lock:
+            self._add(original_text, translated_text, source_code, target_code)
+
+    def _add(self, original_text, translated_text, source_code, target_code):
+        text = self.normalize(original_text or '')
+        # Failed translations come back unchanged; do not remember those
+        if not text or len(text) > self.max_chars or not translated_text or translated_text == original_text:
+            return
+
+        pair = (source_code, target_code)
+        entry_id = self._exact.get((pair, text))
+        if entry_id is not None:
+            self._entries[entry_id] = (pair, text, translated_text)
+            self._entries.move_to_end(entry_id)
+            return
+
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (pair, text, translated_text)
+        self._exact[(pair, text)] = entry_id
+        for gram in trigrams(text):
+            self._postings[(pair, gram)].add(entry_id)
+
+        while len(self._entries) > self.max_entries:
+            self._remove(*self._entries.popitem(last=False))
+
+    def _remove(self, entry_id, entry):
+        pair, text, _ = entry
+        del self._exact[(pair, text)]
+        for gram in trigrams(text):
+            postings = self._postings[(pair, gram)]
+            postings.discard(entry_id)
+            if not postings:
+                del self._postings[(pair, gram)]
+
+    def lookup(self, text, source_code, target_code):
+        """Return a remembered translation of ``text`` or None"""
+        self._ensure_loaded()
+        query = self.normalize(text or '')
+        if not query or len(query) > self.max_chars:
+            return None
+
+        pair = (source_code, target_code)
+        with self._lock:
+            entry_id = self._exact.get((pair, query))
+            if entry_id is not None:
+                self.exact_hits += 1
+                return self._entries[entry_id][2]
+
+            match = self._closest(query, pair)
+            if match is None:
+                self.misses += 1
+                return None
+            self.fuzzy_hits += 1
+            return match
+
+    def _closest(self, query, pair):
+        if not self.fuzzy or self.threshold >= 1:
+            return None
+        # Largest distance that can still reach the threshold
+        limit = int((1 - self.threshold) * len(query) / self.threshold)
+        grams = trigrams(query)
+        required = len(grams) - 3 * limit
+        if limit == 0 or required <= 0:
+            # Too short for the trigram filter to rule anything out
+            return None
+
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get((pair, gram), ()))
+        # Texts sharing the most trigrams are the likeliest close matches
+        candidates = heapq.nlargest(
+            MAX_CANDIDATES,
+            (entry_id for entry_id, count in shared.items() if count >= required),
+            key=shared.__getitem__
+        )
+
+        words = WORD_PATTERN.findall(query)
+        best, best_similarity = None, self.threshold
+        for entry_id in candidates:
+            _, text, translation = self._entries[entry_id]
+            if abs(len(text) - len(query)) > limit or WORD_PATTERN.findall(text) != words:
+                continue
+            distance = edit_distance(query, text, limit)
+            if distance > limit:
+                continue
+            similarity = 1 - distance / max(len(query), len(text))
+            if similarity >= best_similarity:
+                best, best_similarity = translation, similarity
+                # Later candidates only matter if they are closer
+                limit = distance
+        return best
+
+    def stats(self):
+        lookups = self.exact_hits + self.fuzzy_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'exact_hits': self.exact_hits,
+            'fuzzy_hits': self.fuzzy_hits,
+            'misses': self.misses,
+            'fuzzy': self.fuzzy,
+            'threshold': self.threshold,
+            'hit_rate': (self.exact_hits + self.fuzzy_hits) / lookups * 100 if lookups else 0,
+        }
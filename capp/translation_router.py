@@ -0,0 +1,390 @@
+import asyncio
+import math
+import threading
+import time
+import torch
+import logging
+from collections import deque
+from django.conf import settings
+from .batching import TranslationBatcher
+from .executor import InferenceExecutor, QueueFull
+from .model_registry import ModelRegistry
+from .shona_translations import translate_to_shona, translate_from_shona
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Stops sending work to a tier after repeated failures.
+
+    After ``failure_threshold`` failures in a row the breaker opens and the
+    tier is skipped for ``reset_seconds``. Then one request is let through
+    (half open); its success closes the breaker, a failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=3, reset_seconds=30):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.trips = 0
+        self._probing = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'half_open' and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                self.trips += 1
+            self.opened_at = time.monotonic()
+
+
+class Tier:
+    """One way of producing a translation, with its own latency record"""
+    name = None
+    # Registry key of the model behind this tier, if any
+    model_key = None
+
+    def __init__(self, breaker):
+        self.breaker = breaker
+        self.latencies = deque(maxlen=200)
+        self.served = 0
+        self.failed = 0
+        self.shed = 0
+
+    def supports(self, source_code, target_code):
+        return True
+
+    def ready(self):
+        return True
+
+    def backlog(self):
+        """Work queued ahead of a new request, in units of one call"""
+        return 0
+
+    def p95_ms(self):
+        if len(self.latencies) < 5:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, math.ceil(len(ordered) * 0.95) - 1)]
+
+    def expected_ms(self):
+        return self.p95_ms() * (1 + self.backlog())
+
+    def available(self, budget_ms):
+        """Whether this tier should get a request with ``budget_ms`` left"""
+        if not self.ready():
+            return False
+        if self.expected_ms() > budget_ms:
+            self.shed += 1
+            return False
+        return self.breaker.allow()
+
+    def record_success(self, elapsed_ms):
+        self.latencies.append(elapsed_ms)
+        self.served += 1
+        self.breaker.record_success()
+
+    def record_failure(self):
+        self.failed += 1
+        self.breaker.record_failure()
+
+    async def translate_many(self, text, source_code, target_codes):
+        raise NotImplementedError
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'state': self.breaker.state,
+            'served': self.served,
+            'failed': self.failed,
+            'shed': self.shed,
+            'trips': self.breaker.trips,
+            'p95_ms': self.p95_ms(),
+        }
+
+
+class NllbTier(Tier):
+    """The primary NLLB model through the shared batcher"""
+    name = 'nllb'
+
+    def __init__(self, breaker, batcher=None):
+        super().__init__(breaker)
+        self.batcher = batcher or TranslationBatcher.instance()
+        self.model_key = settings.TRANSLATION_SETTINGS.get('PRIMARY_MODEL', 'nllb')
+
+    def ready(self):
+        translator = self.batcher.translator
+        # In-process model still loading: go straight to the faster tiers
+        return translator is None or translator.status in ('ready', 'cold')
+
+    def backlog(self):
+        stats = self.batcher.stats()
+        backlog = stats['pending'] / self.batcher.max_batch_size
+        if self.batcher.executor is not None:
+            backlog += self.batcher.executor.depth / self.batcher.executor.workers
+        return backlog
+
+    async def translate_many(self, text, source_code, target_codes):
+        translator = self.batcher.translator
+        if translator is not None and translator.status == 'failed':
+            # The model would hand the text back untranslated
+            raise RuntimeError(f"model failed to load: {translator.error}")
+        if len(target_codes) == 1:
+            # A single target joins the micro-batch of other requests
+            target_code = target_codes[0]
+            return {target_code: await self.batcher.translate(text, source_code, target_code)}
+        return await self.batcher.translate_many(text, source_code, target_codes)
+
+
+class OpusTier(Tier):
+    """Helsinki-NLP OPUS-MT English to Shona, a much smaller model than NLLB.
+
+    The model comes from the model registry, which may evict it when it is
+    idle. It loads in the background when needed and runs greedy decoding
+    on its own inference thread, so it stays fast while the NLLB queue is
+    full.
+    """
+    name = 'opus'
+    model_key = 'opus'
+
+    def __init__(self, breaker, registry=None):
+        super().__init__(breaker)
+        self.registry = registry or ModelRegistry.instance()
+        self.executor = InferenceExecutor(1, settings.TRANSLATION_SETTINGS.get('FALLBACK_QUEUE_SIZE', 32))
+        self._loading = False
+        self._lock = threading.Lock()
+
+    def supports(self, source_code, target_code):
+        spec = self.registry.specs.get(self.model_key)
+        return spec is not None and spec.supports(source_code, target_code)
+
+    def ready(self):
+        if not self.registry.is_loaded(self.model_key):
+            self.start_loading()
+            return False
+        return True
+
+    def backlog(self):
+        return self.executor.depth
+
+    def start_loading(self):
+        with self._lock:
+            if self._loading:
+                return
+            self._loading = True
+        try:
+            self.executor.submit(self.load)
+        except QueueFull:
+            self._loading = False
+
+    def load(self):
+        try:
+            self.registry.load(self.model_key)
+        except Exception as e:
+            logger.error(f"Error loading OPUS model: {str(e)}")
+        finally:
+            # Allows loading again after an eviction
+            self._loading = False
+
+    def generate(self, text):
+        with self.registry.use(self.model_key) as loaded:
+            inputs = loaded.tokenizer([text], return_tensors='pt', truncation=True)
+            with torch.inference_mode():
+                outputs = loaded.model.generate(**inputs, num_beams=1, max_new_tokens=256)
+            return loaded.tokenizer.batch_decode(outputs, skip_special_tokens=True)[0]
+
+    async def translate_many(self, text, source_code, target_codes):
+        translated = await self.executor.run(self.generate, text)
+        return {target_code: translated for target_code in target_codes}
+
+
+class DictionaryTier(Tier):
+    """Phrase dictionary from ``shona_translations``; instant but rough"""
+    name = 'dictionary'
+    FUNCTIONS = {
+        ('eng_Latn', 'sna_Latn'): translate_to_shona,
+        ('sna_Latn', 'eng_Latn'): translate_from_shona,
+    }
+
+    def supports(self, source_code, target_code):
+        return (source_code, target_code) in self.FUNCTIONS
+
+    async def translate_many(self, text, source_code, target_codes):
+        return {
+            target_code: self.FUNCTIONS[(source_code, target_code)](text)
+            for target_code in target_codes
+        }
+
+
+TIERS = {tier.name: tier for tier in (NllbTier, OpusTier, DictionaryTier)}
+
+
+class TranslationRouter:
+    """Serves each request from the best tier that fits its latency budget.
+
+    Tiers are tried in the order ``PRIMARY_MODEL`` then ``FALLBACK_ORDER``,
+    except that tiers whose model the registry routes a target pair to (the
+    cheapest model good enough for it, e.g. OPUS for English to Shona) move
+    to the front. The last tier stays last.
+    A tier is skipped when its circuit breaker is open or when its recent
+    p95 latency, scaled by its queue backlog, would not fit in the time
+    left. A tier that errors or runs out of budget counts as a failure and
+    the request moves on. Readiness, the budget and the breaker only apply
+    while a later tier supports the pair; a tier with nothing behind it is
+    always tried and awaited, even while its model is still loading.
+    Results are tagged with the tier that produced them.
+    """
+    _instance = None
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            cls._instance = cls.from_settings()
+        return cls._instance
+
+    @classmethod
+    def from_settings(cls):
+        options = settings.TRANSLATION_SETTINGS
+        order = [options.get('PRIMARY_MODEL', 'nllb')] + list(options.get('FALLBACK_ORDER', []))
+        tiers = []
+        for name in dict.fromkeys(order):
+            if name not in TIERS:
+                logger.error(f"Unknown translation tier: {name}")
+                continue
+            breaker = CircuitBreaker(options.get('CIRCUIT_FAILURES', 3), options.get('CIRCUIT_RESET_SECONDS', 30))
+            tiers.append(TIERS[name](breaker))
+        return cls(tiers, options.get('LATENCY_BUDGET_MS', 2000), ModelRegistry.instance())
+
+    def __init__(self, tiers, budget_ms=2000, registry=None):
+        self.tiers = tiers
+        self.budget_ms = budget_ms
+        self.registry = registry
+
+    def ordered_tiers(self, source_code, target_codes):
+        if self.registry is None:
+            return self.tiers
+        routed = {self.registry.route(source_code, code) for code in target_codes}
+        ordered = sorted(self.tiers[:-1], key=lambda tier: tier.model_key not in routed)
+        return ordered + self.tiers[-1:]
+
+    async def translate(self, text, source_code, target_code, budget_ms=None):
+        """Return (translated_text, tier)"""
+        translations, tiers = await self.translate_many(text, source_code, [target_code], budget_ms)
+        return translations[target_code], tiers[target_code]
+
+    async def translate_many(self, text, source_code, target_codes, budget_ms=None, upgrades=None):
+        """Return ({target: text}, {target: tier}); untranslatable targets get tier 'none'.
+
+        A tier only gets a deadline when a later tier can take over every
+        target it was asked for. Otherwise it is the best there is, so it is
+        awaited however long it takes, and its breaker is not consulted.
+        A call that misses its deadline keeps running; pass a dict as
+        ``upgrades`` to receive, for each target then served by a tier that
+        ranks lower in the configured order (or not translated at all), an
+        asyncio task that resolves to ``({target: text}, tier)`` from the
+        abandoned call, or None if it fails. The route order does not count
+        here: a late OPUS result never replaces an NLLB one.
+        """
+        budget_ms = budget_ms or self.budget_ms
+        start = time.monotonic()
+        translations, tiers = {}, {}
+        remaining = [code for code in target_codes if code != source_code]
+        rejected = False
+        late_calls = []
+
+        tiers_to_try = self.ordered_tiers(source_code, remaining)
+        for index, tier in enumerate(tiers_to_try):
+            if not remaining:
+                break
+            supported = [code for code in remaining if tier.supports(source_code, code)]
+            if not supported:
+                continue
+            later = tiers_to_try[index + 1:]
+            has_fallback = all(
+                any(other.supports(source_code, code) for other in later) for code in supported
+            )
+            left_ms = budget_ms - (time.monotonic() - start) * 1000
+            if has_fallback and not tier.available(left_ms):
+                continue
+
+            call_start = time.monotonic()
+            call = asyncio.ensure_future(tier.translate_many(text, source_code, supported))
+            try:
+                if has_fallback:
+                    await asyncio.wait({call}, timeout=max(left_ms, 1) / 1000)
+                    if not call.done():
+                        raise asyncio.TimeoutError()
+                results = await call
+            except asyncio.TimeoutError:
+                logger.warning(f"{tier.name} missed the {budget_ms}ms budget")
+                tier.record_failure()
+                late_calls.append((tier, supported, asyncio.ensure_future(self._late_result(tier, call, call_start))))
+                continue
+            except QueueFull:
+                rejected = True
+                tier.record_failure()
+                continue
+            except Exception as e:
+                logger.error(f"{tier.name} translation error: {str(e)}")
+                tier.record_failure()
+                continue
+
+            tier.record_success((time.monotonic() - call_start) * 1000)
+            for code in supported:
+                translations[code] = results[code]
+                tiers[code] = tier.name
+            remaining = [code for code in remaining if code not in translations]
+
+        if remaining and rejected:
+            raise QueueFull("No translation tier could take the request")
+        for code in target_codes:
+            translations.setdefault(code, text)
+            tiers.setdefault(code, 'none')
+
+        if upgrades is not None:
+            rank = {tier.name: index for index, tier in enumerate(self.tiers)}
+            # Best ranked first, so each target gets the best late result
+            for tier, supported, late in sorted(late_calls, key=lambda item: rank[item[0].name]):
+                for code in supported:
+                    if rank[tier.name] < rank.get(tiers[code], len(self.tiers)):
+                        upgrades.setdefault(code, late)
+        return translations, tiers
+
+    async def _late_result(self, tier, call, call_start):
+        """Wait for a call that missed its deadline; its latency still counts"""
+        try:
+            results = await call
+        except Exception as e:
+            logger.error(f"{tier.name} translation error after the deadline: {str(e)}")
+            return None
+        tier.latencies.append((time.monotonic() - call_start) * 1000)
+        return results, tier.name
+
+    def stats(self):
+        return {
+            'budget_ms': self.budget_ms,
+            'tiers': [tier.stats() for tier in self.tiers],
+        }
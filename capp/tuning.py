@@ -0,0 +1,55 @@
+import json
+import os
+import random
+import logging
+
+logger = logging.getLogger(__name__)
+
+TUNING_MODES = ('latency', 'throughput')
+
+# Building blocks for a synthetic chat workload: mostly short messages with
+# the occasional long one, like the rooms see in practice
+GREETINGS = ["Hello", "Hi everyone", "Good morning", "Thanks", "Ok", "See you tomorrow", "Yes", "No problem"]
+SENTENCES = [
+    "Can we move the meeting to three o'clock?",
+    "I have sent the documents to your email, please check them.",
+    "The delivery will arrive on Friday afternoon.",
+    "How much does the second option cost?",
+    "Please call me when you get to the office.",
+    "We need to finish the report before the end of the week.",
+    "The price includes transport and installation.",
+    "Let me know if you have any questions about the invoice.",
+]
+
+
+def chat_workload(count, seed=0):
+    """Return ``count`` synthetic chat messages of realistic lengths"""
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.35:
+            messages.append(rng.choice(GREETINGS))
+        elif roll < 0.85:
+            messages.append(rng.choice(SENTENCES))
+        else:
+            messages.append(' '.join(rng.sample(SENTENCES, 3)))
+    return messages
+
+
+def load_profile(path, mode):
+    """Settings for one mode of an autotune profile, or {} when there is none"""
+    if not path or not os.path.exists(path):
+        return {}
+    if mode not in TUNING_MODES:
+        logger.error(f"Unknown tuning mode: {mode}")
+        return {}
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            profile = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error(f"Error loading tuning profile: {str(e)}")
+        return {}
+
+    return profile.get(mode) or {}
@@ -16,4 +16,5 @@ urlpatterns = [
     path('dashboard/', views.admin_dashboard, name='admin_dashboard'),
     path('admin-feedback/', views.admin_feedback, name='admin_feedback'),
     path('translation-metrics/', views.translation_metrics, name='translation_metrics'),
+    path('healthz/translator/', views.translator_health, name='translator_health'),
 ]
@@ -2,21 +2,30 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, authenticate, logout
 from django.contrib import messages
+from django.http import JsonResponse
 from django.contrib.auth.models import User
-from django.db.models import Q, Count, Avg, Case, When
+from django.db.models import Q, Count, Avg, Case, When, Prefetch
 from django.contrib.auth.forms import UserCreationForm
-from .models import Room, Message, UserProfile, TranslationMetric, Feedback
+from .models import Room, Message, MessageTranslation, UserProfile, TranslationMetric, Feedback
 from .forms import UserProfileForm, CustomUserCreationForm, FeedbackForm
 from .translation import Translator
+from .inference_client import request_health
+from .executor import InferenceExecutor
+from .persistence import WriteBehindQueue
+from .translation_router import TranslationRouter
+from .model_registry import ModelRegistry
+from .langid import LanguageIdentifier
+from .presence import RoomPresence
+from .consumers import notify_language_change
 from django.contrib.admin.views.decorators import staff_member_required
 from django.core.paginator import Paginator
 from django.utils import timezone
 from django.db.models.functions import TruncDate, ExtractHour
+from django.conf import settings
 import json
 import logging
 
 logger = logging.getLogger(__name__)
-translator = Translator()
 
 def register(request):
     if request.method == 'POST':
@@ -84,15 +93,32 @@ def room(request, room_id):
 def search(request):
     query = request.GET.get('q', '')
     results = []
+    message_results = []
     
     if query:
         results = Room.objects.filter(
             Q(name__icontains=query) |
             Q(slug__icontains=query)
         )
+
+        # Messages match in their own language or in their stored
+        # translation into the user's language
+        language = getattr(getattr(request.user, 'userprofile', None), 'preferred_language', 'eng_Latn')
+        message_results = (Message.objects
+                           .filter(Q(content__icontains=query) |
+                                   Q(translations__target_language=language, translations__text__icontains=query))
+                           .distinct()
+                           .select_related('room', 'user')
+                           .prefetch_related(Prefetch(
+                               'translations',
+                               queryset=MessageTranslation.objects.filter(target_language=language).order_by('-id'),
+                               to_attr='stored_translations'
+                           ))
+                           .order_by('-date_added')[:20])
     
     return render(request, 'search.html', {
         'results': results,
+        'message_results': message_results,
         'query': query,
         'title': 'Search BizNest Rooms'
     })
@@ -102,7 +128,10 @@ def profile_settings(request):
     if request.method == 'POST':
         form = UserProfileForm(request.POST, instance=request.user.userprofile)
         if form.is_valid():
-            form.save()
+            profile = form.save()
+            if 'preferred_language' in form.changed_data:
+                # Open chat rooms switch to the new language without reconnecting
+                notify_language_change(request.user.id, profile.preferred_language)
             messages.success(request, "Your language preference has been updated successfully.")
             return redirect('profile_settings')
     else:
@@ -307,8 +336,28 @@ def developers(request):
         'title': 'Our Development Team'
     })
 
+def translator_health(request):
+    """Readiness probe: 200 once the model is loaded and warm, 503 otherwise.
+
+    With lazy loading (``PRELOAD_MODEL = ''``) nothing would load the model
+    while a load balancer holds traffic back until this returns 200, so the
+    first probe starts the load in the background.
+    """
+    socket_path = settings.TRANSLATION_SETTINGS.get('INFERENCE_SERVER_SOCKET')
+    if socket_path:
+        health = request_health(socket_path) or {'status': 'unreachable', 'live': False, 'ready': False}
+    else:
+        translator = Translator()
+        if not translator.ready:
+            # Does nothing once a load has started
+            translator.start_background_load()
+        health = translator.health()
+    return JsonResponse(health, status=200 if health['ready'] else 503)
+
 @staff_member_required
 def translation_metrics(request):
+    translator = Translator()
+
     # Get metrics from the database
     metrics = TranslationMetric.objects.all()
     
@@ -338,6 +387,16 @@ def translation_metrics(request):
         'total_translations': metrics.count(),
         'successful_translations': metrics.filter(success=True).count(),
         'failed_translations': metrics.filter(success=False).count(),
+        'cache_stats': translator.cache.stats() if translator.cache else None,
+        'memory_stats': translator.memory.stats() if translator.memory else None,
+        'decoding_stats': translator.decoding_stats(),
+        'speculative_stats': translator.speculative_stats(),
+        'langid_stats': LanguageIdentifier.instance().stats(),
+        'executor_stats': InferenceExecutor.instance().stats(),
+        'persistence_stats': WriteBehindQueue.instance().stats(),
+        'router_stats': TranslationRouter.instance().stats(),
+        'registry_stats': ModelRegistry.instance().stats(),
+        'presence_stats': RoomPresence.instance().stats(),
     }
     
     return render(request, 'translation_metrics.html', context)
@@ -9,6 +9,20 @@ from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 from channels.security.websocket import AllowedHostsOriginValidator
 from capp.routing import websocket_urlpatterns
+from capp.translation import Translator
+from django.conf import settings
+
+# Only the ASGI server loads the model; the readiness probe at
+# /healthz/translator/ reports when it is warm. With an inference server
+# the model lives there instead.
+preload = settings.TRANSLATION_SETTINGS.get('PRELOAD_MODEL', 'background')
+if not settings.TRANSLATION_SETTINGS.get('INFERENCE_SERVER_SOCKET'):
+    if preload == 'prefork':
+        Translator().preload()
+        # Each forked worker warms up on its own
+        os.register_at_fork(after_in_child=lambda: Translator().start_background_load())
+    elif preload == 'background':
+        Translator().start_background_load()
 
 application = ProtocolTypeRouter({
     "http": get_asgi_application(),
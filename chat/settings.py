@@ -62,6 +62,23 @@ CHANNEL_LAYERS = {
         "BACKEND": "channels.layers.InMemoryChannelLayer"
     }
 }
+# Caches. 'translations' is shared on disk by every worker process on the host
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'translations': {
+        # Django's FileBasedCache, but counting its files every CULL_INTERVAL
+        # writes instead of on every write
+        'BACKEND': 'capp.translation_cache.FileCache',
+        'LOCATION': BASE_DIR / 'translation_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+            'CULL_INTERVAL': 500,
+        },
+    },
+}
+
 # Database settings (using SQLite)
 DATABASES = {
     'default': {
@@ -120,13 +137,93 @@ LOGGING = {
 TRANSLATION_SETTINGS = {
     'ENABLE_ONLINE_SERVICES': False,  # Disable online services
     'PRIMARY_MODEL': 'nllb',
-    'FALLBACK_ORDER': ['dictionary'],  # Only use dictionary as fallback
+    # Inference backend: 'torch', or 'onnx' after `manage.py export_onnx_model`
+    # (needs `pip install optimum[onnxruntime]`)
+    'BACKEND': 'torch',
+    # Faster tiers used when PRIMARY_MODEL would miss the latency budget
+    # or its circuit breaker is open (see capp/translation_router.py)
+    'FALLBACK_ORDER': ['opus', 'dictionary'],
+    'LATENCY_BUDGET_MS': 2000,
+    'CIRCUIT_FAILURES': 3,  # Failures in a row that open a tier's breaker
+    'CIRCUIT_RESET_SECONDS': 30,
+    'FALLBACK_QUEUE_SIZE': 32,
+    # Extra English<TAB>Shona phrase files for the dictionary tier, added
+    # after the built-in table in capp/shona_translations.py
+    'PHRASE_TABLE_FILES': [],
+    # Translation memory over past TranslationMetric rows: texts seen before
+    # reuse their translation without running the model. With MEMORY_FUZZY,
+    # texts whose similarity (1 - edit distance / length) to a stored text
+    # reaches MEMORY_THRESHOLD match too, as long as they only differ in
+    # punctuation and spacing; a changed word is never reused
+    'MEMORY_ENABLED': True,
+    'MEMORY_FUZZY': False,
+    'MEMORY_THRESHOLD': 0.9,
+    'MEMORY_MAX_ENTRIES': 50000,
+    'MEMORY_MAX_CHARS': 500,  # Longer texts are neither stored nor looked up
+    # When the ASGI server starts: 'background' loads the model on a thread,
+    # 'prefork' loads it in the master before a pre-forking server (gunicorn
+    # --preload with uvicorn workers) forks, so workers share the weights;
+    # '' loads it on the first translation or the first readiness probe
+    # (/healthz/translator/), whichever comes first
+    'PRELOAD_MODEL': os.environ.get('TRANSLATOR_PRELOAD', 'background'),
+    # Out-of-process inference: run `manage.py run_inference_server` and point
+    # the ASGI workers at its socket; empty keeps the model in-process
+    'INFERENCE_SERVER_SOCKET': os.environ.get('INFERENCE_SERVER_SOCKET', ''),
+    'INFERENCE_REPLICAS': 2,
+    'INFERENCE_PRELOAD': True,  # Load once before forking replicas so they share weights
+    'INFERENCE_TIMEOUT': 60,  # seconds
+    'INFERENCE_MAX_IN_FLIGHT': 4,  # batches one ASGI worker sends at once
+    # Pairs translated once after loading, before the worker reports ready
+    'WARMUP_PAIRS': [
+        ('eng_Latn', 'sna_Latn'),
+        ('sna_Latn', 'eng_Latn'),
+    ],
+    # Stream translations to listeners as translation_delta events (greedy decoding)
+    'STREAMING': False,
+    # Local language ID to correct the claimed source language
+    # (profile built with `manage.py train_langid`)
+    'LANGID_ENABLED': True,
+    'LANGID_PROFILE': os.path.join(BASE_DIR, 'langid_profile.json'),
+    'LANGID_MIN_MARGIN': 0.3,
+    'LANGID_MIN_CHARS': 12,
+    # Micro-batching of concurrent translate requests
+    'BATCH_MAX_SIZE': 16,
+    'BATCH_MIN_WAIT_MS': 2,  # Window when the queue is quiet
+    'BATCH_MAX_WAIT_MS': 25,  # Window when the queue is busy
+    'BATCH_MAX_PENDING': 256,  # Requests waiting for a batch before new ones are refused
+    'HISTORY_CHUNK_SIZE': 25,  # Room history messages translated per batch and frame
+    # Shared inference threads; None gives one per INFERENCE_CORES_PER_WORKER cores
+    'INFERENCE_WORKERS': None,
+    'INFERENCE_CORES_PER_WORKER': 4,
+    'INFERENCE_QUEUE_SIZE': 64,  # Calls waiting for a worker before QueueFull
+    # Write-behind persistence of Message, MessageTranslation and TranslationMetric rows
+    'PERSISTENCE_QUEUE_SIZE': 10000,
+    'PERSISTENCE_BATCH_SIZE': 200,
+    'PERSISTENCE_FLUSH_MS': 200,
+    # Translation result cache (in-process LRU backed by CACHES['translations'])
+    'CACHE_ENABLED': True,
+    'CACHE_MAX_ENTRIES': 10000,
+    'CACHE_TTL': 60 * 60 * 24 * 7,  # seconds
+    'CACHE_ALIAS': 'translations',
 }
 
 # Translation model paths
 TRANSLATION_MODELS = {
     'NLLB_PATH': os.path.expanduser("~/.cache/huggingface/hub/models--facebook--nllb-200-distilled-600M"),
-    'OPUS_PATH': os.path.expanduser("~/.cache/huggingface/hub/models--Helsinki-NLP--opus-mt-en-sn")
+    'OPUS_PATH': os.path.expanduser("~/.cache/huggingface/hub/models--Helsinki-NLP--opus-mt-en-sn"),
+    'OPUS_MODEL_NAME': 'Helsinki-NLP/opus-mt-en-sn',
+    'ONNX_PATH': os.path.expanduser("~/translation_models/nllb-onnx"),
+    'SAFETENSORS_PATH': os.path.expanduser("~/translation_models/nllb-safetensors"),
+    # Written by `manage.py download_nllb_model`; models listed there load
+    # from their local path, others from the Hugging Face names above
+    'CONFIG_FILE': os.path.expanduser("~/translation_models/models_config.json"),
+    # Smaller models and the pairs they are good enough for. Each pair goes
+    # to the cheapest model covering it; the primary model covers the rest
+    'PAIR_MODELS': {
+        'opus': [('eng_Latn', 'sna_Latn')],
+    },
+    # Idle models are evicted least recently used first above this size
+    'MEMORY_BUDGET_MB': 4096,
 }
 
 # Add to your settings.py
@@ -136,5 +233,33 @@ NLLB_SETTINGS = {
     'MODEL_NAME': 'facebook/nllb-200-distilled-600M',
     'MAX_LENGTH': 400,
     'NUM_BEAMS': 5,
-    'EARLY_STOPPING': True
+    'EARLY_STOPPING': True,
+    # Upper bound on rows per generate call when long messages are split into sentences
+    'MAX_BATCH_ROWS': 32,
+    # 'mmap' maps the weights from SAFETENSORS_PATH (`manage.py convert_to_safetensors`)
+    # so processes share them through the page cache; 'standard' reads them in
+    'LOAD_MODE': 'standard',
+    # Inference precision: 'fp32', 'bf16' or 'int8-dynamic' (CPU only).
+    # Compare modes with `manage.py compare_precision` before switching.
+    'PRECISION': 'fp32',
+    # Profile from `manage.py autotune_inference`; TUNING_MODE picks its
+    # 'latency' or 'throughput' settings (threads, batch size, beams)
+    'TUNING_PROFILE': os.path.join(BASE_DIR, 'tuning_profile.json'),
+    'TUNING_MODE': os.environ.get('TRANSLATOR_TUNING_MODE', 'throughput'),
+    # Single sentences in pairs with a draft model that the decoding policy
+    # (or NUM_BEAMS = 1) would decode greedily are decoded by checking the
+    # draft's tokens, SPECULATIVE_TOKENS per decoder pass
+    # (compare with `manage.py benchmark_speculative` before enabling)
+    'SPECULATIVE_DECODING': False,
+    'SPECULATIVE_TOKENS': 8,
+    'DRAFT_MODELS': [
+        ('eng_Latn', 'sna_Latn', 'opus'),  # model registry key
+    ],
+    # Adaptive decode limits and beams, see capp/decoding.py for all options
+    'DECODING_POLICY': {
+        'ENABLED': True,
+        'LENGTH_MARGIN': 1.5,
+        'BUSY_QUEUE_DEPTH': 8,
+        'OVERLOADED_QUEUE_DEPTH': 32,
+    },
 }